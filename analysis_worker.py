@@ -0,0 +1,115 @@
+"""
+Analysis worker pool for ANALYSIS_MODE=queue.
+
+Claims jobs from the local job queue, runs HandwritingAnalyzer on them and
+stores the results, so the Streamlit servers only enqueue and poll. Each
+process runs several threads because the work is mostly waiting on the
+model. Jobs of a crashed worker become claimable again after the
+visibility timeout. While the model is unavailable (its circuit breakers
+are open) jobs stay queued instead of failing. Finished jobs are purged
+from the queue after JOB_RETENTION_HOURS.
+
+Usage:
+    python analysis_worker.py                        # 2 processes x 4 threads
+    python analysis_worker.py --processes 4 --threads 8
+"""
+import time
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+
+from config import AGGREGATES_SNAPSHOT_INTERVAL, WARMUP_ENABLED, JOB_RETENTION_HOURS
+from src.logging_setup import configure_logging, set_submission_id
+from src.gemini_handler import HandwritingAnalyzer
+from src.job_queue import JobQueue
+from src.drainer import process_job
+from src.shared_cache import create_cache
+from src import aggregates
+from src.warmup import warm_up
+
+logger = logging.getLogger("analysis_worker")
+
+
+def worker_thread(queue, analyzer, cache, stop, poll_interval):
+    while not stop.is_set():
+        # Leave jobs queued while every tier's circuit breaker is open
+        if not analyzer.available():
+            stop.wait(poll_interval)
+            continue
+        job = queue.claim()
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        try:
+            process_job(job, queue, analyzer, cache)
+        except Exception as e:
+            logger.exception("Job failed")
+            queue.fail(job, e, retry=True)
+        finally:
+            set_submission_id(None)
+
+
+def worker_process(threads, poll_interval):
+    """Entry point of one worker process: run `threads` claim loops until SIGTERM/SIGINT"""
+    configure_logging()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    queue = JobQueue()
+    analyzer = HandwritingAnalyzer()
+    cache = create_cache()
+    aggregates.start_snapshots(AGGREGATES_SNAPSHOT_INTERVAL)
+    # Open the model connections before claiming, so the first job is not slower than the rest
+    if WARMUP_ENABLED:
+        warm_up(analyzer=analyzer, qr_url=None)
+    pool = [
+        threading.Thread(target=worker_thread, args=(queue, analyzer, cache, stop, poll_interval), daemon=True)
+        for _ in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    while not stop.is_set():
+        stop.wait(1.0)
+    # Finish the jobs in hand; anything left is re-claimed after the visibility timeout
+    for thread in pool:
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the analysis worker pool")
+    parser.add_argument("--processes", type=int, default=2, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent jobs per process")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="Seconds between claims when the queue is empty")
+    parser.add_argument("--status-interval", type=float, default=30.0, help="Seconds between queue depth reports")
+    args = parser.parse_args()
+
+    configure_logging()
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(args.threads, args.poll_interval), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    queue = JobQueue()
+    try:
+        while any(process.is_alive() for process in processes):
+            logger.info("Queue depth", extra={"depth": queue.depth()})
+            purged = queue.purge(JOB_RETENTION_HOURS * 3600)
+            if purged:
+                logger.info("Purged finished jobs", extra={"jobs": purged})
+            time.sleep(args.status_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Headless HTTP API: image in, analysis JSON out.
+
+A lightweight alternative to the Streamlit UI for kiosks and batch
+clients. It reuses the same analyzer, image validation, storage and
+submission log as app.py, and returns the analysis in the same schema.
+
+Endpoints:
+    POST /analyze               multipart form: "image" (file), optional "name";
+                                422 with "problems" for photos failing the quality gate;
+                                202 with the result URL while the model is unavailable
+                                (the analysis is stored and runs once it is back)
+    GET  /results/<submission>  stored result of an earlier submission (202 while queued)
+    GET  /health
+    GET  /ready                 503 until the process has warmed up
+
+Usage:
+    python api_server.py
+    curl -F image=@sample.jpg -F name=Kiosk http://localhost:8080/analyze
+"""
+import io
+import time
+import uuid
+import base64
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from config import API_HOST, API_PORT, API_WORKER_THREADS, MAX_IMAGE_SIZE, SUPPORTED_FORMATS, REQUEST_DEADLINE, APP_URL, AGGREGATES_SNAPSHOT_INTERVAL, QUALITY_GATE, STORE_AND_FORWARD, CIRCUIT_RESET_TIMEOUT
+from src.logging_setup import configure_logging, set_submission_id
+from src.utils import validate_image
+from src.gemini_handler import HandwritingAnalyzer, PROMPT_VERSION
+from src.deadline import Deadline, AnalysisTimeoutError
+from src.submissions import save_submission_data
+from src.storage import create_storage
+from src.shared_cache import create_cache
+from src.result_store import image_hash, save_result, load_result, find_by_image_hash
+from src import metrics, aggregates
+from src.warmup import start_warmup
+from src.quality import check_image
+from src.circuit_breaker import ModelUnavailableError
+from src.job_queue import JobQueue
+from src.drainer import BacklogDrainer
+
+logger = logging.getLogger("api_server")
+
+# Read uploads in chunks of this size, so an oversized body is rejected without buffering it
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadedImage(io.BytesIO):
+    """Uploaded image with the name and size validate_image expects"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def json_error(status, message, **fields):
+    return web.json_response({"error": message, **fields}, status=status)
+
+
+async def read_upload(request):
+    """
+    Stream the multipart body
+
+    Returns:
+        tuple: (UploadedImage or None, user name)
+    """
+    reader = await request.multipart()
+    image, user_name = None, "API"
+    async for part in reader:
+        if part.name == "image":
+            data = bytearray()
+            while True:
+                chunk = await part.read_chunk(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                data.extend(chunk)
+                if len(data) > MAX_IMAGE_SIZE:
+                    raise web.HTTPRequestEntityTooLarge(max_size=MAX_IMAGE_SIZE, actual_size=len(data))
+            image = UploadedImage(bytes(data), part.filename or "upload.jpg")
+        elif part.name == "name":
+            user_name = (await part.text()).strip()[:100] or user_name
+    return image, user_name
+
+
+def run_analysis(app, submission_id, user_name, image):
+    """
+    Blocking part of a request: store, log the submission, analyze and persist (runs in the thread pool)
+
+    Returns:
+        dict: The analysis, or None if it was queued because the model is unavailable
+    """
+    set_submission_id(submission_id)
+    metrics.start_request_timings()
+    deadline = Deadline(REQUEST_DEADLINE)
+    image_bytes = image.getvalue()
+
+    with metrics.timed("upload"):
+        image_url = app["storage"].upload(image_bytes, f"api_{submission_id}.jpg", timeout=deadline.timeout())
+    with metrics.timed("save_submission"):
+        save_submission_data(submission_id, user_name, image_url)
+
+    image_sha = image_hash(image_bytes)
+    stored = find_by_image_hash(image_sha, PROMPT_VERSION, cache=app["cache"])
+    if stored is not None:
+        metrics.increment("cache_hits_total", cache="result_store")
+        save_result(submission_id, image_sha, stored["result"], stored["model"], stored["prompt_version"], cache=app["cache"], reused=True)
+        return stored["result"]
+
+    analyzer = app["analyzer"]
+    try:
+        result = analyzer.analyze_handwriting(base64.b64encode(image_bytes).decode("utf-8"), deadline=deadline)
+    except ModelUnavailableError:
+        if app["queue"] is None:
+            raise
+        # Store and forward: the drainer analyzes it when the model is back
+        app["queue"].enqueue(submission_id, image_bytes, options={"deferred": True})
+        metrics.increment("deferred_analyses_total")
+        return None
+    if "error" not in result:
+        save_result(submission_id, image_sha, result, analyzer.last_model, PROMPT_VERSION, cache=app["cache"])
+    return result
+
+
+async def analyze(request):
+    try:
+        image, user_name = await read_upload(request)
+    except ValueError as e:
+        return json_error(400, f"Invalid multipart body: {str(e)}")
+    if image is None:
+        return json_error(400, "Missing 'image' field")
+
+    with metrics.timed("validate"):
+        is_valid, error_message = validate_image(image, SUPPORTED_FORMATS, MAX_IMAGE_SIZE)
+    if not is_valid:
+        return json_error(400, error_message)
+
+    loop = asyncio.get_running_loop()
+    if QUALITY_GATE:
+        # Unusable photos are turned away before they are stored or sent to the model
+        report = await loop.run_in_executor(request.app["executor"], check_image, image.getvalue())
+        if not report["ok"]:
+            return json_error(422, "The photo can't be analyzed, please retake it", problems=report["problems"])
+
+    submission_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    try:
+        result = await loop.run_in_executor(request.app["executor"], run_analysis, request.app, submission_id, user_name, image)
+    except AnalysisTimeoutError as e:
+        return json_error(504, "The analysis took too long, please try again", submission_id=submission_id, stage=e.stage)
+    except ModelUnavailableError:
+        return web.json_response(
+            {"error": "The analysis service is unavailable, please try again later", "submission_id": submission_id},
+            status=503, headers={"Retry-After": str(int(CIRCUIT_RESET_TIMEOUT))}
+        )
+    except Exception as e:
+        logger.exception("Analysis request failed")
+        return json_error(500, str(e), submission_id=submission_id)
+
+    if result is None:
+        return web.json_response({
+            "submission_id": submission_id,
+            "result_url": f"{APP_URL}?submission={submission_id}",
+            "status": "queued"
+        }, status=202)
+
+    return web.json_response({
+        "submission_id": submission_id,
+        "result_url": f"{APP_URL}?submission={submission_id}",
+        "analysis": result
+    }, status=502 if "error" in result else 200)
+
+
+async def get_result(request):
+    submission_id = request.match_info["submission_id"]
+    record = load_result(submission_id, cache=request.app["cache"])
+    if record is None:
+        job = request.app["queue"].status(submission_id) if request.app["queue"] is not None else None
+        if job is not None and job["status"] in ("queued", "running"):
+            return web.json_response({"submission_id": submission_id, "status": job["status"]}, status=202)
+        return json_error(404, "Unknown submission", submission_id=submission_id)
+    return web.json_response({"submission_id": submission_id, "analysis": record["result"]})
+
+
+async def health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def ready(request):
+    """503 until the warm-up has run, so the load balancer only routes to warmed processes"""
+    if metrics.is_ready():
+        return web.json_response({"status": "ready"})
+    return web.json_response({"status": "warming up"}, status=503)
+
+
+def create_app():
+    """Build the aiohttp application with one analyzer, storage and cache per process"""
+    app = web.Application(client_max_size=MAX_IMAGE_SIZE + 64 * 1024)
+    app["analyzer"] = HandwritingAnalyzer()
+    app["storage"] = create_storage()
+    app["cache"] = create_cache()
+    # Submissions stored while the model is unavailable, analyzed in the background once it is back
+    app["queue"] = JobQueue() if STORE_AND_FORWARD else None
+    app["drainer"] = BacklogDrainer(app["queue"], app["analyzer"], app["cache"]) if app["queue"] is not None else None
+    aggregates.start_snapshots(AGGREGATES_SNAPSHOT_INTERVAL)
+    app["executor"] = ThreadPoolExecutor(max_workers=API_WORKER_THREADS, thread_name_prefix="api")
+    app.router.add_post("/analyze", analyze)
+    app.router.add_get("/results/{submission_id}", get_result)
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", ready)
+
+    async def warm(app):
+        start_warmup(analyzer=app["analyzer"], storage=app["storage"], qr_url=None)
+        if app["drainer"] is not None:
+            app["drainer"].start()
+    app.on_startup.append(warm)
+
+    async def shutdown_executor(app):
+        if app["drainer"] is not None:
+            app["drainer"].stop(timeout=0)
+        app["executor"].shutdown(wait=False)
+    app.on_cleanup.append(shutdown_executor)
+    return app
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the headless analysis API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    configure_logging()
+    web.run_app(create_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,36 +11,127 @@ from camera_input_live import camera_input_live
 import json
 import requests
 import hashlib
-import cloudinary
-import cloudinary.uploader
-# Debug imports
 import logging
-logging.basicConfig(level=logging.DEBUG)
+from src.logging_setup import configure_logging, set_submission_id
+
+# Queue-based structured logging; level, format and DEBUG sampling come from config
+configure_logging()
 logger = logging.getLogger(__name__)
 
 from src.utils import encode_image_to_base64, validate_image
-from src.gemini_handler import HandwritingAnalyzer
-from src.qr_generator import generate_qr_code
+from src.gemini_handler import HandwritingAnalyzer, PROMPT_VERSION
+from src.qr_generator import get_cached_qr_code
+from src.submissions import save_submission_data, find_submission
+from src import metrics
+from src.deadline import Deadline, AnalysisTimeoutError
+from src.result_store import image_hash, save_result, load_result, find_by_image_hash
+from src.phash import PerceptualIndex, compute_hashes
+from src.thumbnails import get_thumbnail
+from src.storage import create_storage
+from src.retention import RetentionManager
+from src.shared_cache import create_cache
+from src.job_queue import JobQueue, PRIORITY_NORMAL, PRIORITY_HIGH
+from src import aggregates
+from src.warmup import start_warmup
+from src.quality import check_image
+from src.circuit_breaker import ModelUnavailableError
+from src.drainer import BacklogDrainer
 from config import (
     STREAMLIT_TITLE, 
     MAX_IMAGE_SIZE, 
     SUPPORTED_FORMATS, 
     PERSONALITY_TRAITS,
     TRAIT_DESCRIPTIONS,
-    HANDWRITING_FEATURES
+    HANDWRITING_FEATURES,
+    TEMP_FOLDER,
+    LOADTEST_MODE,
+    METRICS_PORT,
+    METRICS_HOST,
+    REQUEST_DEADLINE,
+    UPLOAD_TIMEOUT,
+    APP_URL,
+    REUSE_DUPLICATE_ANALYSIS,
+    THUMBNAIL_PREVIEW_WIDTH,
+    RETENTION_INTERVAL,
+    ANALYSIS_MODE,
+    JOB_POLL_INTERVAL,
+    AGGREGATES_SNAPSHOT_INTERVAL,
+    AGGREGATES_MIN_CROWD,
+    QUALITY_GATE,
+    STORE_AND_FORWARD
 )
 
-# Initialize the analyzer
-analyzer = HandwritingAnalyzer()
+# Serve per-stage timings on a local endpoint (started once per process)
+metrics.start_metrics_server(METRICS_PORT, METRICS_HOST)
+
+# Initialize the analyzer once per process instead of on every rerun
+@st.cache_resource
+def get_analyzer():
+    return HandwritingAnalyzer()
+
+analyzer = get_analyzer()
+
+# Near-duplicate index of submitted photos, shared by all sessions of this process
+@st.cache_resource
+def get_phash_index():
+    return PerceptualIndex()
 
 # Create directory for temp files
-TEMP_FOLDER = "temp"
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 
-# Cloudinary configuration - you would add your actual credentials in Streamlit secrets
-CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "")
-CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY", "")
-CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "")
+# Cache shared with the other app processes on this host (results, QR codes)
+@st.cache_resource
+def get_shared_cache():
+    return create_cache()
+
+shared_cache = get_shared_cache()
+
+# In queue mode the model runs in analysis_worker.py processes, never in the script thread.
+# In inline mode the queue holds the submissions stored while the model is unavailable.
+@st.cache_resource
+def get_job_queue():
+    return JobQueue() if ANALYSIS_MODE == "queue" or STORE_AND_FORWARD else None
+
+job_queue = get_job_queue()
+
+# Analyze those stored submissions once the model is back (started once per process)
+@st.cache_resource
+def get_drainer():
+    if ANALYSIS_MODE == "inline" and job_queue is not None:
+        return BacklogDrainer(job_queue, analyzer, shared_cache).start()
+    return None
+
+get_drainer()
+
+# Keep temp/ within its disk budget in the background (started once per process)
+@st.cache_resource
+def get_retention_manager():
+    manager = RetentionManager()
+    if RETENTION_INTERVAL > 0:
+        manager.start_background(RETENTION_INTERVAL)
+    return manager
+
+get_retention_manager()
+
+# Image storage: Cloudinary when credentials are configured (see config.py), a local object store otherwise
+@st.cache_resource
+def get_storage():
+    return create_storage()
+
+storage = get_storage()
+
+# Population statistics: this process snapshots its own counts, and pages read
+# the merge of every process's snapshot (refreshed at most every 10 seconds)
+aggregates.start_snapshots(AGGREGATES_SNAPSHOT_INTERVAL)
+
+# Warm the model connection, storage client, QR code and chart rendering in the
+# background; /ready on the metrics port turns 200 when done. Started by
+# serve_app.py before the first session, or here on the first session otherwise.
+start_warmup(analyzer=analyzer, storage=storage, cache=shared_cache, render=True)
+
+@st.cache_resource(ttl=10)
+def get_population():
+    return aggregates.load_population()
 
 # Page configuration
 st.set_page_config(
@@ -334,31 +425,34 @@ if "image_url" not in st.session_state:
 if "submitted" not in st.session_state:
     st.session_state.submitted = False
 
+if "analysis_timed_out" not in st.session_state:
+    st.session_state.analysis_timed_out = False
+
+if "retry_image" not in st.session_state:
+    st.session_state.retry_image = None
+
+if "processed_upload" not in st.session_state:
+    st.session_state.processed_upload = None
+
+if "duplicate_of" not in st.session_state:
+    st.session_state.duplicate_of = None
+
+if "pending_job" not in st.session_state:
+    st.session_state.pending_job = None
+if "analysis_deferred" not in st.session_state:
+    st.session_state.analysis_deferred = False
+
 # Function to upload to Cloudinary
-def upload_to_cloudinary(image_data, filename):
-    """Upload image to Cloudinary and return the URL"""
-    if not all([CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET]):
-        st.warning("Cloudinary credentials not configured. Images will be stored temporarily.")
-        # Save to temp folder as fallback
-        temp_path = os.path.join(TEMP_FOLDER, filename)
-        if isinstance(image_data, bytes):
-            with open(temp_path, "wb") as f:
-                f.write(image_data)
-        else:
-            image_data.seek(0)
-            with open(temp_path, "wb") as f:
-                f.write(image_data.read())
-        return f"Local file: {temp_path}"
+def upload_image(image_data, filename, deadline=None):
+    """Upload image to the configured storage (Cloudinary or the local object store) and return the URL"""
+    with metrics.timed("upload"):
+        return _upload_image(image_data, filename, deadline)
+
+def _upload_image(image_data, filename, deadline=None):
+    if storage.name == "local":
+        st.warning("Cloudinary credentials not configured. Images will be stored locally.")
     
     try:
-        # Configure Cloudinary
-        
-        cloudinary.config(
-            cloud_name=CLOUDINARY_CLOUD_NAME,
-            api_key=CLOUDINARY_API_KEY,
-            api_secret=CLOUDINARY_API_SECRET
-        )
-        
         # Prepare the file for upload
         if isinstance(image_data, bytes):
             # If it's already bytes data, use it directly
@@ -368,111 +462,453 @@ def upload_to_cloudinary(image_data, filename):
             image_data.seek(0)
             file_to_upload = image_data.read()
         
-        # Create public_id from filename (without extension)
-        public_id = filename.split('.')[0]
-        
-        # Upload to Cloudinary with folder
-        upload_result = cloudinary.uploader.upload(
-            file_to_upload,
-            folder="handwriting_analyzer",
-            public_id=public_id,
-            resource_type="image",
-            tags=["handwriting_analyzer"]  # Tag for filtering
-        )
+        # Never let the upload outlive the request deadline
+        upload_timeout = deadline.timeout(UPLOAD_TIMEOUT) if deadline else UPLOAD_TIMEOUT
         
-        return upload_result.get("secure_url")
+        return storage.upload(file_to_upload, filename, timeout=upload_timeout)
         
     except Exception as e:
         import traceback
-        logger.error(f"Error uploading to Cloudinary: {str(e)}")
+        metrics.increment("errors_total", stage="upload", type=type(e).__name__)
+        logger.error(f"Error uploading image: {str(e)}")
         logger.error(traceback.format_exc())
-        st.error(f"Error uploading to Cloudinary: {str(e)}")
+        st.error(f"Error uploading image: {str(e)}")
         return None
 
-# Function to save submission data
-def save_submission_data(submission_id, user_name, image_url):
-    """Save submission data to a JSON file that can be accessed by teammates"""
-    submission_data = {
-        "submission_id": submission_id,
-        "user_name": user_name,
-        "image_url": image_url,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "hour_group": datetime.now().strftime("%Y-%m-%d-%H")  # Group by hour for contest
-    }
-    
-    # Save to a local JSON file
-    submissions_file = os.path.join(TEMP_FOLDER, "submissions.json")
-    
-    # Read existing data
-    existing_data = []
-    if os.path.exists(submissions_file):
-        try:
-            with open(submissions_file, "r") as f:
-                existing_data = json.load(f)
-        except:
-            existing_data = []
-    
-    # Append new submission
-    existing_data.append(submission_data)
-    
-    # Write back to file
-    with open(submissions_file, "w") as f:
-        json.dump(existing_data, f, indent=2)
-    
-    return submission_data
+# Function to check a photo before anything is uploaded or analyzed
+def check_capture_quality(image_bytes):
+    """
+    Run the local quality gate on a photo
+
+    The report is kept for the rerun, so a rejected photo that stays on
+    screen is not checked (or counted) again.
+
+    Returns:
+        tuple: (bool, str) - (is_usable, what to fix as a markdown list)
+    """
+    if not QUALITY_GATE:
+        return True, ""
+    key = hashlib.sha1(image_bytes).hexdigest()
+    cached = st.session_state.get("quality_report")
+    if cached and cached[0] == key:
+        report = cached[1]
+    else:
+        report = check_image(image_bytes)
+        st.session_state.quality_report = (key, report)
+    if report["ok"]:
+        return True, ""
+    advice = "\n".join(f"- {problem['message']}" for problem in report["problems"])
+    return False, f"**This photo can't be analyzed yet.** Please retake it:\n\n{advice}"
 
 # Function to handle image upload and analysis
-def process_handwriting_image(image_data, user_name):
+def process_handwriting_image(image_data, user_name, deadline=None):
     # Generate a unique ID for this submission
     submission_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
     st.session_state.submission_id = submission_id
+    set_submission_id(submission_id)
+    metrics.start_request_timings()
     
     # Create a sanitized filename
     safe_name = "".join(c for c in user_name if c.isalnum() or c in [' ', '_']).replace(' ', '_')
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{safe_name}_{timestamp}_{submission_id}.jpg"
     
-    # Upload image to cloud storage
-    image_url = upload_to_cloudinary(image_data, filename)
+    # Flag resubmissions of (nearly) the same photo for the contest
+    duplicate_of = None
+    phash_index = get_phash_index()
+    try:
+        with metrics.timed("phash"):
+            image_bytes = image_data if isinstance(image_data, bytes) else image_data.getvalue()
+            hashes = compute_hashes(image_bytes)
+            matches = phash_index.find_near_duplicates(hashes)
+    except Exception as e:
+        logger.warning(f"Could not hash submission image: {str(e)}")
+        hashes, matches = None, []
+    if matches:
+        duplicate_of = matches[0][1]
+        metrics.increment("near_duplicates_total")
+        logger.info("Near-duplicate submission", extra={"duplicate_of": duplicate_of, "distance": matches[0][0]})
+    st.session_state.duplicate_of = duplicate_of
+    
+    # A duplicate can point at the earlier upload instead of uploading the same page again
+    earlier = find_submission(duplicate_of) if duplicate_of and REUSE_DUPLICATE_ANALYSIS else None
+    if earlier and earlier.get("image_url"):
+        image_url = earlier["image_url"]
+    else:
+        # Upload image to storage
+        image_url = upload_image(image_data, filename, deadline)
     st.session_state.image_url = image_url
     
     # Save submission data
-    save_submission_data(submission_id, user_name, image_url)
+    with metrics.timed("save_submission"):
+        save_submission_data(submission_id, user_name, image_url,
+                             extra={"duplicate_of": duplicate_of} if duplicate_of else None)
+    if hashes is not None:
+        phash_index.add(submission_id, hashes)
     
     # Set submitted flag
     st.session_state.submitted = True
     
     return filename, image_url
 
+# QR codes are the same for every session
+def get_qr_code(url):
+    """QR code for a URL, rendered once for all processes"""
+    return get_cached_qr_code(url, shared_cache)
+
 # Function to handle image analysis
-def analyze_handwriting_image(image_data):
+def analyze_handwriting_image(image_data, deadline=None):
+    """Analyze the image within the request deadline; on timeout, offer a retry"""
+    if deadline is None:
+        deadline = Deadline(REQUEST_DEADLINE)
+    
     with st.spinner("Analyzing handwriting..."):
-        # Create a progress bar to simulate analysis
+        # Show real progress instead of a simulated delay, which only ate into the deadline
         progress_bar = st.progress(0)
-        for i in range(101):
-            time.sleep(0.02)  # Simulate processing time
-            progress_bar.progress(i)
+        
+        # Keep the bytes so a timed-out analysis can be retried
+        image_bytes = image_data.getvalue() if hasattr(image_data, "getvalue") else image_data.read()
+        image_sha = image_hash(image_bytes)
+        
+        # An identical image was already analyzed with this prompt: reuse that result
+        stored = find_by_image_hash(image_sha, PROMPT_VERSION, cache=shared_cache)
+        if stored is not None:
+            metrics.increment("cache_hits_total", cache="result_store")
+            st.session_state.analysis_result = stored["result"]
+            st.session_state.analysis_timed_out = False
+            st.session_state.retry_image = None
+            save_result(st.session_state.submission_id, image_sha, stored["result"], stored["model"], stored["prompt_version"], cache=shared_cache, reused=True)
+            progress_bar.empty()
+            return True
+        
+        # A near-duplicate of an earlier submission can reuse its analysis
+        if REUSE_DUPLICATE_ANALYSIS and st.session_state.duplicate_of:
+            stored = load_result(st.session_state.duplicate_of, cache=shared_cache)
+            if stored is not None and stored.get("prompt_version") == PROMPT_VERSION:
+                metrics.increment("cache_hits_total", cache="phash")
+                st.session_state.analysis_result = stored["result"]
+                st.session_state.analysis_timed_out = False
+                st.session_state.retry_image = None
+                save_result(st.session_state.submission_id, image_sha, stored["result"], stored["model"], stored["prompt_version"], cache=shared_cache, reused=True)
+                progress_bar.empty()
+                return True
+        
+        # Queue mode: hand the image to a worker; the results section polls for the answer
+        if ANALYSIS_MODE == "queue":
+            # A retry the user is waiting on jumps ahead of new submissions
+            priority = PRIORITY_HIGH if st.session_state.analysis_timed_out else PRIORITY_NORMAL
+            job_queue.enqueue(st.session_state.submission_id, image_bytes, priority)
+            job_queue.publish_depth()
+            st.session_state.pending_job = st.session_state.submission_id
+            st.session_state.analysis_timed_out = False
+            st.session_state.retry_image = image_bytes
+            progress_bar.empty()
+            return True
         
         # Encode image to base64
-        base64_image = encode_image_to_base64(image_data)
+        with metrics.timed("preprocess"):
+            base64_image = encode_image_to_base64(io.BytesIO(image_bytes))
+        progress_bar.progress(20)
         
         # Send the image for analysis
         try:
-            analysis_result = analyzer.analyze_handwriting(base64_image)
+            analysis_result = analyzer.analyze_handwriting(base64_image, deadline=deadline)
+            progress_bar.progress(100)
             st.session_state.analysis_result = analysis_result
+            st.session_state.analysis_timed_out = False
+            st.session_state.retry_image = None
+            
+            # Persist successful results so the result link and reloads never call the model again
+            if "error" not in analysis_result and st.session_state.submission_id:
+                save_result(st.session_state.submission_id, image_sha, analysis_result, analyzer.last_model, PROMPT_VERSION, cache=shared_cache)
+            logger.info("Analysis complete", extra={
+                "timings": {stage: round(seconds, 4) for stage, seconds in metrics.current_request_timings().items()},
+                "failed": "error" in analysis_result
+            })
             
             # Remove the progress bar
             progress_bar.empty()
             return True
             
+        except AnalysisTimeoutError as e:
+            progress_bar.empty()
+            logger.warning("Analysis timed out", extra={"stage": e.stage, "deadline": deadline.seconds})
+            st.session_state.analysis_timed_out = True
+            st.session_state.retry_image = image_bytes
+            return False
+            
+        except ModelUnavailableError as e:
+            progress_bar.empty()
+            logger.warning("Model unavailable", extra={"error": str(e), "deferred": job_queue is not None})
+            st.session_state.retry_image = image_bytes
+            if job_queue is None:
+                st.session_state.analysis_timed_out = True
+                return False
+            # Store and forward: the drainer analyzes it when the model is back
+            job_queue.enqueue(st.session_state.submission_id, image_bytes, PRIORITY_NORMAL, {"deferred": True})
+            job_queue.publish_depth()
+            metrics.increment("deferred_analyses_total")
+            st.session_state.pending_job = st.session_state.submission_id
+            st.session_state.analysis_deferred = True
+            st.session_state.analysis_timed_out = False
+            return True
+            
         except Exception as e:
             st.error(f"An error occurred during analysis: {str(e)}")
             return False
 
+# Function to check on a queued analysis
+def poll_pending_job():
+    """Pick up the result of this session's queued job, or rerun shortly to check again (deferred jobs wait for the user)"""
+    job = job_queue.status(st.session_state.pending_job)
+    if job is None or job["status"] == "failed":
+        logger.warning("Queued analysis failed", extra={"error": job and job["error"]})
+        st.session_state.pending_job = None
+        st.session_state.analysis_deferred = False
+        st.session_state.analysis_timed_out = True  # Offers a retry with the kept image
+        return
+    if job["status"] == "done":
+        st.session_state.pending_job = None
+        st.session_state.analysis_deferred = False
+        st.session_state.analysis_result = job["result"]
+        st.session_state.retry_image = None
+        return
+    
+    depth = job_queue.depth()
+    if st.session_state.analysis_deferred:
+        # An outage can last minutes: no rerun loop, the user checks back when they like
+        result_link = f"{APP_URL}?submission={st.session_state.pending_job}"
+        st.info(
+            "Our analysis service is briefly unavailable, so your sample is saved and will be analyzed "
+            f"automatically as soon as it is back ({depth['queued']} waiting). "
+            f"Your submission ID is {st.session_state.pending_job}. "
+            f"Open your results any time at: {result_link}"
+        )
+        if st.button("Check for My Results", use_container_width=True):
+            st.rerun()
+        return
+    if job["status"] == "queued":
+        st.info(f"Your sample is in line for analysis ({depth['queued']} waiting)...")
+    else:
+        st.info("Analyzing handwriting...")
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
+
+# Function to show a submitted photo
+def show_preview(image_bytes, user_name):
+    """Show a small cached thumbnail instead of sending the full photo back to the browser"""
+    try:
+        with metrics.timed("thumbnail"):
+            preview = get_thumbnail(image_bytes, THUMBNAIL_PREVIEW_WIDTH)
+    except Exception as e:
+        logger.warning(f"Could not create thumbnail: {str(e)}")
+        preview = image_bytes
+    st.image(preview, caption=f"Handwriting Sample: {user_name}", use_container_width=True)
+
+# Function to display an analysis result
+def render_analysis_result(analysis_result):
+    """Render the profession headline, trait and feature tabs and disclaimer for one result"""
+    st.markdown("<div class='result-container'>", unsafe_allow_html=True)
+    st.success("Analysis complete!")
+    
+    # Profession prediction headline
+    if "profession" in analysis_result and "primary" in analysis_result["profession"]:
+        st.markdown(f"""
+        <div style="text-align: center; margin: 1rem 0 2rem 0;">
+            <div class="profession-title">Your handwriting suggests you'd make an excellent:</div>
+            <div class="profession-name">{analysis_result['profession']['primary']}</div>
+            <p style="font-style: italic; color: #555; max-width: 600px; margin: 0 auto; text-align: center;">
+                {analysis_result['profession']['explanation']}
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Create tabs for the detailed results
+    tab1, tab2 = st.tabs(["Personality Traits", "Handwriting Features"])
+    
+    # Tab 1: Personality Traits with radar chart
+    with tab1:
+        # Create a radar chart for personality traits
+        trait_names = []
+        trait_scores = []
+        
+        for trait in PERSONALITY_TRAITS:
+            trait_key = trait.lower()
+            if trait_key in analysis_result["traits"]:
+                trait_data = analysis_result["traits"][trait_key]
+                trait_names.append(trait)
+                # Convert score to int if it's a string
+                if isinstance(trait_data["score"], str):
+                    try:
+                        score = int(trait_data["score"])
+                    except ValueError:
+                        score = float(trait_data["score"])
+                else:
+                    score = trait_data["score"]
+                trait_scores.append(score)
+        
+        # Add the first trait again to close the radar chart
+        if trait_names:  # Check if we have any trait names
+            trait_names.append(trait_names[0])
+            trait_scores.append(trait_scores[0])
+        
+        # Create the radar chart
+        fig = go.Figure()
+        
+        fig.add_trace(go.Scatterpolar(
+            r=trait_scores,
+            theta=trait_names,
+            fill='toself',
+            name='Personality Profile',
+            line_color='#4e89ae',
+            fillcolor='rgba(78, 137, 174, 0.3)'
+        ))
+        
+        fig.update_layout(
+            polar=dict(
+                radialaxis=dict(
+                    visible=True,
+                    range=[0, 10]
+                )
+            ),
+            showlegend=False,
+            height=350,
+            margin=dict(l=50, r=50, t=30, b=30)
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Personality profile summary
+        st.markdown("<h4>Your Personality Profile</h4>", unsafe_allow_html=True)
+        st.markdown(f"<p style='font-size: 1rem; padding: 1rem; background-color: #f5f7f9; border-radius: 8px; border-left: 3px solid #4e89ae;'>{analysis_result['profile']}</p>", unsafe_allow_html=True)
+        
+        # Display trait scores with progress bars, placed against everyone analyzed so far
+        population = get_population()
+        for trait in PERSONALITY_TRAITS:
+            trait_key = trait.lower()
+            if trait_key in analysis_result["traits"]:
+                trait_data = analysis_result["traits"][trait_key]
+                
+                # Convert score to int if it's a string
+                if isinstance(trait_data["score"], str):
+                    try:
+                        score = int(trait_data["score"])
+                    except ValueError:
+                        score = float(trait_data["score"])
+                else:
+                    score = trait_data["score"]
+                
+                st.markdown(f"**{trait}**: {score}/10")
+                st.progress(score / 10)
+                if population.results >= AGGREGATES_MIN_CROWD:
+                    percentile = population.percentile(trait, score)
+                    if percentile is not None:
+                        st.caption(f"Higher than {percentile:.0f}% of participants")
+                st.markdown(f"<p style='font-size: 0.9rem; color: #666;'>{trait_data['evidence']}</p>", unsafe_allow_html=True)
+                st.markdown("<hr style='margin: 1rem 0; opacity: 0.2;'>", unsafe_allow_html=True)
+    
+    # Tab 2: Handwriting Features
+    with tab2:
+        # Use a grid layout for features
+        col1, col2 = st.columns(2)
+        
+        # Split features between columns
+        features = list(HANDWRITING_FEATURES.items())
+        half = len(features) // 2
+        
+        for i, (feature, feature_info) in enumerate(features):
+            feature_key = feature.lower()
+            if feature_key in analysis_result["features"]:
+                feature_data = analysis_result["features"][feature_key]
+                
+                # Add to first or second column based on index
+                with col1 if i < half else col2:
+                    st.markdown(f"""
+                    <div class='feature-card'>
+                        <strong>{feature}:</strong> {feature_data['value']}
+                        <p style='font-size: 0.9rem; color: #666;'>{feature_data['description']}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+    
+    # Sharing section
+    st.markdown("""
+    <div style="margin-top: 2rem; text-align: center;">
+        <h4>📱 Take a screenshot to share your results!</h4>
+        <p style="font-size: 0.9rem; color: #666; margin-top: 0.5rem;">
+            Share your personality profile with friends or on social media with #AIHandwritingAnalyzer
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Disclaimer
+    st.markdown(f"<p style='font-style: italic; font-size: 0.8rem; color: #999; text-align: center; margin-top: 2rem;'>{analysis_result['disclaimer']}</p>", unsafe_allow_html=True)
+
+# Function to read a single query parameter on old and new Streamlit versions
+def get_query_param(name):
+    try:
+        value = st.query_params.get(name)
+    except AttributeError:
+        value = st.experimental_get_query_params().get(name)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
 # App header
 st.markdown("<h1 class='main-header'>AI Handwriting Analyzer</h1>", unsafe_allow_html=True)
 st.markdown("<p class='tagline'>Uncover personality insights hidden in your handwriting</p>", unsafe_allow_html=True)
 
+# Dashboard page: ?view=dashboard shows the crowd's statistics from the merged snapshots
+if get_query_param("view") == "dashboard":
+    population = get_population()
+    st.subheader(f"The crowd so far: {population.results} analyses")
+    if population.results:
+        variance = population.variance()
+        cols = st.columns(len(PERSONALITY_TRAITS))
+        for index, trait in enumerate(PERSONALITY_TRAITS):
+            cols[index].metric(trait, f"{population.mean[index]:.1f}", f"± {variance[index] ** 0.5:.1f}", delta_color="off")
+        
+        # Score distribution per trait from the fixed histogram bins
+        centers = (aggregates.HISTOGRAM_EDGES[:-1] + aggregates.HISTOGRAM_EDGES[1:]) / 2
+        fig = go.Figure()
+        for index, trait in enumerate(PERSONALITY_TRAITS):
+            fig.add_trace(go.Scatter(x=centers, y=population.histogram[index], name=trait, mode="lines", line_shape="hvh"))
+        fig.update_layout(xaxis_title="Score", yaxis_title="Participants", height=350, margin=dict(l=50, r=50, t=30, b=30))
+        st.plotly_chart(fig, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("<h4>Most Suggested Professions</h4>", unsafe_allow_html=True)
+            for profession, count in population.top_professions(10):
+                st.markdown(f"**{profession}**: {count}")
+        with col2:
+            st.markdown("<h4>Analyses per Hour</h4>", unsafe_allow_html=True)
+            hours, volumes, _ = population.hourly()
+            st.bar_chart({"analyses": dict(zip(hours[-48:], volumes[-48:].tolist()))})
+    else:
+        st.info("No analyses recorded yet.")
+    st.stop()
+
+# Result lookup page: ?submission=<id> re-displays a stored result without calling the model
+shared_submission_id = get_query_param("submission")
+if shared_submission_id:
+    stored_record = load_result(shared_submission_id, cache=shared_cache)
+    if stored_record is not None:
+        metrics.increment("cache_hits_total", cache="result_lookup")
+        with metrics.timed("render"):
+            render_analysis_result(stored_record["result"])
+        st.markdown(f"""
+        <div style="text-align: center; margin-top: 2rem;">
+            <a href="{APP_URL}" target="_self">Analyze your own handwriting</a>
+        </div>
+        """, unsafe_allow_html=True)
+        st.stop()
+    else:
+        job = job_queue.status(shared_submission_id) if job_queue is not None else None
+        if job is not None and job["status"] in ("queued", "running"):
+            st.info("This sample is waiting to be analyzed. Check back in a few minutes - you can submit a new sample below.")
+        else:
+            st.info("We couldn't find that result. It may still be processing - you can submit a new sample below.")
+
 # Create containers for better content organization
 input_container = st.container()
 results_container = st.container()
@@ -558,24 +994,32 @@ with input_container:
                     img_file_buffer = st.camera_input("Take a photo of your handwriting")
                     
                     if img_file_buffer is not None:
-                        # Save the captured image
                         bytes_data = img_file_buffer.getvalue()
-                        st.session_state.captured_image = bytes_data
-                        st.session_state.uploaded_file = None
-                        st.session_state.camera_on = False  # Turn off camera after taking photo
-                        
-                        # Process and upload the image
-                        filename, image_url = process_handwriting_image(bytes_data, st.session_state.user_name)
-                        
-                        # Display the captured image
-                        image = Image.open(io.BytesIO(bytes_data))
-                        st.image(image, caption=f"Handwriting Sample: {st.session_state.user_name}", use_container_width=True)
-                        
-                        # Show submission success message
-                        st.success(f"Submission successful! Your handwriting has been entered into the contest. Submission ID: {st.session_state.submission_id}")
                         
-                        # Auto-analyze
-                        analyze_handwriting_image(io.BytesIO(bytes_data))
+                        # Turn unusable photos away before uploading them or calling the model
+                        is_usable, quality_message = check_capture_quality(bytes_data)
+                        if not is_usable:
+                            st.error(quality_message)
+                        else:
+                            # Save the captured image
+                            st.session_state.captured_image = bytes_data
+                            st.session_state.uploaded_file = None
+                            st.session_state.camera_on = False  # Turn off camera after taking photo
+                            
+                            # One deadline covers upload and analysis
+                            deadline = Deadline(REQUEST_DEADLINE)
+                            
+                            # Process and upload the image
+                            filename, image_url = process_handwriting_image(bytes_data, st.session_state.user_name, deadline)
+                            
+                            # Display a preview of the captured image
+                            show_preview(bytes_data, st.session_state.user_name)
+                            
+                            # Show submission success message
+                            st.success(f"Submission successful! Your handwriting has been entered into the contest. Submission ID: {st.session_state.submission_id}")
+                            
+                            # Auto-analyze
+                            analyze_handwriting_image(io.BytesIO(bytes_data), deadline)
                     
                     # Button to cancel camera
                     if st.button("Cancel", key="cancel-camera"):
@@ -589,6 +1033,8 @@ with input_container:
                 st.markdown("<div class='input-section'>", unsafe_allow_html=True)
                 
                 uploaded_file = st.file_uploader("Choose an image...", type=SUPPORTED_FORMATS)
+                if uploaded_file is None and LOADTEST_MODE:
+                    uploaded_file = st.session_state.pop("loadtest_upload", None)
                 
                 st.markdown("""
                 <p style="text-align: center;"><strong>For best results:</strong></p>
@@ -601,22 +1047,38 @@ with input_container:
                 st.markdown("</div>", unsafe_allow_html=True)
                 
                 if uploaded_file is not None:
+                    # The uploader keeps its file across reruns; only submit and analyze it once
+                    upload_key = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+                    is_new_upload = upload_key != st.session_state.processed_upload
+                    
                     # Save the uploaded file
                     st.session_state.uploaded_file = uploaded_file
                     st.session_state.captured_image = None
                     
                     # Validate the image
-                    is_valid, error_message = validate_image(uploaded_file, SUPPORTED_FORMATS, MAX_IMAGE_SIZE)
+                    is_valid, error_message = True, ""
+                    if is_new_upload:
+                        with metrics.timed("validate"):
+                            is_valid, error_message = validate_image(uploaded_file, SUPPORTED_FORMATS, MAX_IMAGE_SIZE)
+                        
+                        # Turn unusable photos away before uploading them or calling the model
+                        if is_valid:
+                            is_valid, error_message = check_capture_quality(uploaded_file.getvalue())
                     
                     if not is_valid:
                         st.error(error_message)
                     else:
-                        # Process and upload the image
-                        filename, image_url = process_handwriting_image(uploaded_file, st.session_state.user_name)
+                        if is_new_upload:
+                            st.session_state.processed_upload = upload_key
+                            
+                            # One deadline covers upload and analysis
+                            deadline = Deadline(REQUEST_DEADLINE)
+                            
+                            # Process and upload the image
+                            filename, image_url = process_handwriting_image(uploaded_file, st.session_state.user_name, deadline)
                         
-                        # Display the image
-                        image = Image.open(uploaded_file)
-                        st.image(image, caption=f"Handwriting Sample: {st.session_state.user_name}", use_container_width=True)
+                        # Display a preview of the image
+                        show_preview(uploaded_file.getvalue(), st.session_state.user_name)
                         
                         # Show submission success message
                         st.markdown(f"""
@@ -627,8 +1089,9 @@ with input_container:
                         """, unsafe_allow_html=True)
                         
                         # Auto-analyze
-                        uploaded_file.seek(0)
-                        analyze_handwriting_image(uploaded_file)
+                        if is_new_upload:
+                            uploaded_file.seek(0)
+                            analyze_handwriting_image(uploaded_file, deadline)
     
     with right_col:
         if not st.session_state.analysis_result:  # Only show in the right column if no results yet
@@ -663,7 +1126,7 @@ with input_container:
                     app_url = "https://ai-handwriting-analysis-mjh.streamlit.app"
             
             # Create a QR code
-            qr_base64 = generate_qr_code(app_url)
+            qr_base64 = get_qr_code(app_url)
             
             # Display the QR code
             st.markdown(f"""
@@ -692,139 +1155,32 @@ with input_container:
 
 # IMPORTANT: Display results immediately after the input container and before contest info
 with results_container:
+    # Waiting for a worker to analyze the sample
+    if st.session_state.pending_job and st.session_state.analysis_result is None:
+        poll_pending_job()
+    
+    # Offer a retry when the last analysis ran out of time
+    if st.session_state.analysis_result is None and st.session_state.analysis_timed_out:
+        st.warning("The analysis is taking longer than usual. Your submission is saved - you can try the analysis again.")
+        if st.button("Try Analysis Again", use_container_width=True) and st.session_state.retry_image:
+            if analyze_handwriting_image(io.BytesIO(st.session_state.retry_image)):
+                st.rerun()
+    
     # Display results if analysis was performed
     if st.session_state.analysis_result is not None:
         analysis_result = st.session_state.analysis_result
         
-        st.markdown("<div class='result-container'>", unsafe_allow_html=True)
-        st.success("Analysis complete!")
+        with metrics.timed("render"):
+            render_analysis_result(analysis_result)
         
-        # Profession prediction headline
-        if "profession" in analysis_result and "primary" in analysis_result["profession"]:
+        # Permanent link to these results
+        if "error" not in analysis_result and st.session_state.submission_id:
+            result_link = f"{APP_URL}?submission={st.session_state.submission_id}"
             st.markdown(f"""
-            <div style="text-align: center; margin: 1rem 0 2rem 0;">
-                <div class="profession-title">Your handwriting suggests you'd make an excellent:</div>
-                <div class="profession-name">{analysis_result['profession']['primary']}</div>
-                <p style="font-style: italic; color: #555; max-width: 600px; margin: 0 auto; text-align: center;">
-                    {analysis_result['profession']['explanation']}
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        # Create tabs for the detailed results
-        tab1, tab2 = st.tabs(["Personality Traits", "Handwriting Features"])
-        
-        # Tab 1: Personality Traits with radar chart
-        with tab1:
-            # Create a radar chart for personality traits
-            trait_names = []
-            trait_scores = []
-            
-            for trait in PERSONALITY_TRAITS:
-                trait_key = trait.lower()
-                if trait_key in analysis_result["traits"]:
-                    trait_data = analysis_result["traits"][trait_key]
-                    trait_names.append(trait)
-                    # Convert score to int if it's a string
-                    if isinstance(trait_data["score"], str):
-                        try:
-                            score = int(trait_data["score"])
-                        except ValueError:
-                            score = float(trait_data["score"])
-                    else:
-                        score = trait_data["score"]
-                    trait_scores.append(score)
-            
-            # Add the first trait again to close the radar chart
-            if trait_names:  # Check if we have any trait names
-                trait_names.append(trait_names[0])
-                trait_scores.append(trait_scores[0])
-            
-            # Create the radar chart
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatterpolar(
-                r=trait_scores,
-                theta=trait_names,
-                fill='toself',
-                name='Personality Profile',
-                line_color='#4e89ae',
-                fillcolor='rgba(78, 137, 174, 0.3)'
-            ))
-            
-            fig.update_layout(
-                polar=dict(
-                    radialaxis=dict(
-                        visible=True,
-                        range=[0, 10]
-                    )
-                ),
-                showlegend=False,
-                height=350,
-                margin=dict(l=50, r=50, t=30, b=30)
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Personality profile summary
-            st.markdown("<h4>Your Personality Profile</h4>", unsafe_allow_html=True)
-            st.markdown(f"<p style='font-size: 1rem; padding: 1rem; background-color: #f5f7f9; border-radius: 8px; border-left: 3px solid #4e89ae;'>{analysis_result['profile']}</p>", unsafe_allow_html=True)
-            
-            # Display trait scores with progress bars
-            for trait in PERSONALITY_TRAITS:
-                trait_key = trait.lower()
-                if trait_key in analysis_result["traits"]:
-                    trait_data = analysis_result["traits"][trait_key]
-                    
-                    # Convert score to int if it's a string
-                    if isinstance(trait_data["score"], str):
-                        try:
-                            score = int(trait_data["score"])
-                        except ValueError:
-                            score = float(trait_data["score"])
-                    else:
-                        score = trait_data["score"]
-                    
-                    st.markdown(f"**{trait}**: {score}/10")
-                    st.progress(score / 10)
-                    st.markdown(f"<p style='font-size: 0.9rem; color: #666;'>{trait_data['evidence']}</p>", unsafe_allow_html=True)
-                    st.markdown("<hr style='margin: 1rem 0; opacity: 0.2;'>", unsafe_allow_html=True)
-        
-        # Tab 2: Handwriting Features
-        with tab2:
-            # Use a grid layout for features
-            col1, col2 = st.columns(2)
-            
-            # Split features between columns
-            features = list(HANDWRITING_FEATURES.items())
-            half = len(features) // 2
-            
-            for i, (feature, feature_info) in enumerate(features):
-                feature_key = feature.lower()
-                if feature_key in analysis_result["features"]:
-                    feature_data = analysis_result["features"][feature_key]
-                    
-                    # Add to first or second column based on index
-                    with col1 if i < half else col2:
-                        st.markdown(f"""
-                        <div class='feature-card'>
-                            <strong>{feature}:</strong> {feature_data['value']}
-                            <p style='font-size: 0.9rem; color: #666;'>{feature_data['description']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-        
-        # Sharing section
-        st.markdown("""
-        <div style="margin-top: 2rem; text-align: center;">
-            <h4>📱 Take a screenshot to share your results!</h4>
-            <p style="font-size: 0.9rem; color: #666; margin-top: 0.5rem;">
-                Share your personality profile with friends or on social media with #AIHandwritingAnalyzer
+            <p style="text-align: center; font-size: 0.9rem;">
+                Open your results again any time: <a href="{result_link}">{result_link}</a>
             </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Disclaimer
-        st.markdown(f"<p style='font-style: italic; font-size: 0.8rem; color: #999; text-align: center; margin-top: 2rem;'>{analysis_result['disclaimer']}</p>", unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
         
         # Reset button for trying again
         if st.button("Submit Another Sample", use_container_width=True):
@@ -834,6 +1190,10 @@ with results_container:
             st.session_state.uploaded_file = None
             st.session_state.camera_on = False
             st.session_state.submitted = False
+            st.session_state.analysis_timed_out = False
+            st.session_state.retry_image = None
+            st.session_state.pending_job = None
+            st.session_state.analysis_deferred = False
             st.rerun()
             
         st.markdown("</div>", unsafe_allow_html=True)
@@ -870,7 +1230,7 @@ with contest_container:
                     app_url = "https://ai-handwriting-analysis-mjh.streamlit.app"
             
             # Create a QR code
-            qr_base64 = generate_qr_code(app_url)
+            qr_base64 = get_qr_code(app_url)
             
             # Display a smaller QR code
             st.markdown(f"""
@@ -0,0 +1,213 @@
+"""
+Offline benchmark suite for the handwriting analysis path.
+
+Runs entirely locally: the model call goes to src.backends.FakeLatencyBackend,
+so no API key, network or quota is needed.
+
+Usage:
+    python benchmark.py                                  # run and print results
+    python benchmark.py --output bench_results.json      # also save results as JSON
+    python benchmark.py --baseline bench_baseline.json   # fail if a benchmark regressed
+    python benchmark.py --fake-latency 0.2 --fake-jitter 0.1 --response-shape fenced
+
+Exit status is 1 when any benchmark's p50 or p95 is more than --threshold
+(default 20%) slower than in the baseline file.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from config import SUPPORTED_FORMATS, MAX_IMAGE_SIZE
+from src.utils import encode_image_to_base64, validate_image, summarize_latencies
+from src.qr_generator import generate_qr_code
+from src.submissions import save_submission_data
+from src.gemini_handler import HandwritingAnalyzer
+from src.usage import UsageLedger
+from src.backends import FakeLatencyBackend
+from src.fake_gemini import RESPONSE_SHAPES
+from src.roi import crop_to_text
+from src.quality import check_image
+
+
+class FakeUploadedFile(io.BytesIO):
+    """Mimics Streamlit's UploadedFile (a BytesIO with name and size)"""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def make_handwriting_image(width=1600, height=1200, lines=5, seed=0):
+    """Draw a synthetic page of scribbled 'handwriting' and return it as JPEG bytes"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    line_height = height // (lines + 2)
+    for line in range(lines):
+        y = line_height * (line + 1)
+        x = width // 10
+        while x < width * 0.9:
+            points = [(x + i * 6, y + rng.randint(-line_height // 4, line_height // 4)) for i in range(8)]
+            draw.line(points, fill="black", width=3)
+            x += 60 + rng.randint(0, 30)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def make_photo(width=4000, height=3000, seed=0):
+    """A 12 MP 'phone photo': a handwritten page lying on a textured table, as JPEG bytes"""
+    rng = random.Random(seed)
+    table = Image.effect_noise((width, height), 24).point(lambda v: v // 3 + 60).convert("RGB")
+    page = Image.open(io.BytesIO(make_handwriting_image(1600, 2000, lines=8, seed=seed))).resize((1800, 2300))
+    table.paste(page, (width // 4 + rng.randint(-200, 200), height // 8))
+    buffer = io.BytesIO()
+    table.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def payload_size(image):
+    """Bytes the Gemini client sends for a PIL image (it re-encodes them as lossless WebP)"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", lossless=True)
+    return buffer.tell()
+
+
+def run_benchmark(func, iterations, warmup=3):
+    """Time func() over a number of iterations and return the latency summary"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return summarize_latencies(samples, elapsed=time.perf_counter() - start)
+
+
+def build_benchmarks(args, workdir):
+    """Return a dict of benchmark name -> zero-argument callable"""
+    image_bytes = make_handwriting_image()
+    image_base64 = encode_image_to_base64(io.BytesIO(image_bytes))
+
+    model = FakeLatencyBackend(
+        latency=args.fake_latency,
+        jitter=args.fake_jitter,
+        response_shape=args.response_shape,
+        seed=0
+    )
+    # A scratch ledger, so benchmark calls never count against the app's budgets
+    analyzer = HandwritingAnalyzer(backend=model, ledger=UsageLedger(os.path.join(workdir, "usage.sqlite3")))
+    response_text = model.generate_content(["prompt"]).text
+
+    # Pre-populate the submissions file so appends pay a realistic read/write cost
+    submissions_file = os.path.join(workdir, "submissions.json")
+    for i in range(args.existing_submissions):
+        save_submission_data(f"seed_{i}", f"user {i}", f"https://example.com/{i}.jpg", submissions_file)
+
+    photo_bytes = make_photo()
+    photo = Image.open(io.BytesIO(photo_bytes))
+    photo.load()
+
+    def bench_validate():
+        validate_image(FakeUploadedFile(image_bytes, "sample.jpg"), SUPPORTED_FORMATS, MAX_IMAGE_SIZE)
+
+    def bench_parse():
+        try:
+            analyzer._parse_response(response_text)
+        except ValueError:
+            pass
+
+    return {
+        "encode_image_to_base64": lambda: encode_image_to_base64(io.BytesIO(image_bytes)),
+        "validate_image": bench_validate,
+        "generate_qr_code": lambda: generate_qr_code("https://ai-handwriting-analysis-mjh.streamlit.app"),
+        "save_submission_data": lambda: save_submission_data("bench", "bench user", "https://example.com/bench.jpg", submissions_file),
+        "parse_response": bench_parse,
+        "analyze_handwriting": lambda: analyzer.analyze_handwriting(image_base64),
+        "crop_to_text": lambda: crop_to_text(photo),
+        "quality_check": lambda: check_image(photo_bytes),
+    }
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return a list of human-readable regressions against the baseline"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50", "p95"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                change = (current[metric] / previous[metric] - 1) * 100
+                regressions.append(
+                    f"{name} {metric}: {previous[metric] * 1000:.3f}ms -> {current[metric] * 1000:.3f}ms (+{change:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the handwriting analyzer")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed iterations per benchmark")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Fake model base latency in seconds")
+    parser.add_argument("--fake-jitter", type=float, default=0.0, help="Fake model random extra latency in seconds")
+    parser.add_argument("--response-shape", choices=RESPONSE_SHAPES, default="fenced", help="Shape of the fake model response")
+    parser.add_argument("--existing-submissions", type=int, default=200, help="Entries pre-loaded into the submissions file")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this results JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmarks = build_benchmarks(args, workdir)
+        if args.only:
+            benchmarks = {name: func for name, func in benchmarks.items() if name in args.only}
+
+        results = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "config": vars(args),
+            "benchmarks": {}
+        }
+
+        print(f"{'benchmark':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+        for name, func in benchmarks.items():
+            summary = run_benchmark(func, args.iterations)
+            results["benchmarks"][name] = summary
+            print(f"{name:<26}{summary['p50'] * 1000:>10.3f}{summary['p95'] * 1000:>10.3f}"
+                  f"{summary['p99'] * 1000:>10.3f}{summary['throughput']:>10.1f}")
+
+        if "crop_to_text" in benchmarks:
+            photo = Image.open(io.BytesIO(make_photo()))
+            full, cropped = payload_size(photo), payload_size(crop_to_text(photo)[0])
+            results["payload_bytes"] = {"full": full, "cropped": cropped}
+            print(f"\nModel payload for a 12 MP photo: {full / 1024:.0f} KB full, {cropped / 1024:.0f} KB cropped "
+                  f"({1 - cropped / full:.0%} smaller)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nREGRESSIONS (threshold {args.threshold * 100:.0f}%):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark the headless API against the Streamlit path.
+
+Starts api_server.py in a throwaway working directory with the fake model
+backend and drives it with keep-alive HTTP clients at each concurrency
+level. The same levels are then run through the Streamlit app with the
+load test harness. Every request sends a newly drawn image, so each one is
+analyzed instead of being answered from the stored result of an identical
+image. For each path it reports analyses per second and
+analyses per second per CPU core. Server CPU is read from /proc, so this
+needs Linux.
+
+Usage:
+    python benchmark_api.py
+    python benchmark_api.py --levels 1 8 32 --duration 20 --fake-latency 0.5
+    python benchmark_api.py --skip-streamlit
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import itertools
+import tempfile
+import subprocess
+
+import aiohttp
+
+import loadtest
+
+API_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_server.py")
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU seconds of a process, from /proc"""
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def wait_until_ready(url, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+
+async def drive_api(url, concurrency, duration, seeds):
+    """Run `concurrency` clients back-to-back for `duration` seconds; return latencies and errors"""
+    from benchmark import make_handwriting_image
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)  # Connections are kept alive and reused
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=120)) as session:
+        async def client(number):
+            while time.perf_counter() < deadline:
+                # Drawn off the event loop, so the other clients keep sending meanwhile
+                image_bytes = await asyncio.to_thread(make_handwriting_image, seed=next(seeds))
+                form = aiohttp.FormData()
+                form.add_field("name", f"Benchmark {number}")
+                form.add_field("image", image_bytes, filename="sample.jpg", content_type="image/jpeg")
+                start = time.perf_counter()
+                try:
+                    async with session.post(f"{url}/analyze", data=form) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors.append(f"HTTP {response.status}")
+                            continue
+                except aiohttp.ClientError as e:
+                    errors.append(type(e).__name__)
+                    continue
+                latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def benchmark_api(levels, duration, seeds, port):
+    from src.utils import summarize_latencies
+
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, API_PATH, "--host", "127.0.0.1", "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    try:
+        asyncio.run(wait_until_ready(url))
+        for concurrency in levels:
+            cpu_before = process_cpu_seconds(server.pid)
+            start = time.perf_counter()
+            latencies, errors = asyncio.run(drive_api(url, concurrency, duration, seeds))
+            elapsed = time.perf_counter() - start
+            cpu = process_cpu_seconds(server.pid) - cpu_before
+            summary = summarize_latencies(latencies, elapsed=elapsed)
+            results.append({
+                "concurrency": concurrency,
+                "per_second": summary["throughput"],
+                "per_core": summary["throughput"] / (cpu / elapsed) if cpu > 0 else 0.0,
+                "p50": summary["p50"],
+                "p95": summary["p95"],
+                "cpu_percent": cpu / elapsed * 100,
+                "errors": len(errors)
+            })
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def benchmark_streamlit(levels, duration, seeds, timeout):
+    loadtest.serialize_script_compilation()
+    results = []
+    for concurrency in levels:
+        result = loadtest.run_level(concurrency, duration, seeds, timeout)
+        cpu_fraction = result["cpu_percent"] / 100
+        results.append({
+            "concurrency": concurrency,
+            "per_second": result["sessions_per_second"],
+            "per_core": result["sessions_per_second"] / cpu_fraction if cpu_fraction > 0 else 0.0,
+            "p50": result["rerun_p50"],
+            "p95": result["rerun_p95"],
+            "cpu_percent": result["cpu_percent"],
+            "errors": result["errors"]
+        })
+    return results
+
+
+def print_results(title, results):
+    print(f"\n{title}")
+    print(f"{'clients':>8}{'per s':>9}{'per core':>10}{'p50 s':>8}{'p95 s':>8}{'cpu %':>8}{'errors':>8}")
+    for r in results:
+        print(f"{r['concurrency']:>8}{r['per_second']:>9.2f}{r['per_core']:>10.2f}{r['p50']:>8.2f}"
+              f"{r['p95']:>8.2f}{r['cpu_percent']:>8.0f}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the headless API against the Streamlit path")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16], help="Concurrent clients per level")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--fake-latency", type=float, default=1.0, help="Fake model latency in seconds")
+    parser.add_argument("--fake-jitter", type=float, default=0.5, help="Fake model random extra latency in seconds")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the API server")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-rerun timeout for the Streamlit path")
+    parser.add_argument("--skip-streamlit", action="store_true", help="Only benchmark the API")
+    args = parser.parse_args()
+    args.backend, args.recordings = "fake", None
+
+    loadtest.configure_environment(args)
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="benchmark_api_")
+    os.chdir(workdir)
+
+    # Both paths share the working directory and its result store, so they share the seeds too
+    seeds = itertools.count()
+    try:
+        print_results("Headless API (analyses)", benchmark_api(args.levels, args.duration, seeds, args.port))
+        if not args.skip_streamlit:
+            print_results("Streamlit app (sessions, one analysis each)",
+                          benchmark_streamlit(args.levels, args.duration, seeds, args.timeout))
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
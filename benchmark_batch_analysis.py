@@ -0,0 +1,75 @@
+"""
+Compare tokens and latency per sample for the three ways of analyzing images:
+
+- single: one analyze_handwriting call per image
+- pages:  all images as pages of one writer in one analyze_handwriting_pages call
+- batch:  all images as different writers in one analyze_handwriting_batch call
+
+Uses the backend selected by ANALYZER_BACKEND (the Gemini API by default,
+which needs GOOGLE_API_KEY and network access). Hedging is turned off so
+every mode makes exactly one call per request, and usage goes to a scratch
+ledger rather than the app's budgets.
+
+Usage:
+    python benchmark_batch_analysis.py image1.jpg image2.jpg [image3.jpg ...]
+"""
+import os
+import sys
+import time
+import tempfile
+
+from src.utils import encode_image_to_base64
+from src.gemini_handler import HandwritingAnalyzer
+from src.usage import UsageLedger
+
+
+def _tokens(analyzer):
+    """Return (prompt_tokens, output_tokens) of the analyzer's last call"""
+    usage = analyzer.last_usage or {}
+    return usage.get("prompt_tokens", 0), usage.get("output_tokens", 0)
+
+
+def run_single(analyzer, images):
+    prompt_tokens = output_tokens = 0
+    start = time.perf_counter()
+    for image in images:
+        analyzer.analyze_handwriting(image)
+        p, o = _tokens(analyzer)
+        prompt_tokens += p
+        output_tokens += o
+    return time.perf_counter() - start, prompt_tokens, output_tokens
+
+
+def run_pages(analyzer, images):
+    start = time.perf_counter()
+    analyzer.analyze_handwriting_pages(images)
+    elapsed = time.perf_counter() - start
+    return (elapsed,) + _tokens(analyzer)
+
+
+def run_batch(analyzer, images):
+    samples = {f"sample_{i}": image for i, image in enumerate(images)}
+    start = time.perf_counter()
+    analyzer.analyze_handwriting_batch(samples)
+    elapsed = time.perf_counter() - start
+    return (elapsed,) + _tokens(analyzer)
+
+
+def main(paths):
+    if len(paths) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    images = [encode_image_to_base64(path) for path in paths]
+    ledger = UsageLedger(os.path.join(tempfile.mkdtemp(prefix="benchmark_batch_"), "usage.sqlite3"))
+    analyzer = HandwritingAnalyzer(ledger=ledger, hedging=False)
+    count = len(images)
+
+    print(f"{'mode':<8}{'seconds/sample':>16}{'prompt tok/sample':>20}{'output tok/sample':>20}")
+    for mode, runner in [("single", run_single), ("pages", run_pages), ("batch", run_batch)]:
+        elapsed, prompt_tokens, output_tokens = runner(analyzer, images)
+        print(f"{mode:<8}{elapsed / count:>16.2f}{prompt_tokens / count:>20.0f}{output_tokens / count:>20.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
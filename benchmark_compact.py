@@ -0,0 +1,115 @@
+"""
+Compare the full and compact response formats: output tokens and seconds per analysis.
+
+Runs the same images through an analyzer in each response mode and reports
+prompt and output tokens (from usage_metadata), end-to-end seconds, cost,
+and the local expansion time of compact responses. Against the live API
+(--backend gemini, needs GOOGLE_API_KEY) the seconds are real generation
+time. The offline fake backend has a fixed latency and counts about four
+characters per token, so there the saving in seconds is estimated from
+the output tokens at --decode-rate.
+
+Usage:
+    python benchmark_compact.py                                   # offline, fake backend
+    python benchmark_compact.py --backend gemini --samples 10
+    python benchmark_compact.py --backend gemini --images a.jpg b.jpg --output compact.json
+"""
+import os
+import json
+import time
+import tempfile
+import base64
+import argparse
+import statistics
+
+from config import GEMINI_MODEL
+from src.backends import create_backend
+from src.compact import expand
+from src.fake_gemini import SAMPLE_COMPACT
+from src.gemini_handler import HandwritingAnalyzer
+from src.usage import UsageLedger
+from benchmark import make_handwriting_image
+
+
+def run_mode(mode, backend, images, ledger):
+    """Analyze every image in one response mode; returns per-analysis measurements"""
+    analyzer = HandwritingAnalyzer(backend=backend, ledger=ledger, response_mode=mode)
+    runs = []
+    for image in images:
+        start = time.perf_counter()
+        result = analyzer.analyze_handwriting(image)
+        seconds = time.perf_counter() - start
+        if "error" in result or analyzer.last_usage is None:
+            print(f"  {mode}: analysis failed: {result.get('error', 'no usage reported')}")
+            continue
+        runs.append({
+            "seconds": seconds,
+            "prompt_tokens": analyzer.last_usage["prompt_tokens"],
+            "output_tokens": analyzer.last_usage["output_tokens"],
+            "cost": analyzer.last_usage.get("cost", 0.0),
+        })
+    return runs
+
+
+def summarize(runs):
+    return {key: statistics.mean(run[key] for run in runs) for key in ("seconds", "prompt_tokens", "output_tokens", "cost")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compact response format against the full one")
+    parser.add_argument("--backend", choices=["fake", "gemini"], default="fake")
+    parser.add_argument("--model", default=GEMINI_MODEL, help="Model for the gemini backend")
+    parser.add_argument("--samples", type=int, default=5, help="Synthetic pages to analyze per mode")
+    parser.add_argument("--images", nargs="*", help="Analyze these image files instead of synthetic pages")
+    parser.add_argument("--decode-rate", type=float, default=150.0, help="Output tokens per second assumed for offline estimates")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.images:
+        images = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                images.append(base64.b64encode(f.read()).decode("utf-8"))
+    else:
+        images = [base64.b64encode(make_handwriting_image(seed=seed)).decode("utf-8") for seed in range(args.samples)]
+
+    backend = create_backend("fake" if args.backend == "fake" else "gemini", model_name=args.model)
+    # A scratch ledger, so benchmark calls never count against the app's budgets
+    ledger = UsageLedger(os.path.join(tempfile.mkdtemp(prefix="benchmark_compact_"), "usage.sqlite3"))
+
+    summary = {}
+    for mode in ("full", "compact"):
+        runs = run_mode(mode, backend, images, ledger)
+        if not runs:
+            raise SystemExit(f"No successful analyses in {mode} mode")
+        summary[mode] = summarize(runs)
+
+    iterations = 2000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        expand(SAMPLE_COMPACT)
+    expand_seconds = (time.perf_counter() - start) / iterations
+
+    full, compact = summary["full"], summary["compact"]
+    print(f"{'mode':<10}{'in tokens':>11}{'out tokens':>12}{'seconds':>10}{'cost $':>11}")
+    for mode, row in summary.items():
+        print(f"{mode:<10}{row['prompt_tokens']:>11.0f}{row['output_tokens']:>12.0f}{row['seconds']:>10.2f}{row['cost']:>11.6f}")
+
+    saved_tokens = full["output_tokens"] - compact["output_tokens"]
+    print(f"\nSaved per analysis: {saved_tokens:.0f} output tokens "
+          f"({saved_tokens / full['output_tokens']:.0%}), {full['prompt_tokens'] - compact['prompt_tokens']:.0f} prompt tokens, "
+          f"${full['cost'] - compact['cost']:.6f}")
+    if args.backend == "gemini":
+        print(f"Saved per analysis: {full['seconds'] - compact['seconds']:.2f}s measured")
+    else:
+        print(f"Saved per analysis: ~{saved_tokens / args.decode_rate:.2f}s estimated at {args.decode_rate:g} output tokens/s")
+    print(f"Local expansion: {expand_seconds * 1e6:.0f}us per compact response")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "modes": summary, "expand_seconds": expand_seconds}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Build the perceptual-hash index over all existing submissions in one batch.
+
+Every submission image is fetched and hashed (dHash + pHash) in a process
+pool, and the index file is rewritten atomically. Near-duplicate groups are
+reported so repeated entries can be excluded from the hourly contest.
+
+Usage:
+    python build_phash_index.py
+    python build_phash_index.py --radius 4 --processes 8
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from config import SUBMISSIONS_FILE, PHASH_INDEX_FILE, PHASH_RADIUS
+from src.phash import PerceptualIndex, compute_hashes
+from src.scoring import load_submission_image
+
+
+def _hash_submission(submission):
+    """Worker entry point: hash one submission image, never raising"""
+    try:
+        return submission["submission_id"], compute_hashes(load_submission_image(submission)), None
+    except Exception as e:
+        return submission.get("submission_id"), None, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the near-duplicate index over all submissions")
+    parser.add_argument("--submissions", default=SUBMISSIONS_FILE, help="Path of submissions.json")
+    parser.add_argument("--index", default=PHASH_INDEX_FILE, help="Index file to write")
+    parser.add_argument("--radius", type=int, default=PHASH_RADIUS, help="Hamming radius for near-duplicates")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    with open(args.submissions, "r") as f:
+        submissions = json.load(f)
+
+    start = time.perf_counter()
+    processes = args.processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(_hash_submission, submissions, chunksize=max(1, len(submissions) // (processes * 4))))
+
+    # Write a fresh index next to the old one and swap it in
+    temp_path = f"{args.index}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    index = PerceptualIndex(temp_path)
+    duplicates = {}
+    failed = 0
+    for submission_id, hashes, error in results:
+        if hashes is None:
+            failed += 1
+            print(f"Could not hash {submission_id}: {error}")
+            continue
+        matches = index.find_near_duplicates(hashes, args.radius)
+        if matches:
+            duplicates[submission_id] = matches[0]
+        index.add(submission_id, hashes)
+    os.makedirs(os.path.dirname(args.index) or ".", exist_ok=True)
+    os.replace(temp_path, args.index)
+    elapsed = time.perf_counter() - start
+
+    print(f"Indexed {len(index)} of {len(submissions)} submissions in {elapsed:.2f}s ({failed} failed)")
+    if duplicates:
+        print(f"\n{len(duplicates)} near-duplicates (radius {args.radius}):")
+        for submission_id, (distance, original) in duplicates.items():
+            print(f"  {submission_id} ~ {original} (distance {distance})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Enforce the temp/ disk budget and age policy, and compact the submission log.
+
+Deletes thumbnails, stored results, orphaned images and stale temp files,
+oldest first, until temp/ fits the budget. Images that were never uploaded
+and the results of contest winners are never deleted. Submissions older
+than the retention age are moved to the gzip archive.
+
+Usage:
+    python cleanup_temp.py --dry-run               # report only
+    python cleanup_temp.py --budget-mb 500 --days 14
+    python cleanup_temp.py --watch 600             # a pass every 10 minutes
+"""
+import time
+import argparse
+
+from config import TEMP_BUDGET_MB, RETENTION_DAYS, RETENTION_BATCH, RETENTION_GRACE_SECONDS
+from src.retention import RetentionManager
+
+
+def print_report(report, verbose=False):
+    mb = 1024 * 1024
+    action = "Would delete" if report["dry_run"] else "Deleted"
+    evicted = sum(report["evicted"].values())
+    print(f"temp/: {report['total_bytes'] / mb:.1f} MB of {report['budget_bytes'] / mb:.1f} MB budget"
+          f" -> {report['bytes_after'] / mb:.1f} MB")
+    print(f"{action} {evicted} files" + "".join(f", {count} {category}" for category, count in sorted(report["evicted"].items())))
+    if verbose:
+        for eviction in report["evictions"]:
+            print(f"  {eviction['reason']:<6} {eviction['size']:>10}  {eviction['path']}")
+    print(f"Protected: {report['protected']['unsynced']} un-uploaded images, {report['protected']['winner']} winner results,"
+          f" {report['protected']['recent']} files in the grace period")
+    compaction = report["compaction"]
+    print(f"Submission log: {compaction['archived']} archived, {compaction['duplicates']} duplicate records dropped")
+    if report["jobs_purged"]:
+        print(f"Job queue: {report['jobs_purged']} finished jobs purged")
+    if report["over_budget"]:
+        print("Still over budget: the remaining data is protected or the batch limit was reached")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the temp/ retention policy")
+    parser.add_argument("--budget-mb", type=int, default=TEMP_BUDGET_MB, help="Disk budget for temp/ in MB")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS, help="Evict files unused for this many days")
+    parser.add_argument("--batch", type=int, default=RETENTION_BATCH, help="Maximum files deleted per pass")
+    parser.add_argument("--grace-seconds", type=int, default=RETENTION_GRACE_SECONDS, help="Never delete files modified more recently")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    parser.add_argument("--verbose", action="store_true", help="List every file to delete")
+    parser.add_argument("--watch", type=int, metavar="SECONDS", help="Keep running a pass every SECONDS")
+    args = parser.parse_args()
+
+    manager = RetentionManager(budget_bytes=args.budget_mb * 1024 * 1024, max_age_days=args.days, batch=args.batch,
+                               grace_seconds=args.grace_seconds)
+    while True:
+        print_report(manager.run(dry_run=args.dry_run), args.verbose)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -57,4 +58,236 @@ HANDWRITING_FEATURES = {
     "Spacing": "The distance between letters and words",
     "Baseline": "How the text aligns horizontally",
     "Margins": "The space left at the edges of the page"
-}
\ No newline at end of file
+}
+
+# What each feature value means; compact responses are expanded with these
+FEATURE_VALUE_DESCRIPTIONS = {
+    "size": {
+        "small": "Letters are small and compact, taking little room on the line.",
+        "medium": "Letters are of moderate height and width.",
+        "large": "Letters are large and take up plenty of room on the line."
+    },
+    "slant": {
+        "left": "Letters lean back to the left.",
+        "vertical": "Letters stand upright with little slant.",
+        "right": "Letters lean forward to the right."
+    },
+    "pressure": {
+        "light": "Strokes are faint and thin.",
+        "medium": "Strokes are evenly dark without indenting the paper.",
+        "heavy": "Strokes are dark and thick, pressed firmly into the paper."
+    },
+    "spacing": {
+        "narrow": "Letters and words sit close together.",
+        "normal": "Words are separated by about one letter width.",
+        "wide": "Letters and words are spread well apart."
+    },
+    "baseline": {
+        "straight": "Lines stay level across the page.",
+        "ascending": "Lines rise towards the right.",
+        "descending": "Lines drop towards the right.",
+        "wavy": "Lines rise and fall across the page."
+    },
+    "margins": {
+        "narrow": "The writing runs close to the edges of the page.",
+        "normal": "Even space is left on both sides.",
+        "wide": "Generous space is left around the writing."
+    }
+}
+
+# Local storage for fallback images and submission records
+TEMP_FOLDER = "temp"
+SUBMISSIONS_FILE = os.path.join(TEMP_FOLDER, "submissions.json")
+
+# Analyzer backend: "gemini" (live API), "record" (live API, saving every
+# request/response pair), "replay" (serve saved pairs from disk) or "fake"
+# (canned response with simulated latency, no network)
+ANALYZER_BACKEND = os.getenv("ANALYZER_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
+# When False, replay answers unknown requests with a deterministic pick from the recordings
+REPLAY_STRICT = os.getenv("REPLAY_STRICT", "false").lower() == "true"
+# Replay with the latency observed when the pair was recorded
+REPLAY_LATENCY = os.getenv("REPLAY_LATENCY", "true").lower() == "true"
+FAKE_LATENCY = float(os.getenv("FAKE_LATENCY", "0.5"))
+FAKE_JITTER = float(os.getenv("FAKE_JITTER", "0.0"))
+# Share of fake model calls that fail, e.g. 1.0 to rehearse an outage
+FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0.0"))
+
+# Lets loadtest.py hand app.py an image through session state, because
+# Streamlit's test harness cannot drive the file uploader. Never enable in production.
+LOADTEST_MODE = os.getenv("LOADTEST_MODE", "false").lower() == "true"
+
+# Local metrics endpoint (/metrics, /metrics.json and /ready); 0 disables it.
+# One port per process: run several app processes on one host with distinct values
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Logging: level for the app's records, "json" or "text" output, and the
+# fraction of DEBUG records kept when DEBUG is enabled
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+# Model tiers, fastest fallback last; the first tier is the primary model
+MODEL_TIERS = [m.strip() for m in os.getenv("MODEL_TIERS", f"{GEMINI_MODEL},gemini-1.5-flash-8b").split(",") if m.strip()]
+# Seconds an analysis may take end to end before it is given up
+LATENCY_BUDGET = float(os.getenv("LATENCY_BUDGET", "25"))
+# Hedging: if the primary has not answered after the HEDGE_PERCENTILE of recent
+# primary latencies (HEDGE_DELAY seconds until enough are observed), send a
+# second request to the same model ("same") or the next tier ("next").
+# Off by default: a hedged analysis is billed twice, since the slower call
+# still completes, and both calls are recorded in the usage ledger, so they
+# count against HOURLY_BUDGET_USD/DAILY_BUDGET_USD and bring on budget
+# degradation sooner. "next" also means users get results from two models.
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "6"))
+HEDGE_TO = os.getenv("HEDGE_TO", "same")
+
+# Seconds from receiving a photo until its submission and analysis must be done;
+# every stage (upload, model call) gets what is left of it
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "40"))
+# Upper bound for the storage upload alone, so a slow upload leaves time to analyze
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "10"))
+
+# Stored analysis results, keyed by submission_id and image hash
+RESULTS_FOLDER = os.path.join(TEMP_FOLDER, "results")
+# Public URL of the app, used for result links
+APP_URL = os.getenv("APP_URL", "https://ai-handwriting-analysis-mjh.streamlit.app")
+
+# Hourly contest winners picked by rank_contest.py (hour_group -> submission_id)
+WINNERS_FILE = os.path.join(TEMP_FOLDER, "winners.json")
+
+# Perceptual-hash index of submission images for near-duplicate detection
+PHASH_INDEX_FILE = os.path.join(TEMP_FOLDER, "phash_index.jsonl")
+# Maximum Hamming distance (out of 64 bits) for two photos to count as the same page
+PHASH_RADIUS = int(os.getenv("PHASH_RADIUS", "6"))
+# Serve the earlier analysis for a near-duplicate instead of calling the model
+REUSE_DUPLICATE_ANALYSIS = os.getenv("REUSE_DUPLICATE_ANALYSIS", "false").lower() == "true"
+
+# Preview thumbnails, generated once per image and cached by content hash
+THUMBNAILS_FOLDER = os.path.join(TEMP_FOLDER, "thumbnails")
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_PREVIEW_WIDTH = 640
+THUMBNAIL_QUALITY = 80
+
+# Image storage: "auto" uses Cloudinary when credentials are set, the local object store otherwise
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "auto")
+CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "")
+CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY", "")
+CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "")
+# Content-addressed local object store (blobs sharded by hash prefix)
+OBJECTS_FOLDER = os.path.join(TEMP_FOLDER, "objects")
+
+# Retention of temp/: total byte budget and maximum age of evictable files
+TEMP_BUDGET_MB = int(os.getenv("TEMP_BUDGET_MB", "1024"))
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "30"))
+# Seconds between background retention passes in the app (0 disables them)
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "0"))
+# Maximum files deleted per pass, so a pass never stalls the disk
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "500"))
+# Files modified less than this many seconds ago are never evicted: an image is
+# stored before its submission record is written, so it looks orphaned meanwhile
+RETENTION_GRACE_SECONDS = int(os.getenv("RETENTION_GRACE_SECONDS", "3600"))
+# Submissions older than RETENTION_DAYS are moved here from submissions.json
+SUBMISSIONS_ARCHIVE_FILE = os.path.join(TEMP_FOLDER, "submissions_archive.jsonl.gz")
+
+# Cache shared by all app processes on this host: "sqlite" or "memory" (per process)
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", "sqlite")
+SHARED_CACHE_FILE = os.path.join(TEMP_FOLDER, "shared_cache.sqlite3")
+SHARED_CACHE_MB = int(os.getenv("SHARED_CACHE_MB", "256"))
+SHARED_CACHE_TTL = int(os.getenv("SHARED_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Where analysis runs: "inline" in the Streamlit script, or "queue" for the worker pool (analysis_worker.py)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "inline")
+JOB_QUEUE_FILE = os.path.join(TEMP_FOLDER, "jobs.sqlite3")
+# A claimed job not finished within this many seconds is handed to another worker
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs keep their result for the page polling for it; they are deleted after this many hours
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+# Seconds between result checks while a submission waits for its job
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+# Circuit breaker per model tier: after this many failed calls in a row the tier
+# is not called for CIRCUIT_RESET_TIMEOUT seconds, then one trial call decides
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# Store and forward: while the model is unavailable, submissions are put in the job
+# queue and analyzed by a background drainer (in inline mode) once it is back
+STORE_AND_FORWARD = os.getenv("STORE_AND_FORWARD", "true").lower() == "true"
+# Most queued analyses the drainer of one process starts per second, and how many it runs at once
+DRAIN_RATE = float(os.getenv("DRAIN_RATE", "0.5"))
+DRAIN_THREADS = int(os.getenv("DRAIN_THREADS", "2"))
+# Seconds between checks when the queue is empty or the model is still unavailable
+DRAIN_POLL_INTERVAL = float(os.getenv("DRAIN_POLL_INTERVAL", "2.0"))
+
+# Headless HTTP analysis API (api_server.py)
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+# Threads running blocking work (uploads, model calls) for the API's event loop
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "32"))
+
+# Running population statistics over analysis results
+AGGREGATES_FOLDER = os.path.join(TEMP_FOLDER, "aggregates")
+# Seconds between snapshots of this process's aggregates to disk
+AGGREGATES_SNAPSHOT_INTERVAL = int(os.getenv("AGGREGATES_SNAPSHOT_INTERVAL", "30"))
+# Participants needed before results show a percentile against the crowd
+AGGREGATES_MIN_CROWD = int(os.getenv("AGGREGATES_MIN_CROWD", "20"))
+
+# Warm up the model connection, storage client, QR code and chart rendering at
+# process start; /ready on the metrics port answers 503 until that is done
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Seconds each warm-up step may take before it is skipped
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+
+# Per-call token, cost and latency ledger of the model (see usage_report.py)
+USAGE_ACCOUNTING = os.getenv("USAGE_ACCOUNTING", "true").lower() == "true"
+USAGE_FILE = os.path.join(TEMP_FOLDER, "usage.sqlite3")
+# USD per million (prompt, output) tokens; add or override models with MODEL_PRICES='{"model": [0.1, 0.4]}'
+MODEL_PRICES = {
+    "gemini-1.5-flash": [0.075, 0.30],
+    "gemini-1.5-flash-8b": [0.0375, 0.15],
+    "gemini-1.5-pro": [1.25, 5.00],
+    **json.loads(os.getenv("MODEL_PRICES", "{}"))
+}
+# Spending limits in USD for the current clock hour and day (0 = no limit)
+HOURLY_BUDGET_USD = float(os.getenv("HOURLY_BUDGET_USD", "0"))
+DAILY_BUDGET_USD = float(os.getenv("DAILY_BUDGET_USD", "0"))
+# Share of a budget spent at which analyses degrade: first to the cheapest model
+# tier, then also to smaller images, then to the local fast path (no model call)
+BUDGET_CHEAP_MODEL_AT = float(os.getenv("BUDGET_CHEAP_MODEL_AT", "0.7"))
+BUDGET_SMALL_IMAGE_AT = float(os.getenv("BUDGET_SMALL_IMAGE_AT", "0.85"))
+BUDGET_LOCAL_AT = float(os.getenv("BUDGET_LOCAL_AT", "1.0"))
+# Longest side of images sent to the model once degraded to smaller images
+BUDGET_IMAGE_SIZE = int(os.getenv("BUDGET_IMAGE_SIZE", "768"))
+
+# Model response format: "full" (the model writes every description and evidence
+# string) or "compact" (feature values, scores and the personal text only; the rest
+# is filled in from FEATURE_VALUE_DESCRIPTIONS and TRAIT_DESCRIPTIONS)
+RESPONSE_MODE = os.getenv("RESPONSE_MODE", "full")
+
+# Crop photos to the handwriting before analysis (the stored upload stays uncropped)
+ROI_CROP = os.getenv("ROI_CROP", "true").lower() == "true"
+# Padding around the detected writing, as a share of the photo's width and height
+ROI_PADDING = float(os.getenv("ROI_PADDING", "0.03"))
+# Only crop when it removes at least this share of the photo's area
+ROI_MIN_SAVING = float(os.getenv("ROI_MIN_SAVING", "0.15"))
+
+# Local capture-quality gate: photos failing it are turned away with advice before any upload or model call
+QUALITY_GATE = os.getenv("QUALITY_GATE", "true").lower() == "true"
+# Width of the grayscale copy the quality measures are taken on
+QUALITY_WIDTH = int(os.getenv("QUALITY_WIDTH", "800"))
+# Minimum variance of the Laplacian over the writing (0..255 scale); lower is blurry
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "100"))
+# Minimum median brightness (0..255); lower is too dark
+QUALITY_MIN_BRIGHTNESS = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "70"))
+# Minimum spread between the 1st and 99th brightness percentiles (0..255); lower is washed out
+QUALITY_MIN_CONTRAST = float(os.getenv("QUALITY_MIN_CONTRAST", "60"))
+# Share of ink pixels in the writing: below the minimum there is too little writing,
+# above the maximum it is not writing on paper
+QUALITY_MIN_INK = float(os.getenv("QUALITY_MIN_INK", "0.01"))
+QUALITY_MAX_INK = float(os.getenv("QUALITY_MAX_INK", "0.4"))
+# Minimum number of text lines
+QUALITY_MIN_LINES = int(os.getenv("QUALITY_MIN_LINES", "2"))
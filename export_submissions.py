@@ -0,0 +1,55 @@
+"""
+Export submissions and their stored analyses to Parquet or CSV.
+
+Streams the submission archive and submissions.json in bounded chunks, so
+memory stays flat however many entries there are. Trait scores become
+float columns (trait_openness, ...) and feature values categorical
+columns (feature_slant, ...). With --incremental only rows added since
+the last run are written: a new Parquet part file, or rows appended to
+the CSV. A submission exported before its analysis was stored is written
+again once the analysis arrives; keep the row with analyzed_at set.
+
+Usage:
+    python export_submissions.py                                  # temp/export/ as Parquet
+    python export_submissions.py --format csv --output submissions.csv
+    python export_submissions.py --incremental --settle 300
+    python -c "import pandas as pd; print(pd.read_parquet('temp/export'))"
+"""
+import os
+import time
+import argparse
+import itertools
+
+from config import TEMP_FOLDER, SUBMISSIONS_FILE, SUBMISSIONS_ARCHIVE_FILE
+from src.submissions import iter_submissions, iter_archived_submissions
+from src.export import export
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export submissions and analyses to Parquet or CSV")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--output", help="Parquet directory or CSV file (default: temp/export or temp/export.csv)")
+    parser.add_argument("--incremental", action="store_true", help="Only export rows added since the last run")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="Rows held in memory at a time")
+    parser.add_argument("--settle", type=float, default=0, help="Leave out submissions younger than this many seconds")
+    parser.add_argument("--no-archive", action="store_true", help="Skip submissions moved to the archive")
+    parser.add_argument("--submissions", default=SUBMISSIONS_FILE, help="Path of submissions.json")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(TEMP_FOLDER, "export" + (".csv" if args.format == "csv" else ""))
+    sources = [iter_submissions(args.submissions)]
+    if not args.no_archive:
+        sources.insert(0, iter_archived_submissions(SUBMISSIONS_ARCHIVE_FILE))
+
+    start = time.perf_counter()
+    summary = export(itertools.chain(*sources), output, args.format, args.incremental,
+                     chunk_rows=args.chunk_rows, settle_seconds=args.settle)
+    elapsed = time.perf_counter() - start
+    if summary["rows"]:
+        print(f"Exported {summary['rows']} rows to {summary['path']} in {elapsed:.2f}s")
+    else:
+        print("Nothing new to export")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Concurrent-user load test for the Streamlit app.
+
+Drives simulated sessions through the real app.py script with Streamlit's
+testing harness (streamlit.testing.v1.AppTest): enter name, upload image,
+analyze, reset. The model is a fake or replay backend, so no network or
+quota is used, and images are stored in a throwaway working directory.
+
+For each concurrency level it reports sessions per second, rerun latency
+percentiles, CPU use and RSS. Together the levels form a capacity curve.
+
+Usage:
+    python loadtest.py                                   # levels 1 2 4 8 16, fake backend
+    python loadtest.py --levels 1 4 16 32 --duration 60
+    python loadtest.py --backend replay --recordings /path/to/recordings
+    python loadtest.py --fake-latency 2.0 --output capacity.json
+"""
+import argparse
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import itertools
+import threading
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def configure_environment(args):
+    """Set the environment read by config.py; must run before importing the app's modules"""
+    os.environ["LOADTEST_MODE"] = "true"
+    os.environ["ANALYZER_BACKEND"] = args.backend
+    os.environ["FAKE_LATENCY"] = str(args.fake_latency)
+    os.environ["FAKE_JITTER"] = str(args.fake_jitter)
+    if args.recordings:
+        os.environ["RECORDINGS_DIR"] = os.path.abspath(args.recordings)
+    # Fake and replayed calls cost nothing: keep them out of the usage ledger and its budgets
+    os.environ["USAGE_ACCOUNTING"] = "false"
+    # Keep load-test images off Cloudinary
+    for name in ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"):
+        os.environ[name] = ""
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class RssSampler(threading.Thread):
+    """Samples RSS in the background and keeps the peak"""
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def serialize_script_compilation():
+    """
+    Compile the app script one thread at a time
+
+    Every AppTest parses app.py itself, and CPython 3.11's parser can fail
+    with "AST constructor recursion depth mismatch" when several threads
+    parse at once. The real server compiles once per process, so this
+    error only exists in the harness.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = locked_get_bytecode
+
+
+def run_session(user_number, image_bytes, rerun_latencies, timeout):
+    """
+    Drive one user through the full flow
+
+    Returns:
+        str: None on success, otherwise a short error description
+    """
+    from streamlit.testing.v1 import AppTest
+    from benchmark import FakeUploadedFile
+
+    def timed_run(at):
+        start = time.perf_counter()
+        at.run(timeout=timeout)
+        rerun_latencies.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    # First page load
+    timed_run(at)
+
+    # Enter name
+    at.text_input[0].input(f"Load Test User {user_number}")
+    next(button for button in at.button if button.label == "Continue").click()
+    timed_run(at)
+
+    # Upload an image; the app validates, stores, submits and analyzes it
+    at.session_state["loadtest_upload"] = FakeUploadedFile(image_bytes, "loadtest.jpg")
+    timed_run(at)
+    if at.session_state["analysis_result"] is None:
+        return "no analysis result"
+
+    # Reset for the next sample
+    next(button for button in at.button if button.label == "Submit Another Sample").click()
+    timed_run(at)
+    return None
+
+
+def run_level(concurrency, duration, session_seeds, timeout):
+    """
+    Run `concurrency` simulated users back-to-back for `duration` seconds
+
+    Every session submits its own image, drawn from the next seed, so each one
+    reaches the model instead of reusing a stored result of the same photo.
+    """
+    from src.utils import summarize_latencies
+    from benchmark import make_handwriting_image
+
+    rerun_latencies = []
+    errors = []
+    completed = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user_loop(user_number):
+        while time.perf_counter() < deadline:
+            image_bytes = make_handwriting_image(seed=next(session_seeds))
+            try:
+                error = run_session(user_number, image_bytes, rerun_latencies, timeout)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            with lock:
+                if error:
+                    errors.append(error)
+                else:
+                    completed[0] += 1
+
+    sampler = RssSampler()
+    sampler.start()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    sampler.stop()
+
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    reruns = summarize_latencies(rerun_latencies, elapsed=elapsed)
+    return {
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "sessions": completed[0],
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "sessions_per_second": completed[0] / elapsed if elapsed > 0 else 0.0,
+        "rerun_p50": reruns["p50"],
+        "rerun_p95": reruns["p95"],
+        "rerun_p99": reruns["p99"],
+        "reruns_per_second": reruns["throughput"],
+        "cpu_percent": cpu_seconds / elapsed * 100 if elapsed > 0 else 0.0,
+        "peak_rss_mb": sampler.peak / 1024 / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the Streamlit app")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Concurrent users per step")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run each level")
+    parser.add_argument("--backend", choices=["fake", "replay"], default="fake", help="Analyzer backend to use")
+    parser.add_argument("--recordings", help="Recordings directory for the replay backend")
+    parser.add_argument("--fake-latency", type=float, default=1.0, help="Fake model latency in seconds")
+    parser.add_argument("--fake-jitter", type=float, default=0.5, help="Fake model random extra latency in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-rerun timeout in seconds")
+    parser.add_argument("--output", help="Write the capacity curve to this JSON file")
+    args = parser.parse_args()
+
+    configure_environment(args)
+
+    # Run inside a scratch directory so temp/ and submissions.json are not touched
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    os.chdir(workdir)
+
+    # Seeds are shared by all levels, so no image is submitted twice in a run
+    session_seeds = itertools.count()
+    serialize_script_compilation()
+
+    curve = []
+    print(f"{'users':>6}{'sess/s':>9}{'errors':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'cpu %':>8}{'rss MB':>9}")
+    try:
+        for concurrency in args.levels:
+            result = run_level(concurrency, args.duration, session_seeds, args.timeout)
+            curve.append(result)
+            print(f"{concurrency:>6}{result['sessions_per_second']:>9.2f}{result['errors']:>8}"
+                  f"{result['rerun_p50']:>8.2f}{result['rerun_p95']:>8.2f}{result['rerun_p99']:>8.2f}"
+                  f"{result['cpu_percent']:>8.0f}{result['peak_rss_mb']:>9.0f}")
+            for sample in result["error_samples"]:
+                print(f"        error: {sample}")
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        output = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "config": vars(args),
+            "capacity_curve": curve
+        }
+        output_path = os.path.join(original_cwd, args.output)
+        with open(output_path, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"\nCapacity curve saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
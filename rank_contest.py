@@ -0,0 +1,100 @@
+"""
+Rank the handwriting contest entries of an hour with the local quality scorer.
+
+Scores baseline straightness, letter-size consistency, spacing regularity,
+stroke smoothness and margin uniformity for every entry of the hour in one
+batched pass across all CPU cores. No API calls are made. Entries flagged as
+near-duplicates of an earlier submission are left out unless asked for.
+
+Usage:
+    python rank_contest.py                          # rank the current hour
+    python rank_contest.py --hour 2025-03-25-16 --top 5
+    python rank_contest.py --hour 2025-03-25-16 --record-winner
+    python rank_contest.py --all --json ranking.json
+"""
+import os
+import sys
+import json
+import itertools
+import time
+import argparse
+from datetime import datetime
+
+from config import SUBMISSIONS_FILE, SUBMISSIONS_ARCHIVE_FILE, WINNERS_FILE
+from src.submissions import iter_submissions, iter_archived_submissions
+from src.scoring import rank_submissions, METRIC_WEIGHTS
+
+
+def record_winner(hour_group, entry, winners_file=WINNERS_FILE):
+    """Save the winning submission of an hour to the winners file"""
+    winners = {}
+    if os.path.exists(winners_file):
+        with open(winners_file, "r") as f:
+            winners = json.load(f)
+    winners[hour_group] = {
+        "submission_id": entry["submission_id"],
+        "user_name": entry.get("user_name"),
+        "score": entry["score"]
+    }
+    temp_path = f"{winners_file}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(winners, f, indent=2)
+    os.replace(temp_path, winners_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank contest entries by local handwriting quality")
+    parser.add_argument("--hour", default=datetime.now().strftime("%Y-%m-%d-%H"), help="hour_group to rank (default: current hour)")
+    parser.add_argument("--all", action="store_true", help="Rank every submission regardless of hour")
+    parser.add_argument("--top", type=int, default=10, help="Number of entries to print")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: all CPUs)")
+    parser.add_argument("--submissions", default=SUBMISSIONS_FILE, help="Path of submissions.json")
+    parser.add_argument("--no-archive", action="store_true", help="Skip submissions moved to the archive")
+    parser.add_argument("--json", help="Write the full ranking to this JSON file")
+    parser.add_argument("--record-winner", action="store_true", help="Save the top entry to the winners file")
+    parser.add_argument("--include-duplicates", action="store_true", help="Also rank entries flagged as near-duplicates")
+    args = parser.parse_args()
+
+    sources = [iter_submissions(args.submissions)]
+    if not args.no_archive:
+        # Older hours have been moved to the archive by the retention pass
+        sources.insert(0, iter_archived_submissions(SUBMISSIONS_ARCHIVE_FILE))
+    submissions = list(itertools.chain.from_iterable(sources))
+
+    if not args.include_duplicates:
+        duplicates = [s for s in submissions if s.get("duplicate_of")]
+        if duplicates:
+            print(f"Skipping {len(duplicates)} near-duplicate entries (use --include-duplicates to rank them)")
+            submissions = [s for s in submissions if not s.get("duplicate_of")]
+
+    hour_group = None if args.all else args.hour
+    start = time.perf_counter()
+    ranking = rank_submissions(submissions, hour_group, args.processes)
+    elapsed = time.perf_counter() - start
+
+    if not ranking:
+        print(f"No submissions found for {hour_group or 'any hour'}")
+        sys.exit(1)
+
+    metric_names = list(METRIC_WEIGHTS)
+    print(f"Ranked {len(ranking)} entries for {hour_group or 'all hours'} in {elapsed:.2f}s\n")
+    print(f"{'#':>3}  {'score':>5}  {'submission':<22}{'name':<20}" + "".join(f"{name[:10]:>11}" for name in metric_names))
+    for position, entry in enumerate(ranking[:args.top], start=1):
+        if entry.get("score") is None:
+            print(f"{position:>3}  {'-':>5}  {entry['submission_id']:<22}{(entry.get('user_name') or '')[:19]:<20}  error: {entry['error']}")
+            continue
+        print(f"{position:>3}  {entry['score']:>5.2f}  {entry['submission_id']:<22}{(entry.get('user_name') or '')[:19]:<20}"
+              + "".join(f"{entry[name]:>11.2f}" for name in metric_names))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(ranking, f, indent=2)
+        print(f"\nRanking saved to {args.json}")
+
+    if args.record_winner and hour_group and ranking[0].get("score") is not None:
+        record_winner(hour_group, ranking[0])
+        print(f"\nWinner for {hour_group}: {ranking[0].get('user_name')} ({ranking[0]['submission_id']})")
+
+
+if __name__ == "__main__":
+    main()
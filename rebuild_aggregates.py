@@ -0,0 +1,60 @@
+"""
+Rebuild the population statistics from every stored analysis.
+
+Streams the submission archive and submissions.json, folds each stored
+result into one set of aggregates keyed by the submission's hour_group,
+and writes it as the base snapshot. Results reused from an earlier
+submission are not counted again. The per-process snapshots and earlier
+merged bases are removed, since the base already counts their results, so
+stop the app, the API and the workers before running this.
+
+Usage:
+    python rebuild_aggregates.py
+    python rebuild_aggregates.py --no-archive
+"""
+import os
+import glob
+import time
+import argparse
+import itertools
+
+from config import SUBMISSIONS_FILE, SUBMISSIONS_ARCHIVE_FILE, AGGREGATES_FOLDER
+from src.submissions import iter_submissions, iter_archived_submissions
+from src.result_store import load_result
+from src.aggregates import Aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the population statistics from stored analyses")
+    parser.add_argument("--submissions", default=SUBMISSIONS_FILE, help="Path of submissions.json")
+    parser.add_argument("--no-archive", action="store_true", help="Skip the archived submissions")
+    parser.add_argument("--output", default=AGGREGATES_FOLDER, help="Aggregates directory")
+    args = parser.parse_args()
+
+    sources = [iter_submissions(args.submissions)]
+    if not args.no_archive:
+        sources.insert(0, iter_archived_submissions(SUBMISSIONS_ARCHIVE_FILE))
+
+    start = time.perf_counter()
+    population = Aggregates()
+    seen = set()
+    for submission in itertools.chain(*sources):
+        submission_id = submission.get("submission_id")
+        if not submission_id or submission_id in seen:
+            continue
+        seen.add(submission_id)
+        stored = load_result(submission_id)
+        if stored is not None and not stored.get("reused") and "error" not in stored["result"]:
+            population.add(stored["result"], submission.get("hour_group"))
+
+    os.makedirs(args.output, exist_ok=True)
+    population.save(os.path.join(args.output, "base.npz"))
+    stale = glob.glob(os.path.join(args.output, "process-*.npz")) + glob.glob(os.path.join(args.output, "base-*.npz"))
+    for path in stale:
+        os.remove(path)
+    print(f"Folded {population.results} results from {len(seen)} submissions in {time.perf_counter() - start:.2f}s "
+          f"(removed {len(stale)} earlier snapshots)")
+
+
+if __name__ == "__main__":
+    main()
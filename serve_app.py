@@ -0,0 +1,48 @@
+"""
+Start the Streamlit app with the process warmed up before the first visitor.
+
+Streamlit only runs app.py when a session connects, so warming up from
+app.py alone lands on the first visitor. This launcher starts the metrics
+server and the warm-up (model connection, storage client, QR code, a
+sample chart) in this process, then hands over to `streamlit run`. Point
+the load balancer's readiness check at /ready on the metrics port: it
+answers 503 until the warm-up is done. Set METRICS_HOST=0.0.0.0 if the
+load balancer is not on this host.
+
+To run several app processes on one host, give each its own METRICS_PORT
+as well as its own Streamlit port. The launcher exits at once if the
+metrics port is taken, since that process could never report ready.
+
+Usage:
+    python serve_app.py
+    python serve_app.py --server.port 8501 --server.headless true
+    METRICS_PORT=9465 python serve_app.py --server.port 8502    # a second process
+"""
+import sys
+
+from streamlit.web import cli as stcli
+
+from config import METRICS_PORT, METRICS_HOST
+from src.logging_setup import configure_logging
+from src import metrics
+from src.gemini_handler import HandwritingAnalyzer
+from src.storage import create_storage
+from src.shared_cache import create_cache
+from src.warmup import start_warmup
+
+
+def main():
+    configure_logging()
+    try:
+        metrics.start_metrics_server(METRICS_PORT, METRICS_HOST, required=True)
+    except OSError:
+        sys.exit(f"Metrics port {METRICS_PORT} is in use; set METRICS_PORT to a free port for this process")
+    # Model clients, loaded modules and plotly's schema are process-wide, so the
+    # objects app.py creates for its sessions find them warm
+    start_warmup(analyzer=HandwritingAnalyzer(), storage=create_storage(), cache=create_cache(), render=True)
+    sys.argv = ["streamlit", "run", "app.py", *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
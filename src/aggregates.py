@@ -0,0 +1,341 @@
+import os
+import glob
+import atexit
+import uuid
+import socket
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from config import PERSONALITY_TRAITS, AGGREGATES_FOLDER
+
+logger = logging.getLogger(__name__)
+
+
+def trait_key(name):
+    """Normalize a trait name ("Emotional Stability", "emotional_stability") to its key"""
+    return name.lower().replace(" ", "_")
+
+
+TRAITS = [trait_key(trait) for trait in PERSONALITY_TRAITS]
+_TRAIT_INDEX = {trait: index for index, trait in enumerate(TRAITS)}
+
+# Fixed histogram bins over the 0..10 score scale (half-point wide)
+HISTOGRAM_EDGES = np.linspace(0.0, 10.0, 21)
+_BINS = len(HISTOGRAM_EDGES) - 1
+
+
+class Aggregates:
+    """
+    Running statistics over trait scores, overall and per hour_group
+
+    Per trait it keeps the count, mean and M2 (Welford's algorithm, so the
+    variance is exact without keeping any scores) and a fixed-bin
+    histogram; per hour_group the same count/mean/M2; plus profession
+    frequencies. Everything except the profession counter lives in small
+    NumPy arrays, and two Aggregates merge exactly (Chan et al.), which is
+    how snapshots from several processes are combined.
+    """
+    def __init__(self):
+        traits = len(TRAITS)
+        self.count = np.zeros(traits, dtype=np.int64)
+        self.mean = np.zeros(traits, dtype=np.float64)
+        self.m2 = np.zeros(traits, dtype=np.float64)
+        self.histogram = np.zeros((traits, _BINS), dtype=np.int64)
+        self.hours = {}          # hour_group -> row in the per-hour arrays
+        self.hour_count = np.zeros((0, traits), dtype=np.int64)
+        self.hour_mean = np.zeros((0, traits), dtype=np.float64)
+        self.hour_m2 = np.zeros((0, traits), dtype=np.float64)
+        self.professions = Counter()
+        self.results = 0
+
+    @staticmethod
+    def scores_of(result):
+        """Trait scores of an analysis result as an array, NaN where missing"""
+        scores = np.full(len(TRAITS), np.nan)
+        for name, trait in (result.get("traits") or {}).items():
+            index = _TRAIT_INDEX.get(trait_key(name))
+            if index is None or not isinstance(trait, dict):
+                continue
+            try:
+                scores[index] = float(trait.get("score"))
+            except (TypeError, ValueError):
+                continue
+        return scores
+
+    def _hour_row(self, hour_group):
+        row = self.hours.get(hour_group)
+        if row is None:
+            row = self.hours[hour_group] = len(self.hours)
+            zeros = np.zeros((1, len(TRAITS)))
+            self.hour_count = np.vstack([self.hour_count, zeros.astype(np.int64)])
+            self.hour_mean = np.vstack([self.hour_mean, zeros])
+            self.hour_m2 = np.vstack([self.hour_m2, zeros])
+        return row
+
+    @staticmethod
+    def _welford(count, mean, m2, scores, present):
+        """One Welford step for every trait with a score, in place"""
+        count[present] += 1
+        delta = scores[present] - mean[present]
+        mean[present] += delta / count[present]
+        m2[present] += delta * (scores[present] - mean[present])
+
+    def add(self, result, hour_group=None):
+        """
+        Fold one analysis result into the statistics
+
+        Args:
+            result: Analysis result dict (with "traits" and "profession")
+            hour_group: Contest hour of the submission (defaults to the current hour)
+        """
+        scores = self.scores_of(result)
+        present = ~np.isnan(scores)
+        self.results += 1
+        self._welford(self.count, self.mean, self.m2, scores, present)
+        bins = np.clip(np.searchsorted(HISTOGRAM_EDGES, scores[present], side="right") - 1, 0, _BINS - 1)
+        self.histogram[np.flatnonzero(present), bins] += 1
+
+        row = self._hour_row(hour_group or datetime.now().strftime("%Y-%m-%d-%H"))
+        self._welford(self.hour_count[row], self.hour_mean[row], self.hour_m2[row], scores, present)
+
+        profession = (result.get("profession") or {}).get("primary")
+        if profession:
+            self.professions[profession.strip().title()] += 1
+
+    @staticmethod
+    def _merge_moments(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+        count = count_a + count_b
+        safe = np.maximum(count, 1)
+        delta = mean_b - mean_a
+        mean = mean_a + delta * count_b / safe
+        m2 = m2_a + m2_b + delta ** 2 * count_a * count_b / safe
+        return count, mean, m2
+
+    def merge(self, other):
+        """Add another Aggregates into this one"""
+        self.count, self.mean, self.m2 = self._merge_moments(
+            self.count, self.mean, self.m2, other.count, other.mean, other.m2)
+        self.histogram += other.histogram
+        for hour_group, other_row in other.hours.items():
+            row = self._hour_row(hour_group)
+            (self.hour_count[row], self.hour_mean[row], self.hour_m2[row]) = self._merge_moments(
+                self.hour_count[row], self.hour_mean[row], self.hour_m2[row],
+                other.hour_count[other_row], other.hour_mean[other_row], other.hour_m2[other_row])
+        self.professions.update(other.professions)
+        self.results += other.results
+        return self
+
+    def variance(self):
+        """Sample variance per trait (0 where fewer than two scores)"""
+        return np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), 0.0)
+
+    def percentile(self, trait, score):
+        """
+        Share of participants scoring below `score` on a trait, counting ties as half
+
+        Args:
+            trait: Trait name or key
+            score: The user's score
+
+        Returns:
+            float: Percentile 0..100, or None if the trait is unknown or nobody was counted
+        """
+        index = _TRAIT_INDEX.get(trait_key(trait))
+        if index is None or not self.count[index]:
+            return None
+        histogram = self.histogram[index]
+        bin_index = int(np.clip(np.searchsorted(HISTOGRAM_EDGES, float(score), side="right") - 1, 0, _BINS - 1))
+        below = histogram[:bin_index].sum() + 0.5 * histogram[bin_index]
+        return float(100.0 * below / self.count[index])
+
+    def top_professions(self, k=10):
+        return self.professions.most_common(k)
+
+    def hourly(self):
+        """Per-hour result counts and trait means, oldest hour first"""
+        hours = sorted(self.hours)
+        rows = [self.hours[hour] for hour in hours]
+        return hours, self.hour_count[rows].max(axis=1) if rows else np.zeros(0, dtype=np.int64), self.hour_mean[rows]
+
+    def save(self, path):
+        """Write the arrays to an .npz file atomically"""
+        hours = sorted(self.hours, key=self.hours.get)
+        names = list(self.professions)
+        # Unique per writer and outside the snapshot globs, so a half-written file is never read
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                traits=np.array(TRAITS), count=self.count, mean=self.mean, m2=self.m2, histogram=self.histogram,
+                hours=np.array(hours, dtype=str), hour_count=self.hour_count, hour_mean=self.hour_mean, hour_m2=self.hour_m2,
+                profession_names=np.array(names, dtype=str),
+                profession_counts=np.array([self.professions[name] for name in names], dtype=np.int64),
+                results=np.array(self.results)
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        aggregates = cls()
+        with np.load(path) as data:
+            if list(data["traits"]) != TRAITS:
+                raise ValueError(f"{path} was written for different traits")
+            aggregates.count, aggregates.mean, aggregates.m2 = data["count"], data["mean"], data["m2"]
+            aggregates.histogram = data["histogram"]
+            aggregates.hours = {str(hour): row for row, hour in enumerate(data["hours"])}
+            aggregates.hour_count, aggregates.hour_mean, aggregates.hour_m2 = data["hour_count"], data["hour_mean"], data["hour_m2"]
+            aggregates.professions = Counter(dict(zip(map(str, data["profession_names"]), map(int, data["profession_counts"]))))
+            aggregates.results = int(data["results"])
+        return aggregates
+
+
+# Snapshot files: the rebuilt base, merged bases and one per process
+SNAPSHOT_PATTERNS = ("base.npz", "base-*.npz", "process-*.npz")
+
+# This process's statistics since it started; each process snapshots to its own file
+_lock = threading.Lock()
+_local = Aggregates()
+_snapshot_id = uuid.uuid4().hex[:12]
+_dirty = False
+_snapshot_thread = None
+
+
+def _snapshot_name():
+    # Host and pid tell later processes whether the writer is still running
+    return f"process-{socket.gethostname()}-{os.getpid()}-{_snapshot_id}.npz"
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Someone else's process
+    return True
+
+
+def record(result, hour_group=None):
+    """Fold a completed analysis into this process's statistics"""
+    global _dirty
+    if not result or "error" in result:
+        return
+    with _lock:
+        _local.add(result, hour_group)
+        _dirty = True
+
+
+def snapshot(aggregates_dir=AGGREGATES_FOLDER):
+    """Write this process's statistics to its snapshot file if they changed"""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        os.makedirs(aggregates_dir, exist_ok=True)
+        _local.save(os.path.join(aggregates_dir, _snapshot_name()))
+        _dirty = False
+
+
+def merge_stale_snapshots(aggregates_dir=AGGREGATES_FOLDER):
+    """
+    Fold the snapshots of processes that have exited into one base file
+
+    Every process writes its own snapshot, so without this the directory
+    would gain a file for each process ever started. Snapshots written on
+    this host by a process that is gone are claimed by renaming them (so two
+    processes starting together never merge the same file), merged with the
+    earlier merged bases and saved as a new base-<id>.npz. Process liveness
+    is only checked on POSIX; elsewhere nothing is merged.
+
+    Returns:
+        int: Snapshot files merged
+    """
+    if os.name != "posix":
+        return 0
+    prefix = f"process-{socket.gethostname()}"
+    stale = []
+    for path in glob.glob(os.path.join(aggregates_dir, "process-*.npz")):
+        try:
+            owner, pid, _ = os.path.basename(path)[:-len(".npz")].rsplit("-", 2)
+            pid = int(pid)
+        except ValueError:
+            continue
+        if owner == prefix and pid != os.getpid() and not _running(pid):
+            stale.append(path)
+    if not stale:
+        return 0
+
+    claimed = []
+    for path in stale + glob.glob(os.path.join(aggregates_dir, "base-*.npz")):
+        claim = f"{path}.{_snapshot_id}.claimed"
+        try:
+            os.rename(path, claim)
+        except OSError:
+            continue  # Claimed by another process
+        claimed.append(claim)
+
+    merged = Aggregates()
+    for claim in claimed:
+        try:
+            merged.merge(Aggregates.load(claim))
+        except Exception as e:
+            logger.warning(f"Dropping unreadable aggregates snapshot {claim}: {str(e)}")
+    merged.save(os.path.join(aggregates_dir, f"base-{uuid.uuid4().hex[:12]}.npz"))
+    for claim in claimed:
+        os.remove(claim)
+    return len(claimed)
+
+
+def start_snapshots(interval, aggregates_dir=AGGREGATES_FOLDER):
+    """
+    Snapshot every `interval` seconds from a daemon thread and at exit (started once per process)
+
+    Snapshots left by processes that have exited are merged first. The
+    directory is resolved now, so a later chdir (as in the load test
+    harness) cannot send the snapshots elsewhere.
+    """
+    global _snapshot_thread
+    aggregates_dir = os.path.abspath(aggregates_dir)
+    with _lock:
+        if _snapshot_thread is not None:
+            return
+        try:
+            merge_stale_snapshots(aggregates_dir)
+        except Exception:
+            logger.exception("Could not merge stale aggregates snapshots")
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    snapshot(aggregates_dir)
+                except Exception:
+                    logger.exception("Could not snapshot aggregates")
+        _snapshot_thread = threading.Thread(target=loop, name="aggregates-snapshot", daemon=True)
+        _snapshot_thread.start()
+    atexit.register(snapshot, aggregates_dir)
+
+
+def load_population(aggregates_dir=AGGREGATES_FOLDER):
+    """
+    Merge the snapshots of all processes (and the rebuilt base, if any)
+
+    The cost depends on the number of snapshot files, not on the number of
+    results, so dashboards can call this freely.
+
+    Returns:
+        Aggregates: The combined statistics
+    """
+    population = Aggregates()
+    paths = [path for pattern in SNAPSHOT_PATTERNS for path in glob.glob(os.path.join(aggregates_dir, pattern))]
+    for path in sorted(paths):
+        try:
+            population.merge(Aggregates.load(path))
+        except Exception as e:
+            # A damaged file (e.g. zipfile.BadZipFile) must not take the results page down
+            logger.warning(f"Skipping aggregates snapshot {path}: {str(e)}")
+    return population
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import hashlib
+
+import google.generativeai as genai
+from PIL import Image
+
+from config import (
+    ANALYZER_BACKEND,
+    GEMINI_MODEL,
+    RECORDINGS_DIR,
+    REPLAY_STRICT,
+    REPLAY_LATENCY,
+    FAKE_LATENCY,
+    FAKE_JITTER,
+    FAKE_ERROR_RATE
+)
+from src.fake_gemini import FakeGenerativeModel, FakeResponse, FakeUsageMetadata
+
+
+def request_key(parts, model_name=""):
+    """
+    Compute a stable key for a model request
+
+    Args:
+        parts: List of prompt strings and PIL images
+        model_name: Name of the model the request is sent to
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request
+    """
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for part in parts:
+        if isinstance(part, Image.Image):
+            digest.update(b"image:")
+            digest.update(f"{part.mode}{part.size}".encode("utf-8"))
+            digest.update(part.tobytes())
+        else:
+            digest.update(b"text:")
+            digest.update(str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalyzerBackend:
+    """
+    Interface for the model behind HandwritingAnalyzer
+
+    A backend takes the request parts (prompt strings and PIL images) and
+    returns a response object with a .text attribute and, optionally, a
+    .usage_metadata attribute like the Gemini client's responses.
+
+    A backend given a timeout must give up (raise) within that many seconds,
+    so a hung call never holds a worker thread past the request's deadline.
+    """
+    name = "base"
+    model_name = ""
+
+    def generate_content(self, parts, timeout=None):
+        raise NotImplementedError
+
+    def warm_up(self, timeout=None):
+        """Open connections ahead of the first request (nothing to do for local backends)"""
+
+
+class GeminiBackend(AnalyzerBackend):
+    """Live Google Gemini API"""
+    name = "gemini"
+
+    def __init__(self, model_name=GEMINI_MODEL, api_key=None):
+        genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, parts, timeout=None):
+        if timeout is None:
+            return self.model.generate_content(parts)
+        # Bounds the underlying HTTP call, so the socket is closed on timeout
+        return self.model.generate_content(parts, request_options={"timeout": timeout})
+
+    def warm_up(self, timeout=None):
+        # Counting tokens costs nothing but resolves DNS and opens the TLS connection
+        self.model.count_tokens("ping", request_options={"timeout": timeout or 10})
+
+
+class FakeLatencyBackend(AnalyzerBackend):
+    """Canned response after a simulated delay; no network"""
+    name = "fake"
+
+    def __init__(self, latency=FAKE_LATENCY, jitter=FAKE_JITTER, response_shape="fenced", error_rate=FAKE_ERROR_RATE, seed=None):
+        self.model_name = "fake"
+        self.model = FakeGenerativeModel(latency, jitter, response_shape, error_rate, seed)
+
+    def generate_content(self, parts, timeout=None):
+        return self.model.generate_content(parts, timeout=timeout)
+
+
+class RecordingBackend(AnalyzerBackend):
+    """Wraps another backend and saves every request/response pair to disk"""
+    name = "record"
+
+    def __init__(self, backend, recordings_dir=RECORDINGS_DIR):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.recordings_dir = recordings_dir
+        os.makedirs(recordings_dir, exist_ok=True)
+
+    def warm_up(self, timeout=None):
+        self.backend.warm_up(timeout)
+
+    def generate_content(self, parts, timeout=None):
+        key = request_key(parts, self.model_name)
+        start = time.perf_counter()
+        response = self.backend.generate_content(parts, timeout=timeout)
+        latency = time.perf_counter() - start
+
+        usage = getattr(response, "usage_metadata", None)
+        record = {
+            "key": key,
+            "model": self.model_name,
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "latency": latency,
+            "text": response.text,
+            "usage": {
+                "prompt_token_count": getattr(usage, "prompt_token_count", 0),
+                "candidates_token_count": getattr(usage, "candidates_token_count", 0)
+            }
+        }
+
+        # Write to a temp file first so a concurrent replay never reads half a record
+        path = os.path.join(self.recordings_dir, f"{key}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(temp_path, path)
+
+        return response
+
+
+class ReplayBackend(AnalyzerBackend):
+    """
+    Serves recorded request/response pairs from disk
+
+    Args:
+        recordings_dir: Directory written by RecordingBackend
+        strict: Raise KeyError for requests that were never recorded. Otherwise
+            pick a recording deterministically from the request key, so load
+            tests with new images still get realistic responses.
+        simulate_latency: Sleep for the latency observed when recording
+    """
+    name = "replay"
+
+    def __init__(self, recordings_dir=RECORDINGS_DIR, strict=REPLAY_STRICT, simulate_latency=REPLAY_LATENCY, model_name=GEMINI_MODEL):
+        self.recordings_dir = recordings_dir
+        self.strict = strict
+        self.simulate_latency = simulate_latency
+        self.model_name = model_name
+        self.recordings = {}
+
+        if os.path.isdir(recordings_dir):
+            for filename in sorted(os.listdir(recordings_dir)):
+                if not filename.endswith(".json"):
+                    continue
+                with open(os.path.join(recordings_dir, filename), "r") as f:
+                    record = json.load(f)
+                self.recordings[record["key"]] = record
+        self._ordered_keys = sorted(self.recordings)
+
+        if not self.recordings:
+            raise ValueError(f"No recordings found in {recordings_dir}. Record some with ANALYZER_BACKEND=record first.")
+
+    def generate_content(self, parts, timeout=None):
+        key = request_key(parts, self.model_name)
+        record = self.recordings.get(key)
+        if record is None:
+            if self.strict:
+                raise KeyError(f"No recording for request {key}")
+            record = self.recordings[self._ordered_keys[int(key, 16) % len(self._ordered_keys)]]
+
+        if self.simulate_latency:
+            latency = record.get("latency", 0.0)
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"Replayed request took longer than the {timeout:.1f}s timeout")
+            time.sleep(latency)
+
+        usage = record.get("usage", {})
+        return FakeResponse(
+            record["text"],
+            FakeUsageMetadata(usage.get("prompt_token_count", 0), usage.get("candidates_token_count", 0))
+        )
+
+
+def create_backend(name=ANALYZER_BACKEND, model_name=GEMINI_MODEL):
+    """
+    Create the analyzer backend selected by config
+
+    Args:
+        name: "gemini", "record", "replay" or "fake"
+        model_name: Gemini model used by the live and recording backends
+
+    Returns:
+        AnalyzerBackend: The backend instance
+    """
+    if name == "gemini":
+        return GeminiBackend(model_name)
+    if name == "record":
+        return RecordingBackend(GeminiBackend(model_name))
+    if name == "replay":
+        return ReplayBackend(model_name=model_name)
+    if name == "fake":
+        return FakeLatencyBackend()
+    raise ValueError(f"Unknown analyzer backend: {name}. Use gemini, record, replay or fake")
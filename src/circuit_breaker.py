@@ -0,0 +1,99 @@
+import time
+import threading
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+from src import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Published as the circuit_state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ModelUnavailableError(RuntimeError):
+    """
+    Raised when the model is not called because its circuit breakers are open
+
+    Args:
+        message: Optional error message
+    """
+    def __init__(self, message=None):
+        super().__init__(message or "The analysis model is unavailable")
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing
+
+    Closed, every call goes through. After `failure_threshold` failures in
+    a row the breaker opens and calls are refused at once. Once
+    `reset_timeout` seconds have passed one trial call is let through
+    (half-open): if it succeeds the breaker closes, if it fails it opens
+    again for another `reset_timeout`. A trial call that never reports back
+    does not block the breaker; another is allowed after `reset_timeout`.
+
+    State is per process. Thread-safe.
+
+    Args:
+        name: Name used as the metrics label, e.g. the model name
+        failure_threshold: Consecutive failures that open the breaker
+        reset_timeout: Seconds to stay open before a trial call
+    """
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._retry_at = 0.0
+        self._publish()
+
+    @property
+    def state(self):
+        return self._state
+
+    def _publish(self):
+        metrics.set_gauge("circuit_state", STATE_VALUES[self._state], backend=self.name)
+
+    def available(self):
+        """True if a call would be let through now (without claiming the trial call)"""
+        with self._lock:
+            return self._state == CLOSED or time.monotonic() >= self._retry_at
+
+    def allow(self):
+        """
+        Decide whether a call may go ahead
+
+        Returns:
+            bool: True when closed, or when this call is the trial call of an open breaker
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = time.monotonic()
+            if now < self._retry_at:
+                metrics.increment("circuit_rejections_total", backend=self.name)
+                return False
+            self._state = HALF_OPEN
+            self._retry_at = now + self.reset_timeout
+            self._publish()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._state = CLOSED
+                self._publish()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._retry_at = time.monotonic() + self.reset_timeout
+                metrics.increment("circuit_opened_total", backend=self.name)
+                self._publish()
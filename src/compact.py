@@ -0,0 +1,77 @@
+from config import PERSONALITY_TRAITS, TRAIT_DESCRIPTIONS, HANDWRITING_FEATURES, FEATURE_VALUE_DESCRIPTIONS
+
+DISCLAIMER = "This analysis is based on graphology principles and should be considered for entertainment purposes."
+
+# Features cited as evidence for each trait score
+TRAIT_EVIDENCE = {
+    "openness": ("slant", "spacing", "size"),
+    "conscientiousness": ("baseline", "margins", "spacing"),
+    "extraversion": ("size", "slant", "pressure"),
+    "agreeableness": ("slant", "spacing", "pressure"),
+    "emotional_stability": ("baseline", "pressure", "size"),
+}
+
+_TRAIT_NAMES = {trait.lower().replace(" ", "_"): trait for trait in PERSONALITY_TRAITS}
+
+
+def _band(score):
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        return "A"
+    return "A high" if score >= 7 else "A low" if score <= 4 else "A moderate"
+
+
+def _join(items):
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def expand(compact):
+    """
+    Expand a compact model response into the full result shape
+
+    The model only returns the feature values, the trait scores and the
+    text that is personal to the writer; the feature descriptions, the
+    trait evidence and the disclaimer are filled in from the templates in
+    config. A response that is already in the full shape is returned as is.
+
+    Args:
+        compact: Parsed compact response ({"f", "t", "p", "j", "w"})
+
+    Returns:
+        dict: Result with features, traits, profile, profession and disclaimer
+    """
+    if "traits" in compact or "t" not in compact:
+        return compact
+
+    features = {}
+    for name, value in (compact.get("f") or {}).items():
+        name = name.lower()
+        value = str(value).lower()
+        description = FEATURE_VALUE_DESCRIPTIONS.get(name, {}).get(value) or HANDWRITING_FEATURES.get(name.capitalize(), "")
+        features[name] = {"value": value, "description": description}
+
+    traits = {}
+    for key, score in (compact.get("t") or {}).items():
+        key = key.lower().replace(" ", "_")
+        cited = [f"{features[name]['value']} {name}" for name in TRAIT_EVIDENCE.get(key, ()) if name in features]
+        trait_name = _TRAIT_NAMES.get(key, key.replace("_", " ").title())
+        evidence = f"{_band(score)} score, suggested by the {_join(cited)}." if cited else f"{_band(score)} score."
+        if trait_name in TRAIT_DESCRIPTIONS:
+            evidence += f" {TRAIT_DESCRIPTIONS[trait_name]}"
+        traits[key] = {"score": score, "evidence": evidence}
+
+    return {
+        "features": features,
+        "traits": traits,
+        "profile": compact.get("p", ""),
+        "profession": {"primary": compact.get("j", ""), "explanation": compact.get("w", "")},
+        "disclaimer": DISCLAIMER
+    }
+
+
+def expand_response(parsed):
+    """Expand a parsed compact response: one result, or a batch of results keyed by sample label"""
+    if "t" in parsed or "traits" in parsed:
+        return expand(parsed)
+    return {label: expand(result) if isinstance(result, dict) else result for label, result in parsed.items()}
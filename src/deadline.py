@@ -0,0 +1,54 @@
+import time
+
+
+class AnalysisTimeoutError(TimeoutError):
+    """
+    Raised when a submission or analysis runs out of time
+
+    Args:
+        stage: Stage that was running when the deadline passed, e.g. "upload" or "model_call"
+        message: Optional error message
+    """
+    def __init__(self, stage, message=None):
+        super().__init__(message or f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Absolute point in time by which a request must finish
+
+    Created once at the UI entry and passed down, so every stage (upload, model
+    call, ...) uses what is left of the same budget instead of its own timeout.
+
+    Args:
+        seconds: Seconds from now until the deadline
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage):
+        """Raise AnalysisTimeoutError if the deadline has passed"""
+        if self.expired():
+            raise AnalysisTimeoutError(stage)
+
+    def timeout(self, cap=None):
+        """
+        Timeout to pass to a blocking call
+
+        Args:
+            cap: Optional upper bound for this one call
+
+        Returns:
+            float: Remaining seconds, limited to cap
+        """
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
@@ -0,0 +1,130 @@
+import time
+import base64
+import logging
+import threading
+
+from config import REQUEST_DEADLINE, CIRCUIT_RESET_TIMEOUT, DRAIN_RATE, DRAIN_THREADS, DRAIN_POLL_INTERVAL
+from src.logging_setup import set_submission_id
+from src.gemini_handler import PROMPT_VERSION
+from src.deadline import Deadline, AnalysisTimeoutError
+from src.circuit_breaker import ModelUnavailableError
+from src.result_store import image_hash, save_result, find_by_image_hash
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def process_job(job, queue, analyzer, cache):
+    """
+    Analyze one claimed job and record the outcome
+
+    Returns:
+        bool: True if the job finished, False if it was put back to run again later
+    """
+    set_submission_id(job.submission_id)
+    image_sha = image_hash(job.payload)
+
+    # Another submission of the identical image may have been analyzed meanwhile
+    stored = find_by_image_hash(image_sha, PROMPT_VERSION, cache=cache)
+    if stored is not None:
+        save_result(job.submission_id, image_sha, stored["result"], stored["model"], stored["prompt_version"], cache=cache, reused=True)
+        queue.complete(job, stored["result"])
+        return True
+
+    try:
+        result = analyzer.analyze_handwriting(base64.b64encode(job.payload).decode("utf-8"),
+                                              deadline=Deadline(REQUEST_DEADLINE))
+    except AnalysisTimeoutError as e:
+        logger.warning("Analysis timed out", extra={"stage": e.stage, "attempt": job.attempts})
+        queue.fail(job, e, retry=True)
+        return False
+    except ModelUnavailableError as e:
+        # An outage is not the job's fault: keep it, without using up an attempt
+        logger.info("Model unavailable, job deferred", extra={"attempt": job.attempts})
+        queue.defer(job, CIRCUIT_RESET_TIMEOUT, e)
+        return False
+
+    if "error" not in result:
+        save_result(job.submission_id, image_sha, result, analyzer.last_model, PROMPT_VERSION, cache=cache)
+    # Error results are final answers too: the page shows them like inline analysis does
+    queue.complete(job, result)
+    logger.info("Job complete", extra={"attempt": job.attempts, "failed": "error" in result})
+    return True
+
+
+class BacklogDrainer:
+    """
+    Analyzes the submissions stored while the model was unavailable
+
+    In inline mode nothing else reads the job queue, so submissions
+    deferred during an outage are worked off here, in background threads of
+    the app or API process. Nothing is claimed while every circuit breaker
+    of the analyzer is open; once one lets calls through again, jobs are
+    started at most `rate` per second, so a backlog does not hit the
+    recovering model (or the budget) all at once. Jobs are claimed
+    atomically, so several processes can drain the same queue.
+
+    Args:
+        queue: JobQueue holding the deferred submissions
+        analyzer: HandwritingAnalyzer, shared with the live requests so they see the same breakers
+        cache: Shared cache for the result store
+        rate: Most jobs started per second
+        threads: Jobs analyzed at once
+        poll_interval: Seconds between checks while idle or while the model is unavailable
+    """
+    def __init__(self, queue, analyzer, cache, rate=DRAIN_RATE, threads=DRAIN_THREADS, poll_interval=DRAIN_POLL_INTERVAL):
+        self.queue = queue
+        self.analyzer = analyzer
+        self.cache = cache
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._rate_lock = threading.Lock()
+        self._next_start = 0.0
+        self._pool = []
+
+    def start(self):
+        """Start the drain threads"""
+        self._pool = [
+            threading.Thread(target=self._run, name=f"drainer-{index}", daemon=True)
+            for index in range(self.threads)
+        ]
+        for thread in self._pool:
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._pool:
+            thread.join(timeout)
+
+    def _wait_for_turn(self):
+        """Space job starts `interval` apart across all threads (no bursts after idle time)"""
+        with self._rate_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.interval
+        self._stop.wait(start_at - now)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.analyzer.available():
+                self._stop.wait(self.poll_interval)
+                continue
+            self._wait_for_turn()
+            if self._stop.is_set():
+                break
+            job = self.queue.claim()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                if process_job(job, self.queue, self.analyzer, self.cache):
+                    metrics.increment("drained_jobs_total")
+            except Exception as e:
+                logger.exception("Deferred job failed")
+                self.queue.fail(job, e, retry=True)
+            finally:
+                set_submission_id(None)
+                self.queue.publish_depth()
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import glob
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from config import PERSONALITY_TRAITS, HANDWRITING_FEATURES, RESULTS_FOLDER
+from src.result_store import load_result
+
+
+def _column_name(name):
+    return name.lower().replace(" ", "_")
+
+
+# Trait scores as float columns, feature values as categorical columns
+TRAIT_COLUMNS = {_column_name(trait): f"trait_{_column_name(trait)}" for trait in PERSONALITY_TRAITS}
+FEATURE_COLUMNS = {_column_name(feature): f"feature_{_column_name(feature)}" for feature in HANDWRITING_FEATURES}
+
+STRING_COLUMNS = ["submission_id", "user_name", "image_url", "duplicate_of", "model", "prompt_version", "profile"]
+CATEGORY_COLUMNS = ["hour_group", "profession"] + list(FEATURE_COLUMNS.values())
+DATETIME_COLUMNS = ["timestamp", "analyzed_at"]
+COLUMNS = (["submission_id", "user_name", "timestamp", "hour_group", "image_url", "duplicate_of",
+            "analyzed_at", "model", "prompt_version", "profession", "profile"]
+           + list(TRAIT_COLUMNS.values()) + list(FEATURE_COLUMNS.values()))
+
+# Rows exported before their analysis was stored are re-checked for this long
+PENDING_SECONDS = 7 * 86400
+
+
+def _record_key(submission):
+    """Export order and incremental watermark: (timestamp, submission_id)"""
+    return [submission.get("timestamp") or "", submission.get("submission_id") or ""]
+
+
+def flatten(submission, stored):
+    """
+    Flatten a submission and its stored analysis (or None) into one row
+
+    Args:
+        submission: Submission record
+        stored: Record from result_store.load_result(), or None
+
+    Returns:
+        dict: Column name -> value, with None for anything missing
+    """
+    row = dict.fromkeys(COLUMNS)
+    for name in ("submission_id", "user_name", "timestamp", "hour_group", "image_url", "duplicate_of"):
+        row[name] = submission.get(name)
+    if stored is None:
+        return row
+
+    result = stored.get("result") or {}
+    row["analyzed_at"] = stored.get("created_at")
+    row["model"] = stored.get("model")
+    row["prompt_version"] = stored.get("prompt_version")
+    row["profession"] = (result.get("profession") or {}).get("primary")
+    row["profile"] = result.get("profile")
+    for key, trait in (result.get("traits") or {}).items():
+        column = TRAIT_COLUMNS.get(_column_name(key))
+        if column and isinstance(trait, dict):
+            row[column] = trait.get("score")
+    for key, feature in (result.get("features") or {}).items():
+        column = FEATURE_COLUMNS.get(_column_name(key))
+        if column and isinstance(feature, dict):
+            row[column] = feature.get("value")
+    return row
+
+
+def to_frame(rows):
+    """Build a DataFrame with the export's fixed column types"""
+    frame = pd.DataFrame(rows, columns=COLUMNS)
+    for column in STRING_COLUMNS:
+        frame[column] = frame[column].astype("string")
+    for column in CATEGORY_COLUMNS:
+        frame[column] = frame[column].astype("string").astype("category")
+    for column in DATETIME_COLUMNS:
+        frame[column] = pd.to_datetime(frame[column], errors="coerce")
+    for column in TRAIT_COLUMNS.values():
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float32")
+    return frame
+
+
+def iter_rows(submissions, after=None, settle_seconds=0, results_dir=RESULTS_FOLDER, pending=()):
+    """
+    Join submissions with their stored analyses, one row at a time
+
+    Args:
+        submissions: Iterable of submission records
+        after: Only rows with a (timestamp, submission_id) key above this one
+        settle_seconds: Skip submissions younger than this, so their analysis can land first
+        results_dir: Directory holding the stored results
+        pending: IDs of rows at or below `after` that were exported without an
+            analysis; they are yielded again once their analysis is stored
+
+    Yields:
+        tuple: (key, row)
+    """
+    cutoff = datetime.fromtimestamp(time.time() - settle_seconds).strftime("%Y-%m-%d %H:%M:%S")
+    for submission in submissions:
+        key = _record_key(submission)
+        if after is not None and key <= after:
+            if submission.get("submission_id") in pending:
+                stored = load_result(submission["submission_id"], results_dir)
+                if stored is not None:
+                    yield key, flatten(submission, stored)
+            continue
+        if settle_seconds and key[0] > cutoff:
+            continue
+        yield key, flatten(submission, load_result(submission["submission_id"], results_dir))
+
+
+def _chunks(rows, chunk_rows):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ParquetSink:
+    """
+    Writes each chunk as a row group of one new part file in the output directory
+
+    Part files are named by time plus a random suffix and published with a
+    hard link, which fails rather than overwrite, so concurrent or rapid
+    exports never replace each other's parts.
+    """
+    def __init__(self, output, incremental):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use --format csv instead")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.output = output
+        self.incremental = incremental
+        os.makedirs(output, exist_ok=True)
+        self.path = os.path.join(output, f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        self.temp_path = f"{self.path}.tmp"
+        self.file = None
+        self.writer = None
+        # One explicit schema, so every row group and every part file reads back as one dataset
+        types = {column: pyarrow.string() for column in STRING_COLUMNS}
+        types.update({column: pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) for column in CATEGORY_COLUMNS})
+        types.update({column: pyarrow.timestamp("ns") for column in DATETIME_COLUMNS})
+        types.update({column: pyarrow.float32() for column in TRAIT_COLUMNS.values()})
+        self.schema = pyarrow.schema([(column, types[column]) for column in COLUMNS])
+
+    def write(self, frame):
+        table = self.pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        if self.writer is None:
+            self.file = open(self.temp_path, "xb")
+            self.writer = self.pq.ParquetWriter(self.file, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            return None
+        self.writer.close()
+        self.file.close()
+        if not self.incremental:
+            # A full export replaces the earlier parts
+            for old in glob.glob(os.path.join(self.output, "part-*.parquet")):
+                os.remove(old)
+        os.link(self.temp_path, self.path)
+        os.remove(self.temp_path)
+        return self.path
+
+
+class CsvSink:
+    """Writes to a temp file and renames it over the output, or appends in incremental mode"""
+    def __init__(self, output, incremental):
+        self.output = output
+        self.incremental = incremental and os.path.exists(output)
+        self.path = output if self.incremental else f"{output}.tmp"
+        self.header = not self.incremental
+        self.written = False
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode="a" if self.written or self.incremental else "w", header=self.header, index=False)
+        self.header = False
+        self.written = True
+
+    def close(self):
+        if not self.written:
+            return None
+        if not self.incremental:
+            os.replace(self.path, self.output)
+        return self.output
+
+
+def export(submissions, output, fmt="parquet", incremental=False, state_file=None, chunk_rows=5000,
+           settle_seconds=0, results_dir=RESULTS_FOLDER):
+    """
+    Stream submissions and their analyses to Parquet or CSV in bounded chunks
+
+    Only one chunk of rows is held in memory at a time. In incremental mode
+    the state file records the last exported (timestamp, submission_id), and
+    the next run exports only rows after it. It also lists the rows that
+    were exported before their analysis was stored: each is exported again
+    once its analysis arrives (for up to PENDING_SECONDS), and the later
+    row, the one with analyzed_at set, supersedes the earlier.
+
+    Args:
+        submissions: Iterable of submission records, oldest first
+        output: Directory for Parquet part files, or the CSV file
+        fmt: "parquet" or "csv"
+        incremental: Export only rows added since the last run
+        state_file: Where the incremental watermark is kept (default: next to the output)
+        chunk_rows: Rows per chunk (and per Parquet row group)
+        settle_seconds: Leave out submissions younger than this
+        results_dir: Directory holding the stored results
+
+    Returns:
+        dict: {"rows": n, "path": written path or None, "watermark": last key}
+    """
+    state_file = state_file or f"{output.rstrip(os.sep)}.export_state.json"
+    state = {}
+    if incremental and os.path.exists(state_file):
+        with open(state_file, "r") as f:
+            state = json.load(f)
+    after = state.get("watermark")
+    # Submission ID -> timestamp of the rows exported without an analysis
+    pending = state.get("pending") or {}
+
+    sink = ParquetSink(output, incremental) if fmt == "parquet" else CsvSink(output, incremental)
+    watermark = after
+    count = 0
+    for chunk in _chunks(iter_rows(submissions, after, settle_seconds, results_dir, pending), chunk_rows):
+        sink.write(to_frame([row for _, row in chunk]))
+        count += len(chunk)
+        for key, row in chunk:
+            if watermark is None or key > watermark:
+                watermark = key
+            if row["analyzed_at"] is None:
+                pending[key[1]] = key[0]
+            else:
+                pending.pop(key[1], None)
+    path = sink.close()
+
+    oldest = datetime.fromtimestamp(time.time() - PENDING_SECONDS).strftime("%Y-%m-%d %H:%M:%S")
+    pending = {submission_id: timestamp for submission_id, timestamp in pending.items() if timestamp >= oldest}
+    if count or pending != state.get("pending", {}):
+        temp_path = f"{state_file}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"watermark": watermark, "pending": pending,
+                       "exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, f)
+        os.replace(temp_path, state_file)
+    return {"rows": count, "path": path, "watermark": watermark}
@@ -0,0 +1,114 @@
+import json
+import random
+import time
+
+# A well-formed analysis used as the fake model's answer
+SAMPLE_ANALYSIS = {
+    "features": {
+        "size": {"value": "medium", "description": "Letters are of moderate height and width."},
+        "slant": {"value": "right", "description": "Most letters lean slightly to the right."},
+        "pressure": {"value": "medium", "description": "Strokes are evenly dark without indentation."},
+        "spacing": {"value": "normal", "description": "Words are separated by about one letter width."},
+        "baseline": {"value": "straight", "description": "Lines stay level across the page."},
+        "margins": {"value": "normal", "description": "Even space is left on both sides."}
+    },
+    "traits": {
+        "openness": {"score": 7, "evidence": "Varied letter forms suggest curiosity."},
+        "conscientiousness": {"score": 8, "evidence": "Consistent size and baseline show discipline."},
+        "extraversion": {"score": 6, "evidence": "Right slant points to outward orientation."},
+        "agreeableness": {"score": 7, "evidence": "Rounded forms suggest warmth."},
+        "emotional_stability": {"score": 7, "evidence": "Steady pressure indicates composure."}
+    },
+    "profile": "An organized and curious writer who balances structure with openness to new ideas.",
+    "profession": {
+        "primary": "Engineer",
+        "explanation": "Regular spacing and a steady baseline suit precise, methodical work."
+    },
+    "disclaimer": "This analysis is based on graphology principles and should be considered for entertainment purposes."
+}
+
+# The same analysis in the compact response format
+SAMPLE_COMPACT = {
+    "f": {name: feature["value"] for name, feature in SAMPLE_ANALYSIS["features"].items()},
+    "t": {name: trait["score"] for name, trait in SAMPLE_ANALYSIS["traits"].items()},
+    "p": SAMPLE_ANALYSIS["profile"],
+    "j": SAMPLE_ANALYSIS["profession"]["primary"],
+    "w": SAMPLE_ANALYSIS["profession"]["explanation"]
+}
+
+# Supported shapes for the fake response text
+RESPONSE_SHAPES = ["json", "fenced", "chatty", "invalid"]
+
+
+class FakeUsageMetadata:
+    """Mimics the usage_metadata attribute of a Gemini response"""
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    """Mimics the parts of a Gemini response the analyzer reads"""
+    def __init__(self, text, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    """
+    Local stand-in for genai.GenerativeModel with configurable latency and response shape
+
+    Args:
+        latency: Base seconds to sleep per call
+        jitter: Extra random seconds (uniform 0..jitter) added to each call
+        response_shape: One of RESPONSE_SHAPES
+            json    - bare JSON object
+            fenced  - JSON wrapped in a ```json fence
+            chatty  - text before and after a plain ``` fence
+            invalid - text that is not JSON
+        error_rate: Fraction of calls (0..1) that raise an exception
+        seed: Optional random seed for reproducible jitter and errors
+    """
+    def __init__(self, latency=0.0, jitter=0.0, response_shape="json", error_rate=0.0, seed=None):
+        if response_shape not in RESPONSE_SHAPES:
+            raise ValueError(f"Unknown response shape: {response_shape}. Use one of {', '.join(RESPONSE_SHAPES)}")
+        self.latency = latency
+        self.jitter = jitter
+        self.response_shape = response_shape
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+        self._text = self._shape(json.dumps(SAMPLE_ANALYSIS, indent=2))
+        # Answer prompts asking for the compact format in kind
+        self._compact_text = self._shape(json.dumps(SAMPLE_COMPACT, separators=(",", ":")))
+
+    def _shape(self, body):
+        return {
+            "json": body,
+            "fenced": f"```json\n{body}\n```",
+            "chatty": f"Here is the analysis you asked for:\n```\n{body}\n```\nLet me know if you need more.",
+            "invalid": "I'm sorry, I can't analyze this image."
+        }[self.response_shape]
+
+    def generate_content(self, parts, timeout=None, **kwargs):
+        """Sleep for the configured latency and return a canned response"""
+        self.calls += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if timeout is not None and delay > timeout:
+            # Behave like a client-side timeout: give up after `timeout` seconds
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake backend call took longer than the {timeout:.1f}s timeout")
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise RuntimeError("Fake backend error")
+
+        # Rough token estimate: ~4 characters per text token, a flat cost per image
+        prompt_tokens = sum(len(part) // 4 if isinstance(part, str) else 258 for part in parts)
+        compact = any(isinstance(part, str) and "compact JSON" in part for part in parts)
+        text = self._compact_text if compact else self._text
+        output_tokens = len(text) // 4
+        return FakeResponse(text, FakeUsageMetadata(prompt_tokens, output_tokens))
@@ -1,33 +1,40 @@
-import os
+import time
 import base64
+import hashlib
 import json
-import google.generativeai as genai
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 from io import BytesIO
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from config import (
+    MODEL_TIERS,
+    LATENCY_BUDGET,
+    HEDGING_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_DELAY,
+    HEDGE_TO,
+    USAGE_ACCOUNTING,
+    BUDGET_IMAGE_SIZE,
+    RESPONSE_MODE,
+    ROI_CROP
+)
+from src.backends import create_backend
+from src.deadline import AnalysisTimeoutError
+from src.circuit_breaker import CircuitBreaker, ModelUnavailableError
+from src.logging_setup import submission_id_var
+from src.usage import UsageLedger, BudgetGuard, LEVEL_NORMAL, LEVEL_SMALL_IMAGE, LEVEL_LOCAL
+from src.local_analysis import analyze_locally
+from src.compact import expand_response
+from src.roi import crop_to_text
+from src import metrics
 
-class HandwritingAnalyzer:
-    def __init__(self):
-        """Initialize the Google Gemini API client"""
-        api_key = os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=api_key)
-        # Updated to use the recommended model
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    def analyze_handwriting(self, image_base64):
-        """
-        Send an image to Google Gemini and get personality traits analysis
-        
-        Args:
-            image_base64: Base64 encoded image string
-            
-        Returns:
-            dict: Parsed analysis results
-        """
-        system_prompt = """
+logger = logging.getLogger(__name__)
+
+# What to look at; shared by the full and compact response formats
+ANALYSIS_GUIDANCE = """
             You are an expert handwriting analyst with deep knowledge of graphology. Analyze ONLY the physical characteristics and patterns of the handwriting in the provided image. IGNORE the actual content or meaning of what is written.
 
             Focus exclusively on these handwriting features:
@@ -62,7 +69,10 @@ class HandwritingAnalyzer:
 
             4. Career/profession prediction: Based ONLY on the handwriting characteristics and NOT the content, suggest 1-3 professions that would suit this handwriting style.
 
-            Format your response as a JSON object with the following structure:
+"""
+
+# Full format: the model writes every description and evidence string
+FULL_FORMAT = """            Format your response as a JSON object with the following structure:
             ```json
             {
             "features": {
@@ -91,25 +101,519 @@ class HandwritingAnalyzer:
         
         Respond ONLY with the JSON object, no additional text.
         """
+
+SYSTEM_PROMPT = ANALYSIS_GUIDANCE + FULL_FORMAT
+
+# Compact format: only what is personal to the writer; src.compact expands the rest locally
+COMPACT_FORMAT = """            Format your response as compact JSON with exactly these keys and no others:
+            ```json
+            {
+            "f": {"size": "medium", "slant": "right", "pressure": "medium", "spacing": "normal", "baseline": "straight", "margins": "normal"},
+            "t": {"openness": 7, "conscientiousness": 6, "extraversion": 8, "agreeableness": 7, "emotional_stability": 6},
+            "p": "Personality profile description here...",
+            "j": "Primary profession prediction",
+            "w": "One sentence on why this profession matches the handwriting style"
+            }
+            ```
+            "f" holds one of the listed values per feature and "t" the 1-10 trait scores. Do not explain them.
+        
+        Respond ONLY with the JSON object, no additional text.
+        """
+
+COMPACT_PROMPT = ANALYSIS_GUIDANCE + COMPACT_FORMAT
+
+MULTI_PAGE_INSTRUCTION = """
+        The {count} images that follow are separate photos (pages or lines) of the SAME person's handwriting.
+        Treat them as one sample: base every feature and trait on all of the images together and return a
+        single combined analysis in the JSON format above.
+        """
+
+BATCH_INSTRUCTION = """
+        The images that follow are handwriting samples from {count} DIFFERENT people. Each image is preceded
+        by its label, for example "Sample S1". Analyze every sample independently and never mix evidence
+        between samples.
+
+        Respond ONLY with one JSON object whose keys are the sample labels ({labels}) and whose values are
+        analysis objects in exactly the JSON format above, for example:
+        {example}
+        """
+
+# The example answer of BATCH_INSTRUCTION, in the shape of each response mode
+BATCH_EXAMPLES = {
+    "full": '{"S1": {"features": {...}, "traits": {...}, "profile": "...", "profession": {...}, "disclaimer": "..."}}',
+    "compact": '{"S1": {"f": {...}, "t": {...}, "p": "...", "j": "...", "w": "..."}}',
+}
+
+# Sent after a photo that was cropped to its writing, so margins can still be judged
+CROP_NOTE = (
+    "The photo above was cropped to the handwriting, so the edges of the page are not visible. Measured against "
+    "the page in the original photo, the writing left these margins, as shares of the page's width and height: "
+    "left {left:.0%}, right {right:.0%}, top {top:.0%}, bottom {bottom:.0%}. Judge the margins feature from these."
+)
+
+PROMPTS = {"full": SYSTEM_PROMPT, "compact": COMPACT_PROMPT}
+
+def prompt_version(response_mode, crop=ROI_CROP):
+    """Changes whenever the prompts of a response mode change, so stored results can be told apart"""
+    prompts = (PROMPTS[response_mode] + MULTI_PAGE_INSTRUCTION + BATCH_INSTRUCTION + BATCH_EXAMPLES[response_mode]
+               + (CROP_NOTE if crop else ""))
+    return hashlib.sha256(prompts.encode("utf-8")).hexdigest()[:12]
+
+PROMPT_VERSION = prompt_version(RESPONSE_MODE)
+
+class HandwritingAnalyzer:
+    def __init__(self, backend=None, tiers=None, ledger=None, budget=None, response_mode=None, hedging=None):
+        """
+        Initialize the model backends
         
+        Args:
+            backend: Optional AnalyzerBackend (or any object with a
+                generate_content(parts) method). When given it is the only
+                tier, and hedged requests go to the same backend.
+            tiers: Model names to create backends for, primary first.
+                Defaults to config.MODEL_TIERS.
+            ledger: UsageLedger every model call is recorded in. Defaults to
+                the shared ledger file when config.USAGE_ACCOUNTING is on.
+            budget: BudgetGuard deciding how far to degrade requests.
+                Defaults to one over the ledger with the configured budgets.
+            response_mode: "full" or "compact" (defaults to config.RESPONSE_MODE)
+            hedging: Send hedged requests for slow calls (defaults to config.HEDGING_ENABLED)
+        """
+        if backend is not None:
+            self.backends = [backend]
+        else:
+            self.backends = [create_backend(model_name=model_name) for model_name in (tiers or MODEL_TIERS)]
+        self.model = self.backends[0]
+        # One breaker per tier, so an outage of one model does not stop the others
+        self._breakers = {backend: CircuitBreaker(getattr(backend, "model_name", "") or getattr(backend, "name", "model"))
+                          for backend in self.backends}
+        self.ledger = ledger if ledger is not None else (UsageLedger() if USAGE_ACCOUNTING else None)
+        self.budget = budget if budget is not None else (BudgetGuard(self.ledger) if self.ledger is not None else None)
+        self.response_mode = response_mode or RESPONSE_MODE
+        self.hedging = HEDGING_ENABLED if hedging is None else hedging
+        self.system_prompt = PROMPTS[self.response_mode]
+        self.prompt_version = prompt_version(self.response_mode)
+        # Token usage and model of the most recent model call (None if unknown)
+        self.last_usage = None
+        self.last_model = None
+        # Recent primary latencies, used to pick when to hedge
+        self._primary_latencies = deque(maxlen=200)
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="model-call")
+    
+    def warm_up(self, timeout=None):
+        """Open the connection of every tier, so the first analysis skips DNS and TLS setup"""
+        for backend in self.backends:
+            backend.warm_up(timeout)
+    
+    def available(self):
+        """True unless the circuit breaker of every tier is open"""
+        return any(breaker.available() for breaker in self._breakers.values())
+    
+    def analyze_handwriting(self, image_base64, latency_budget=None, deadline=None):
+        """
+        Send an image to Google Gemini and get personality traits analysis
+        
+        Args:
+            image_base64: Base64 encoded image string
+            latency_budget: Seconds allowed for the model call (defaults to config.LATENCY_BUDGET)
+            deadline: Optional Deadline from the caller; the model call never outlives it
+            
+        Returns:
+            dict: Parsed analysis results
+            
+        Raises:
+            AnalysisTimeoutError: No valid result before the budget or deadline ran out
+            ModelUnavailableError: The circuit breakers of all tiers are open
+        """
+        metrics.increment("requests_total", mode="single")
         try:
-            print(f"Attempting to connect to Google Gemini API")
+            logger.debug("Sending analysis request", extra={"backend": getattr(self.model, "name", "model")})
             
             # Convert base64 to image
-            image_data = base64.b64decode(image_base64)
-            image = Image.open(BytesIO(image_data))
+            image = self._decode_image(image_base64)
+            
+            # Over budget: the cheapest tier, smaller images, or no model call at all
+            level = self._degradation()
+            if level == LEVEL_LOCAL:
+                return self._local_result(image)
+            backends = self._tiers_for(level)
             
             # Create the API request
-            response = self.model.generate_content([
-                system_prompt,
+            image_parts = self._image_parts(image, level)
+            return self._request([
+                self.system_prompt,
                 "Analyze this handwriting sample and provide the information in the requested JSON format.",
-                image
-            ])
+                *image_parts
+            ], latency_budget, deadline, backends)
+            
+        except (AnalysisTimeoutError, ModelUnavailableError):
+            raise
+        except Exception as e:
+            return self._error_result(e)
+    
+    def analyze_handwriting_pages(self, images_base64, latency_budget=None, deadline=None):
+        """
+        Analyze several photos of one person's handwriting in a single request
+        
+        All pages share one system prompt and one round trip, and the model
+        returns a single aggregated analysis.
+        
+        Args:
+            images_base64: List of base64 encoded image strings from the same writer
+            latency_budget: Seconds allowed for the model call (defaults to config.LATENCY_BUDGET)
+            deadline: Optional Deadline from the caller; the model call never outlives it
+            
+        Returns:
+            dict: Parsed analysis results covering all pages
+            
+        Raises:
+            AnalysisTimeoutError: No valid result before the budget or deadline ran out
+            ModelUnavailableError: The circuit breakers of all tiers are open
+        """
+        if not images_base64:
+            return self._error_result(ValueError("No images provided"))
+        if len(images_base64) == 1:
+            return self.analyze_handwriting(images_base64[0], latency_budget, deadline)
+        
+        metrics.increment("requests_total", mode="pages")
+        try:
+            level = self._degradation()
+            if level == LEVEL_LOCAL:
+                result = self._local_result([self._decode_image(image_base64) for image_base64 in images_base64])
+                result["page_count"] = len(images_base64)
+                return result
+            backends = self._tiers_for(level)
+            
+            parts = [
+                self.system_prompt,
+                MULTI_PAGE_INSTRUCTION.format(count=len(images_base64)),
+            ]
+            for page_number, image_base64 in enumerate(images_base64, start=1):
+                parts.append(f"Page {page_number}")
+                parts.extend(self._image_parts(self._decode_image(image_base64), level))
+            
+            result = self._request(parts, latency_budget, deadline, backends)
+            result["page_count"] = len(images_base64)
+            return result
+            
+        except (AnalysisTimeoutError, ModelUnavailableError):
+            raise
+        except Exception as e:
+            return self._error_result(e)
+    
+    def analyze_handwriting_batch(self, samples, latency_budget=None, deadline=None):
+        """
+        Analyze samples from several different people in a single request
+        
+        Each sample is sent under a short generated label (S1, S2, ...) so the
+        combined response can be split back safely, whatever the caller's keys
+        look like. Samples missing from the response get an error result.
+        
+        Args:
+            samples: Dict mapping a caller key (e.g. submission_id) to a base64 encoded image string
+            latency_budget: Seconds allowed for the model call (defaults to config.LATENCY_BUDGET)
+            deadline: Optional Deadline from the caller; the model call never outlives it
+            
+        Returns:
+            dict: Caller key -> parsed analysis results
+            
+        Raises:
+            AnalysisTimeoutError: No valid result before the budget or deadline ran out
+            ModelUnavailableError: The circuit breakers of all tiers are open
+        """
+        if not samples:
+            return {}
+        
+        labels = {f"S{index}": key for index, key in enumerate(samples, start=1)}
+        metrics.increment("requests_total", mode="batch")
+        
+        try:
+            level = self._degradation()
+            if level == LEVEL_LOCAL:
+                return {key: self._local_result(self._decode_image(image_base64)) for key, image_base64 in samples.items()}
+            backends = self._tiers_for(level)
+            
+            parts = [
+                self.system_prompt,
+                BATCH_INSTRUCTION.format(count=len(labels), labels=", ".join(labels),
+                                         example=BATCH_EXAMPLES[self.response_mode]),
+            ]
+            for label, key in labels.items():
+                parts.append(f"Sample {label}")
+                parts.extend(self._image_parts(self._decode_image(samples[key]), level))
+            
+            batch_result = self._request(parts, latency_budget, deadline, backends)
+            
+        except (AnalysisTimeoutError, ModelUnavailableError):
+            raise
+        except Exception as e:
+            return {key: self._error_result(e) for key in samples}
+        
+        results = {}
+        for label, key in labels.items():
+            sample_result = batch_result.get(label)
+            if isinstance(sample_result, dict) and "traits" in sample_result:
+                results[key] = sample_result
+            else:
+                results[key] = self._error_result(ValueError(f"No result returned for sample {label}"))
+        return results
+    
+    def _degradation(self):
+        """Degradation level for this request from the spend against the budgets"""
+        level = self.budget.level() if self.budget is not None else LEVEL_NORMAL
+        if level != LEVEL_NORMAL:
+            metrics.increment("budget_degraded_total", level=level)
+        return level
+    
+    def _tiers_for(self, level):
+        """
+        Backends to use at a degradation level: all tiers, or only the cheapest,
+        leaving out tiers whose circuit breaker is open
+        
+        Raises:
+            ModelUnavailableError: None of them can be called now
+        """
+        tiers = self.backends if level == LEVEL_NORMAL else self.backends[-1:]
+        backends = [backend for backend in tiers if self._breakers[backend].available()]
+        if not backends:
+            metrics.increment("model_unavailable_total")
+            raise ModelUnavailableError("The analysis model is unavailable; its circuit breakers are open")
+        return backends
+    
+    def _shrink(self, image, level):
+        """Downscale the image once degraded to small images (fewer image tokens)"""
+        if level == LEVEL_SMALL_IMAGE and max(image.size) > BUDGET_IMAGE_SIZE:
+            image = image.copy()
+            image.thumbnail((BUDGET_IMAGE_SIZE, BUDGET_IMAGE_SIZE))
+        return image
+    
+    def _image_parts(self, image, level):
+        """
+        Request parts for one photo: cropped to the writing and shrunk as the budget requires
+        
+        Args:
+            image: Decoded PIL image
+            level: Degradation level of the request
             
-            # Extract the JSON response
-            print("API call successful, extracting response")
-            response_text = response.text
+        Returns:
+            list: The image, then the crop note if it was cropped
+        """
+        crop = None
+        if ROI_CROP:
+            with metrics.timed("crop"):
+                image, crop = crop_to_text(image)
+            if crop is not None and not crop["cropped"]:
+                crop = None
+        parts = [self._shrink(image, level)]
+        if crop is not None:
+            # Kept out of the result: the stored analysis schema does not change with cropping
+            metrics.increment("photos_cropped_total")
+            logger.debug("Photo cropped to the handwriting", extra={"box": crop["box"], "size": crop["size"],
+                                                                  "margins": crop["margins"]})
+            parts.append(CROP_NOTE.format(**crop["margins"]))
+        return parts
+    
+    def _local_result(self, images):
+        """Answer from the local fast path, for when the budget is spent"""
+        self.last_usage = None
+        self.last_model = "local"
+        with metrics.timed("local_analysis"):
+            return analyze_locally(images)
+    
+    def _decode_image(self, image_base64):
+        """Convert a base64 string into a PIL image"""
+        with metrics.timed("decode"):
+            image_data = base64.b64decode(image_base64)
+            return Image.open(BytesIO(image_data))
+    
+    def hedge_delay(self):
+        """Seconds to wait for the primary before sending a hedged request"""
+        if len(self._primary_latencies) < 20:
+            return HEDGE_DELAY
+        ordered = sorted(self._primary_latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))
+        return ordered[index]
+    
+    def _hedge_backend(self, backends=None):
+        """Backend that receives hedged requests: the next tier, or the primary again"""
+        backends = backends or self.backends
+        if HEDGE_TO == "next" and len(backends) > 1:
+            return backends[1]
+        return backends[0]
+    
+    def _attempt(self, backend, parts, timeout):
+        """
+        Call one backend and parse its answer
+        
+        Args:
+            backend: Backend to call
+            parts: List of prompt strings and PIL images
+            timeout: Seconds the backend may take before giving up
             
+        Returns:
+            tuple: (parsed result dict, usage dict or None)
+        """
+        model_name = getattr(backend, "model_name", "")
+        breaker = self._breakers[backend]
+        if not breaker.allow():
+            raise ModelUnavailableError(f"Circuit breaker for {breaker.name} is open")
+        start = time.perf_counter()
+        try:
+            with metrics.timed("model_call"):
+                response = backend.generate_content(parts, timeout=timeout)
+        except Exception:
+            breaker.record_failure()
+            self._account(model_name, None, time.perf_counter() - start, "error")
+            raise
+        # The model answered; whether the answer parses is not an outage
+        breaker.record_success()
+        
+        # Extract the JSON response
+        logger.debug("Model call successful, extracting response", extra={"model": model_name})
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            usage = {
+                "prompt_tokens": getattr(usage, "prompt_token_count", 0),
+                "output_tokens": getattr(usage, "candidates_token_count", 0),
+                "total_tokens": getattr(usage, "total_token_count", 0),
+            }
+            metrics.increment("tokens_total", usage["prompt_tokens"], kind="prompt")
+            metrics.increment("tokens_total", usage["output_tokens"], kind="output")
+        # Billed whether or not this answer wins or parses
+        usage = self._account(model_name, usage, time.perf_counter() - start, "ok")
+        result = self._parse_response(response.text)
+        if self.response_mode == "compact":
+            with metrics.timed("expand"):
+                result = expand_response(result)
+        return result, usage
+    
+    def _account(self, model_name, usage, latency, outcome):
+        """Record a model call in the ledger, attributed to the current submission"""
+        if self.ledger is None:
+            return usage
+        try:
+            cost = self.ledger.record(
+                submission_id_var.get(), model_name, self.prompt_version,
+                (usage or {}).get("prompt_tokens", 0), (usage or {}).get("output_tokens", 0), latency, outcome
+            )
+        except Exception as e:
+            # Accounting must never fail an analysis
+            logger.warning(f"Could not record model usage: {str(e)}")
+            return usage
+        if usage is not None:
+            usage["cost"] = cost
+        return usage
+    
+    def _submit(self, backend, parts, timeout):
+        """Run an attempt on the executor, keeping the caller's logging and timing context"""
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._attempt, backend, parts, timeout)
+    
+    def _request(self, parts, latency_budget=None, deadline=None, backends=None):
+        """
+        Get a parsed result for the request parts within the latency budget
+        
+        The primary tier is called first. If it has not answered with a valid
+        result after hedge_delay() seconds, or if it fails, a hedged request
+        goes to the hedge backend. The first valid result wins; the other
+        request is cancelled if it has not started and otherwise ignored.
+        
+        Each backend call gets the time left as its own timeout, so calls that
+        hang are cut off by the backend and release their worker thread.
+        
+        Args:
+            parts: List of prompt strings and PIL images
+            latency_budget: Seconds allowed (defaults to config.LATENCY_BUDGET)
+            deadline: Optional Deadline that caps the budget
+            backends: Tiers to use, primary first (defaults to all available tiers)
+            
+        Returns:
+            dict: Parsed result
+            
+        Raises:
+            AnalysisTimeoutError: No valid result in time
+            ModelUnavailableError: Every call failed and the failures opened all circuit breakers
+        """
+        budget = latency_budget if latency_budget is not None else LATENCY_BUDGET
+        if deadline is not None:
+            deadline.check("model_call")
+            budget = min(budget, deadline.remaining())
+        start = time.perf_counter()
+        self.last_usage = None
+        self.last_model = None
+        
+        backends = backends or self._tiers_for(LEVEL_NORMAL)
+        primary = self._submit(backends[0], parts, budget)
+        backend_of = {primary: backends[0]}
+        if backends[0] is self.backends[0]:
+            primary.add_done_callback(lambda future: self._record_primary_latency(future, start))
+        pending = {primary}
+        hedged = None
+        last_error = None
+        
+        while pending:
+            remaining = budget - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            # Until the hedge is sent, wake up when it is due
+            timeout = remaining
+            if self.hedging and hedged is None:
+                timeout = min(remaining, max(0.0, self.hedge_delay() - (time.perf_counter() - start)))
+            
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result, usage = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                self.last_usage = usage
+                self.last_model = getattr(backend_of[future], "model_name", None)
+                if hedged is not None:
+                    metrics.increment("hedges_total", outcome="won" if future is hedged else "lost")
+                metrics.observe("model_latency_seconds", time.perf_counter() - start, path="hedged" if self.hedging else "primary")
+                return result
+            
+            # Hedge when the primary is slow or has already failed
+            if self.hedging and hedged is None:
+                logger.info("Sending hedged request", extra={"primary_failed": last_error is not None})
+                metrics.increment("hedges_total", outcome="fired")
+                hedged = self._submit(self._hedge_backend(backends), parts, max(0.0, budget - (time.perf_counter() - start)))
+                backend_of[hedged] = self._hedge_backend(backends)
+                pending.add(hedged)
+        
+        for future in pending:
+            future.cancel()
+        if last_error is not None and not pending and not isinstance(last_error, TimeoutError):
+            # This request tripped the last breaker: defer it like the ones refused from now on
+            if not self.available():
+                raise ModelUnavailableError(f"The analysis model is unavailable: {str(last_error)}") from last_error
+            raise last_error
+        metrics.increment("timeouts_total", stage="model_call")
+        raise AnalysisTimeoutError("model_call", f"No valid model response within the {budget:.1f}s latency budget")
+    
+    def _record_primary_latency(self, future, start):
+        """Track how long the primary took, whether or not its result was used"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        latency = time.perf_counter() - start
+        self._primary_latencies.append(latency)
+        # What the latency would have been without hedging, for comparing p99
+        metrics.observe("model_latency_seconds", latency, path="primary_only")
+    
+    def _parse_response(self, response_text):
+        """
+        Parse the model's response text into a dict
+        
+        Args:
+            response_text: Raw response text, optionally wrapped in markdown fences
+            
+        Returns:
+            dict: Parsed JSON object
+        """
+        with metrics.timed("parse"):
             # Clean the response if it contains markdown backticks or "json" declaration
             if "```json" in response_text:
                 response_text = response_text.split("```json")[1].split("```")[0].strip()
@@ -117,14 +621,13 @@ class HandwritingAnalyzer:
                 response_text = response_text.split("```")[1].split("```")[0].strip()
                 
             return json.loads(response_text)
-            
-        except Exception as e:
-            import traceback
-            print(f"Error during API call: {str(e)}")
-            print(f"Detailed error: {traceback.format_exc()}")
-            return {
-                "error": str(e),
-                "features": {},
-                "traits": {},
-                "profile": "Unable to analyze the handwriting. Please try again with a clearer image."
-            }
\ No newline at end of file
+    
+    def _error_result(self, e):
+        """Build the fallback result returned when analysis fails"""
+        logger.error(f"Error during API call: {str(e)}", exc_info=e)
+        return {
+            "error": str(e),
+            "features": {},
+            "traits": {},
+            "profile": "Unable to analyze the handwriting. Please try again with a clearer image."
+        }
\ No newline at end of file
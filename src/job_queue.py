@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from config import JOB_QUEUE_FILE, JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS
+from src import metrics
+
+# Job priorities: higher runs first
+PRIORITY_LOW = -10      # Background re-analysis
+PRIORITY_NORMAL = 0     # New submissions
+PRIORITY_HIGH = 10      # Retries a user is waiting on
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+class Job:
+    """A claimed job: the submission, its image, worker options and how often it was tried"""
+    def __init__(self, job_id, submission_id, payload, options, attempts):
+        self.id = job_id
+        self.submission_id = submission_id
+        self.payload = payload
+        self.options = options
+        self.attempts = attempts
+
+
+class JobQueue:
+    """
+    Durable analysis job queue in a SQLite file
+
+    Jobs are keyed by submission_id and claimed highest priority first,
+    then oldest first. A claimed job stays invisible to other workers for
+    the visibility timeout; if its worker crashes it becomes claimable
+    again, up to max_attempts claims. The image travels in the job and is
+    dropped once the job finishes; the finished job keeps its result until
+    purge() deletes it (analysis_worker.py and the retention pass call it
+    for jobs older than JOB_RETENTION_HOURS).
+    Every claim is one IMMEDIATE transaction, so any number of worker
+    processes can share the queue.
+
+    Args:
+        path: Database file
+        visibility_timeout: Seconds a claimed job is hidden from other workers
+        max_attempts: Claims before a job is marked failed
+    """
+    def __init__(self, path=JOB_QUEUE_FILE, visibility_timeout=JOB_VISIBILITY_TIMEOUT, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                submission_id TEXT NOT NULL UNIQUE,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payload BLOB,
+                options TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                visible_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id);
+        """)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def enqueue(self, submission_id, image_bytes, priority=PRIORITY_NORMAL, options=None):
+        """
+        Queue an analysis, or re-queue a submission whose job failed
+
+        Args:
+            submission_id: Submission to analyze; one job per submission
+            image_bytes: Image file content
+            priority: PRIORITY_LOW, PRIORITY_NORMAL or PRIORITY_HIGH
+            options: Optional JSON-serializable dict passed to the worker
+
+        Returns:
+            bool: True if a job was queued, False if one is already pending or done
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT status FROM jobs WHERE submission_id = ?", (submission_id,)).fetchone()
+            if row is not None and row[0] != "failed":
+                return False
+            connection.execute("DELETE FROM jobs WHERE submission_id = ?", (submission_id,))
+            connection.execute(
+                "INSERT INTO jobs (submission_id, priority, status, payload, options, visible_at, created_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (submission_id, priority, image_bytes, json.dumps(options or {}), now, now)
+            )
+        return True
+
+    def claim(self):
+        """
+        Claim the next visible job
+
+        Returns:
+            Job: The claimed job, or None if there is nothing to do
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Jobs whose worker died after its last attempt are failed, not retried forever
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', payload = NULL, finished_at = ?, error = 'Worker did not finish the job'"
+                " WHERE status = 'running' AND visible_at <= ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = connection.execute(
+                "SELECT id, submission_id, payload, options, attempts FROM jobs"
+                " WHERE status IN ('queued', 'running') AND visible_at <= ?"
+                " ORDER BY priority DESC, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                (now + self.visibility_timeout, row[0])
+            )
+        return Job(row[0], row[1], row[2], json.loads(row[3] or "{}"), row[4] + 1)
+
+    def complete(self, job, result):
+        """Mark a job done with its JSON-serializable result"""
+        self._connection().execute(
+            "UPDATE jobs SET status = 'done', payload = NULL, finished_at = ?, result = ?, error = NULL WHERE id = ?",
+            (time.time(), json.dumps(result), job.id)
+        )
+
+    def fail(self, job, error, retry=False):
+        """
+        Record a failed attempt
+
+        Args:
+            job: The claimed job
+            error: Error description
+            retry: Make the job claimable again (until max_attempts is reached)
+        """
+        now = time.time()
+        if retry and job.attempts < self.max_attempts:
+            self._connection().execute(
+                "UPDATE jobs SET status = 'queued', visible_at = ?, error = ? WHERE id = ?",
+                (now, str(error), job.id)
+            )
+        else:
+            self._connection().execute(
+                "UPDATE jobs SET status = 'failed', payload = NULL, finished_at = ?, error = ? WHERE id = ?",
+                (now, str(error), job.id)
+            )
+
+    def defer(self, job, delay, error=None):
+        """
+        Put a claimed job back without using up an attempt, e.g. while the model is unavailable
+
+        Args:
+            job: The claimed job
+            delay: Seconds before the job can be claimed again
+            error: Optional reason, kept with the job
+        """
+        self._connection().execute(
+            "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), visible_at = ?, error = ? WHERE id = ?",
+            (time.time() + delay, str(error) if error is not None else None, job.id)
+        )
+
+    def status(self, submission_id):
+        """
+        Look up the job of a submission
+
+        Returns:
+            dict: {"status", "attempts", "result", "error"}, or None if no job exists
+        """
+        row = self._connection().execute(
+            "SELECT status, attempts, result, error FROM jobs WHERE submission_id = ?", (submission_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "status": row[0],
+            "attempts": row[1],
+            "result": json.loads(row[2]) if row[2] else None,
+            "error": row[3]
+        }
+
+    def depth(self):
+        """
+        Count jobs by status and publish them as the queue_depth gauge
+
+        Returns:
+            dict: status -> number of jobs
+        """
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        for status, count in counts.items():
+            metrics.set_gauge("queue_depth", count, status=status)
+        return counts
+
+    def publish_depth(self):
+        """Refresh the queue_depth gauge after the queue changed (the counts are not needed)"""
+        self.depth()
+
+    def purge(self, older_than):
+        """Delete finished jobs older than `older_than` seconds"""
+        cutoff = time.time() - older_than
+        return self._connection().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+        ).rowcount
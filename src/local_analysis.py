@@ -0,0 +1,133 @@
+import numpy as np
+from PIL import Image
+
+from src.scoring import SCORING_WIDTH, ink_mask, find_text_lines, compute_metrics, _runs
+
+# Profession suggested for the strongest trait
+_PROFESSION_FOR_TRAIT = {
+    "openness": "Designer",
+    "conscientiousness": "Engineer",
+    "extraversion": "Entrepreneur",
+    "agreeableness": "Teacher",
+    "emotional_stability": "Physician",
+}
+
+_SLANT_ANGLES = np.radians(np.arange(-30, 31, 5))
+
+
+def _to_grayscale(image):
+    """PIL image -> grayscale float array in 0..1 at scoring width"""
+    image = image.convert("L")
+    if image.width > SCORING_WIDTH:
+        image = image.resize((SCORING_WIDTH, max(1, image.height * SCORING_WIDTH // image.width)), Image.BILINEAR)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+
+def _measure(gray):
+    """Raw page measurements behind the local features"""
+    ink = ink_mask(gray)
+    height, width = ink.shape
+    lines = find_text_lines(ink)
+    ys, xs = np.nonzero(ink)
+    measures = compute_metrics(gray)
+    measures["line_height"] = float(np.median([bottom - top for top, bottom in lines])) / width if lines else 0.0
+    measures["darkness"] = float(1.0 - gray[ink].mean()) if ys.size else 0.0
+    measures["left_margin"] = float(xs.min()) / width if xs.size else 0.0
+
+    # Slant: the shear that lines up vertical strokes best gives the sharpest column profile
+    slant = 0.0
+    if ys.size:
+        sharpness = [np.square(np.bincount(np.clip((xs + ys * np.tan(angle)).astype(np.int64) + height, 0, None))).sum()
+                     for angle in _SLANT_ANGLES]
+        slant = float(np.degrees(_SLANT_ANGLES[int(np.argmax(sharpness))]))
+    measures["slant"] = slant
+
+    # Baseline direction (slope of the line bottoms) and word gaps relative to the line height
+    slopes, gaps = [], []
+    for top, bottom in lines:
+        has_ink = ink[top:bottom].any(axis=0)
+        band_columns = np.flatnonzero(has_ink)
+        if band_columns.size <= 10:
+            continue
+        lowest = bottom - np.argmax(ink[top:bottom, band_columns][::-1], axis=0)
+        slopes.append(np.polyfit(band_columns, lowest, 1)[0])
+        starts, ends = _runs(~has_ink[band_columns[0]:band_columns[-1] + 1])
+        line_gaps = (ends - starts)[(ends - starts) >= max(2, width // 200)]
+        gaps.extend(line_gaps / (bottom - top))
+    measures["baseline_slope"] = float(np.mean(slopes)) if slopes else 0.0
+    measures["word_gap"] = float(np.median(gaps)) if gaps else 0.0
+    return measures
+
+
+def _pick(value, low, high, labels):
+    return labels[0] if value < low else labels[2] if value > high else labels[1]
+
+
+def _score(value):
+    return int(np.clip(round(value), 1, 10))
+
+
+def analyze_locally(images):
+    """
+    Quick analysis from measured page geometry, without a model call
+
+    The local fast path for when the model budget is spent: the features
+    come from the scoring measurements (line height, ink darkness, stroke
+    slant, baseline slope, margins) and the traits from fixed graphology
+    rules over them. The result has the same schema as a model result.
+
+    Args:
+        images: PIL image or list of PIL images of one writer's handwriting
+
+    Returns:
+        dict: Analysis result, with "fast_path": "local"
+    """
+    if not isinstance(images, (list, tuple)):
+        images = [images]
+    pages = [_measure(_to_grayscale(image)) for image in images]
+    m = {key: float(np.mean([page[key] for page in pages])) for key in pages[0]}
+
+    size = _pick(m["line_height"], 0.03, 0.06, ("small", "medium", "large"))
+    slant = _pick(m["slant"], -5, 5, ("left", "vertical", "right"))
+    pressure = _pick(m["darkness"], 0.55, 0.75, ("light", "medium", "heavy"))
+    spacing = _pick(m["word_gap"], 0.3, 0.8, ("narrow", "normal", "wide"))
+    if m["baseline_straightness"] < 0.5:
+        baseline = "wavy"
+    else:
+        baseline = _pick(m["baseline_slope"], -0.02, 0.02, ("ascending", "straight", "descending"))
+    margins = _pick(m["left_margin"], 0.05, 0.15, ("narrow", "normal", "wide"))
+
+    traits = {
+        "openness": (3 + 5 * (1 - m["size_consistency"]) + (2 if spacing == "wide" else 0),
+                     f"{spacing.capitalize()} spacing and {'varied' if m['size_consistency'] < 0.6 else 'steady'} letter sizes"),
+        "conscientiousness": (2 + 8 * (m["baseline_straightness"] + m["margin_uniformity"] + m["size_consistency"]) / 3,
+                              f"{baseline.capitalize()} baseline and {'even' if m['margin_uniformity'] > 0.6 else 'uneven'} margins"),
+        "extraversion": (3 + {"small": 0, "medium": 2, "large": 4}[size] + {"left": 0, "vertical": 1, "right": 3}[slant],
+                         f"{size.capitalize()} writing with a {slant} slant"),
+        "agreeableness": (4 + {"left": 0, "vertical": 1, "right": 2}[slant] + 3 * m["stroke_smoothness"],
+                          f"{'Smooth' if m['stroke_smoothness'] > 0.6 else 'Irregular'} strokes with a {slant} slant"),
+        "emotional_stability": (2 + 8 * (m["stroke_smoothness"] + m["baseline_straightness"]) / 2,
+                                f"{pressure.capitalize()} pressure and a {baseline} baseline"),
+    }
+    traits = {name: {"score": _score(score), "evidence": evidence} for name, (score, evidence) in traits.items()}
+    strongest = max(traits, key=lambda name: traits[name]["score"])
+
+    return {
+        "features": {
+            "size": {"value": size, "description": f"Lines are about {m['line_height'] * 100:.1f}% of the page width tall."},
+            "slant": {"value": slant, "description": f"Strokes lean about {abs(m['slant']):.0f} degrees."},
+            "pressure": {"value": pressure, "description": "Judged from how dark the ink strokes are."},
+            "spacing": {"value": spacing, "description": f"Gaps between words are about {m['word_gap']:.1f} line heights wide."},
+            "baseline": {"value": baseline, "description": "Judged from where the bottoms of the letters sit on each line."},
+            "margins": {"value": margins, "description": f"The text starts {m['left_margin'] * 100:.0f}% in from the left edge."},
+        },
+        "traits": traits,
+        "profile": (f"{size.capitalize()}, {slant}-slanted writing with a {baseline} baseline. "
+                    f"Your strongest trait here is {strongest.replace('_', ' ')}."),
+        "profession": {
+            "primary": _PROFESSION_FOR_TRAIT[strongest],
+            "explanation": f"Suits the {strongest.replace('_', ' ')} shown in your handwriting."
+        },
+        "disclaimer": "This is a quick analysis of your handwriting's geometry, for entertainment purposes.",
+        "fast_path": "local"
+    }
@@ -0,0 +1,128 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import contextvars
+import logging.handlers
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE
+
+# Submission being handled by the current thread/context, added to every record
+submission_id_var = contextvars.ContextVar("submission_id", default=None)
+
+_listener = None
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def set_submission_id(submission_id):
+    """Attach a submission_id to all records logged from the current context"""
+    submission_id_var.set(submission_id)
+
+
+class ContextFilter(logging.Filter):
+    """Adds the current submission_id to each record"""
+    def filter(self, record):
+        if not hasattr(record, "submission_id"):
+            record.submission_id = submission_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of DEBUG records
+
+    Args:
+        rate: Fraction (0..1) of DEBUG records to keep; higher levels always pass
+    """
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message, submission_id and any extra fields"""
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "submission_id", None):
+            entry["submission_id"] = record.submission_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry and key != "submission_id":
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _PreformattedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands the raw record to the listener
+
+    The stock QueueHandler formats the message in the calling thread; here the
+    listener thread does all formatting, so request threads only pay for
+    enqueueing. Arguments are merged into the message so the record is safe to
+    pass between threads.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, debug_sample_rate=LOG_DEBUG_SAMPLE_RATE, stream=None):
+    """
+    Route all logging through a background queue listener
+
+    Request threads only put records on an in-memory queue; a single listener
+    thread formats them and writes to the stream. Safe to call on every
+    Streamlit rerun: only the first call configures logging.
+
+    Args:
+        level: Level name for the root logger, e.g. "INFO" (production) or "DEBUG"
+        log_format: "json" for structured records or "text" for plain lines
+        debug_sample_rate: Fraction of DEBUG records to keep
+        stream: Output stream (defaults to stderr)
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(submission_id)s] %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _PreformattedQueueHandler(log_queue)
+    # Filters run before enqueueing, so sampled-out records cost almost nothing
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
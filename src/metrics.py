@@ -0,0 +1,342 @@
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Help text for the metrics this app records
+METRIC_HELP = {
+    "stage_seconds": "Time spent in each stage of the submission and analysis path",
+    "requests_total": "Analysis requests handled",
+    "errors_total": "Errors by stage and exception type",
+    "cache_hits_total": "Cache hits by cache name",
+    "tokens_total": "Model tokens by kind (prompt or output)",
+    "timeouts_total": "Requests that ran out of time, by stage",
+    "hedges_total": "Hedged model requests by outcome (fired, won, lost)",
+    "model_latency_seconds": "Model latency as served (hedged) and as the primary alone would have been (primary_only)",
+    "near_duplicates_total": "Submissions whose photo nearly matches an earlier one",
+    "retention_evictions_total": "Files deleted from temp/ by the retention manager, by category",
+    "retention_bytes_freed_total": "Bytes freed in temp/ by the retention manager",
+    "shared_cache_evictions_total": "Entries evicted from the shared cache",
+    "queue_depth": "Analysis jobs in the job queue, by status",
+    "warmup_seconds": "Time spent warming up each component at process start",
+    "warmup_failures_total": "Warm-up steps that failed, by step",
+    "ready": "1 once the process has warmed up and should receive traffic",
+    "model_cost_usd_total": "Estimated model spend in USD, by model",
+    "budget_used_ratio": "Share of the hourly or daily model budget spent",
+    "budget_degraded_total": "Analyses degraded to save budget, by level",
+    "photos_cropped_total": "Photos cropped to the handwriting before analysis",
+    "quality_checks_total": "Photos checked by the local quality gate, by outcome (pass or reject)",
+    "quality_rejections_total": "Photos rejected by the local quality gate, by reason",
+    "circuit_state": "Circuit breaker state per model tier (0 closed, 1 half-open, 2 open)",
+    "circuit_opened_total": "Times a model tier's circuit breaker opened",
+    "circuit_rejections_total": "Model calls refused at once because the tier's circuit breaker was open",
+    "model_unavailable_total": "Analyses refused because every model tier's circuit breaker was open",
+    "deferred_analyses_total": "Submissions queued for later analysis while the model was unavailable",
+    "drained_jobs_total": "Queued analyses worked off by the background drainer",
+}
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_histograms = {}   # (name, labels) -> Histogram
+_gauges = {}       # (name, labels) -> value
+
+# Per-request stage durations, collected for structured logs
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+# Set once the process has warmed up; served on /ready for the load balancer
+_ready = threading.Event()
+
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus style"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile (0..1) as the upper bound of the bucket containing it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """
+    Add to a counter
+
+    Args:
+        name: Counter name, e.g. "requests_total"
+        value: Amount to add
+        **labels: Label names and values, e.g. stage="upload"
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """Record a value (seconds) in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block as one stage of the request
+
+    The duration goes into the stage_seconds histogram. If the block raises,
+    errors_total is incremented with the stage and exception type before the
+    exception propagates.
+
+    Args:
+        stage: Stage name, e.g. "validate", "upload", "model_call"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        increment("errors_total", stage=stage, type=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_seconds", elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def start_request_timings():
+    """
+    Start collecting stage durations for the current request
+
+    Every timed() block in the same context adds its duration to the returned
+    dict until the next call, so the timings can be logged with the request.
+
+    Returns:
+        dict: Stage name -> seconds, filled in as stages complete
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def current_request_timings():
+    """Return the stage durations collected since start_request_timings() (empty if none)"""
+    return dict(_request_timings.get() or {})
+
+
+def set_gauge(name, value, **labels):
+    """
+    Set a gauge to its current value
+
+    Args:
+        name: Gauge name, e.g. "queue_depth"
+        value: Current value
+        **labels: Label names and values, e.g. status="queued"
+    """
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def set_ready(ready=True):
+    """Mark the process as ready (or not) to receive traffic"""
+    if ready:
+        _ready.set()
+    else:
+        _ready.clear()
+    set_gauge("ready", 1 if ready else 0)
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def reset():
+    """Clear all metrics"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+
+
+def snapshot():
+    """
+    Return all metrics as a JSON-serializable dict
+
+    Returns:
+        dict: {"counters": [...], "gauges": [...], "histograms": [...]} with labels, values and
+            p50/p95/p99 estimates for each histogram
+    """
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        gauges = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_gauges.items())
+        ]
+        histograms = [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "p50": histogram.quantile(0.50),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts)),
+            }
+            for (name, labels), histogram in sorted(_histograms.items())
+        ]
+    return {"timestamp": time.time(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    """
+    Render all metrics in the Prometheus text exposition format
+
+    Returns:
+        str: Metrics text
+    """
+    lines = []
+    with _lock:
+        seen = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), value in sorted(_gauges.items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in sorted(_histograms.items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = json.dumps(snapshot()).encode("utf-8")
+            content_type = "application/json"
+        elif self.path == "/ready":
+            # 503 until warmed up, so the load balancer holds traffic back
+            body = b"ready\n" if is_ready() else b"warming up\n"
+            self.send_response(200 if is_ready() else 503)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the app's output
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1", required=False):
+    """
+    Serve /metrics (Prometheus text), /metrics.json and /ready in a background thread
+
+    Safe to call on every Streamlit rerun: only the first call starts a server.
+    Every process needs its own port: a process that cannot bind has no
+    /ready endpoint, so a load balancer never sees it become ready.
+
+    Args:
+        port: Port to listen on (0 disables the server)
+        host: Interface to bind, local-only by default
+        required: Raise when the port cannot be bound instead of logging an error
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None if disabled or the port is taken
+
+    Raises:
+        OSError: If required and the port cannot be bound
+    """
+    global _server, _server_attempted
+    if not port:
+        return None
+    with _server_lock:
+        if not _server_attempted:
+            _server_attempted = True
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.error(f"Metrics server not started on {host}:{port}: {str(e)}. "
+                             "This process will never report ready; give each process its own METRICS_PORT")
+                if required:
+                    raise
+                return None
+            thread = threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True)
+            thread.start()
+    return _server
@@ -0,0 +1,236 @@
+import io
+import os
+import json
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import PHASH_INDEX_FILE, PHASH_RADIUS
+
+HASH_SIZE = 8
+# pHash works on a DCT of a (HASH_SIZE * 4) square thumbnail
+_DCT_SIZE = HASH_SIZE * 4
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II matrix, so dct(x) = M @ x"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def _bits_to_int(bits):
+    return int("".join("1" if b else "0" for b in bits.ravel()), 2)
+
+
+def _open_grayscale(image_bytes):
+    """Decode at reduced resolution; hashes only need a tiny thumbnail"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (_DCT_SIZE * 4, _DCT_SIZE * 4))
+    return image.convert("L")
+
+
+def dhash(image):
+    """
+    Difference hash: compares horizontally adjacent pixels of a 9x8 thumbnail
+
+    Args:
+        image: Grayscale PIL image
+
+    Returns:
+        int: 64-bit hash
+    """
+    pixels = np.asarray(image.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.float32)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    """
+    Perceptual hash: signs of the low-frequency DCT coefficients of a 32x32 thumbnail
+
+    Args:
+        image: Grayscale PIL image
+
+    Returns:
+        int: 64-bit hash
+    """
+    pixels = np.asarray(image.resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # Median without the DC term, which only reflects overall brightness
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def compute_hashes(image_bytes):
+    """
+    Compute both hashes for an image
+
+    Args:
+        image_bytes: Image file content
+
+    Returns:
+        dict: {"dhash": int, "phash": int}
+    """
+    image = _open_grayscale(image_bytes)
+    return {"dhash": dhash(image), "phash": phash(image)}
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes for Hamming-radius queries
+
+    Each node keeps its hash, the items with exactly that hash, and children
+    keyed by their distance to the node. A radius query only descends into
+    children whose distance is within radius of the query's distance, so it
+    visits a small fraction of the tree.
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, hash_value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [hash_value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(hash_value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, [item], {}]
+                return
+            node = child
+
+    def query(self, hash_value, radius):
+        """
+        Find items within a Hamming radius
+
+        Returns:
+            list: (distance, item) pairs sorted by distance
+        """
+        if self.root is None:
+            return []
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_hash, items, children = stack.pop()
+            distance = hamming(hash_value, node_hash)
+            if distance <= radius:
+                matches.extend((distance, item) for item in items)
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return sorted(matches, key=lambda match: match[0])
+
+
+class PerceptualIndex:
+    """
+    Near-duplicate index of submission images, persisted as JSON lines
+
+    Each line holds a submission_id and its hex dhash/phash. Appends from
+    other processes are picked up on the next query, so all workers share
+    one index file. When the file is replaced (build_phash_index.py) or
+    truncated, the index is reloaded from the start of the new file.
+
+    Args:
+        index_file: Path of the JSON-lines index
+    """
+    def __init__(self, index_file=PHASH_INDEX_FILE):
+        self.index_file = index_file
+        self.tree = BKTree()
+        self.dhashes = {}
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _refresh(self):
+        """Load lines appended since the last read, or everything if the file was replaced"""
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # A new file (or a truncated one): offsets into the old one mean nothing
+            self.tree = BKTree()
+            self.dhashes = {}
+            self._offset = 0
+            self._inode = stat.st_ino
+        if stat.st_size <= self._offset:
+            return
+        with open(self.index_file, "rb") as f:
+            if os.fstat(f.fileno()).st_ino != self._inode:
+                return  # Replaced again since the stat; reload on the next call
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partially written line; read it next time
+                self._offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._insert(entry["submission_id"], int(entry["dhash"], 16), int(entry["phash"], 16))
+
+    def _insert(self, submission_id, dhash_value, phash_value):
+        self.tree.add(phash_value, submission_id)
+        self.dhashes[submission_id] = dhash_value
+
+    def add(self, submission_id, hashes):
+        """
+        Add a submission to the index and the index file
+
+        Args:
+            submission_id: Submission the image belongs to
+            hashes: Result of compute_hashes()
+        """
+        line = json.dumps({
+            "submission_id": submission_id,
+            "dhash": f"{hashes['dhash']:016x}",
+            "phash": f"{hashes['phash']:016x}"
+        }) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+            # One short write in append mode, so lines from several processes never interleave
+            with open(self.index_file, "a") as f:
+                f.write(line)
+            # Read back through the file, which also picks up lines other processes appended meanwhile
+            self._refresh()
+
+    def find_near_duplicates(self, hashes, radius=PHASH_RADIUS):
+        """
+        Find indexed submissions whose image looks the same
+
+        A match needs both the pHash and the dHash within the radius, which
+        keeps false positives low for pages that merely share a layout.
+
+        Args:
+            hashes: Result of compute_hashes()
+            radius: Maximum Hamming distance
+
+        Returns:
+            list: (distance, submission_id) pairs, closest first
+        """
+        with self._lock:
+            self._refresh()
+            candidates = self.tree.query(hashes["phash"], radius)
+            return [
+                (distance, submission_id) for distance, submission_id in candidates
+                if hamming(hashes["dhash"], self.dhashes.get(submission_id, hashes["dhash"])) <= radius
+            ]
+
+    def __len__(self):
+        return self.tree.size
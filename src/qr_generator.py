@@ -2,6 +2,9 @@ import qrcode
 from PIL import Image
 import io
 import base64
+import logging
+
+logger = logging.getLogger(__name__)
 
 def generate_qr_code(url, logo_path=None):
     """
@@ -46,11 +49,24 @@ def generate_qr_code(url, logo_path=None):
             # Paste the logo
             qr_img.paste(logo, pos, logo)
         except Exception as e:
-            print(f"Error adding logo to QR code: {str(e)}")
+            logger.warning(f"Error adding logo to QR code: {str(e)}")
     
     # Convert to base64 for embedding in HTML
     buffered = io.BytesIO()
     qr_img.save(buffered, format="PNG")
     img_str = base64.b64encode(buffered.getvalue()).decode()
     
-    return img_str
\ No newline at end of file
+    return img_str
+
+def get_cached_qr_code(url, cache):
+    """
+    QR code for a URL, rendered once for every process sharing the cache
+    
+    Args:
+        url: The URL to encode in the QR code
+        cache: SharedCache holding rendered codes
+        
+    Returns:
+        str: Base64 encoded image of the QR code
+    """
+    return cache.get_or_set(f"qr:{url}", lambda: generate_qr_code(url))
@@ -0,0 +1,175 @@
+import io
+import logging
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    QUALITY_WIDTH,
+    QUALITY_MIN_SHARPNESS,
+    QUALITY_MIN_BRIGHTNESS,
+    QUALITY_MIN_CONTRAST,
+    QUALITY_MIN_INK,
+    QUALITY_MAX_INK,
+    QUALITY_MIN_LINES
+)
+from src import metrics
+from src.roi import find_text_box
+from src.scoring import ink_mask, find_text_lines
+
+logger = logging.getLogger(__name__)
+
+# The text region is found on a copy reduced by this factor
+BOX_FACTOR = 4
+
+# What the user is told for each problem, in the order they are checked
+MESSAGES = {
+    "no_writing": "We couldn't find any handwriting in this photo. Write a few lines on plain paper and fill most of the frame with the page.",
+    "too_dark": "The photo is too dark. Move to a brighter spot or turn on a light, and avoid shadows over the page.",
+    "low_contrast": "The writing is too faint or washed out. Use a darker pen, avoid glare on the page, and try again.",
+    "blurry": "The photo is blurry. Hold the phone steady, tap the page to focus, and make sure the writing is sharp.",
+    "too_little_ink": "There is too little writing to analyze, or the page is too far away. Move closer so the writing fills the frame.",
+    "too_much_ink": "This doesn't look like handwriting on paper. Photograph a page of writing on a plain, light background.",
+    "too_few_lines": "Please write at least {lines} lines of text so there is enough to analyze.",
+}
+
+
+def _laplacian(gray):
+    """4-neighbour Laplacian of a 2-D array (the image border is dropped)"""
+    return (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+            - 4 * gray[1:-1, 1:-1])
+
+
+def load_image(image_bytes, width=QUALITY_WIDTH):
+    """
+    Decode a photo to an 8-bit grayscale PIL image at most `width` pixels wide
+
+    JPEGs are decoded at reduced resolution (draft mode), which is most of
+    the cost for a full-size phone photo.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (width, width * image.height // max(image.width, 1)))
+    image = image.convert("L")
+    if image.width > width:
+        image = image.resize((width, max(1, image.height * width // image.width)), Image.BILINEAR)
+    return image
+
+
+def _percentiles(levels, shares):
+    """Percentiles of an 8-bit image from its histogram, much cheaper than sorting"""
+    cumulative = np.cumsum(np.bincount(levels.ravel(), minlength=256))
+    return [int(np.searchsorted(cumulative, share * cumulative[-1])) for share in shares]
+
+
+def measure(image):
+    """
+    Measure the capture quality of a photo
+
+    Args:
+        image: 8-bit grayscale PIL image, about QUALITY_WIDTH wide
+
+    Returns:
+        dict: Measures - "brightness" (median, 0..255), "contrast" (1st to 99th
+            percentile spread, 0..255), "sharpness" (variance of the Laplacian
+            over the writing, 0..255 scale), "ink" (share of ink pixels in the
+            writing), "lines" (text lines found) and "box" (text region in
+            the analyzed copy, or None)
+    """
+    levels = np.asarray(image)
+    low, median, high = _percentiles(levels, (0.01, 0.5, 0.99))
+    measures = {
+        "brightness": round(float(median), 1),
+        "contrast": round(float(high - low), 1),
+        "sharpness": 0.0,
+        "ink": 0.0,
+        "lines": 0,
+        "box": None,
+    }
+
+    # The text region is found on a quarter-size copy, which is plenty for a bounding box
+    small = np.asarray(image.reduce(BOX_FACTOR), dtype=np.float32) / 255.0
+    box = find_text_box(small)
+    if box is None:
+        return measures
+    left, top, right, bottom = (value * BOX_FACTOR for value in box)
+    measures["box"] = (left, top, right, bottom)
+
+    region = levels[top:bottom, left:right].astype(np.float32)
+    if min(region.shape) < 8:
+        return measures
+    measures["sharpness"] = round(float(_laplacian(region).var()), 1)
+    ink = ink_mask(region / 255.0)
+    measures["ink"] = round(float(ink.mean()), 4)
+    measures["lines"] = len(find_text_lines(ink))
+    return measures
+
+
+def check_measures(measures, min_sharpness=QUALITY_MIN_SHARPNESS, min_brightness=QUALITY_MIN_BRIGHTNESS,
+                   min_contrast=QUALITY_MIN_CONTRAST, min_ink=QUALITY_MIN_INK, max_ink=QUALITY_MAX_INK,
+                   min_lines=QUALITY_MIN_LINES):
+    """
+    Compare measures against the thresholds
+
+    Returns:
+        list: Problem codes (keys of MESSAGES), empty when the photo is usable
+    """
+    if measures["box"] is None:
+        return ["no_writing"]
+    problems = []
+    if measures["brightness"] < min_brightness:
+        problems.append("too_dark")
+    if measures["contrast"] < min_contrast:
+        problems.append("low_contrast")
+    if measures["sharpness"] < min_sharpness:
+        problems.append("blurry")
+    if measures["ink"] < min_ink:
+        problems.append("too_little_ink")
+    elif measures["ink"] > max_ink:
+        problems.append("too_much_ink")
+    if measures["lines"] < min_lines and not {"too_little_ink", "too_much_ink"} & set(problems):
+        problems.append("too_few_lines")
+    return problems
+
+
+def message_for(problem):
+    return MESSAGES[problem].format(lines=QUALITY_MIN_LINES)
+
+
+def check_image(image_bytes, width=QUALITY_WIDTH):
+    """
+    Decide locally whether a photo is good enough to analyze
+
+    The measures take a few milliseconds on a downscaled grayscale copy
+    (decoding a full-size phone JPEG costs more), so unusable photos
+    (blurry, dark, washed out, blank or with too little writing) are turned
+    away with advice before anything is uploaded or sent to the model.
+    Outcomes are counted in quality_checks_total and rejections by reason in
+    quality_rejections_total.
+
+    Args:
+        image_bytes: Image file content
+        width: Width of the copy the measures are taken on
+
+    Returns:
+        dict: {"ok": bool, "problems": [{"code", "message"}], "measures": dict}
+    """
+    with metrics.timed("quality_check"):
+        try:
+            image = load_image(image_bytes, width=width)
+        except Exception as e:
+            # Leave unreadable files to the validation and analysis paths
+            logger.warning(f"Quality check skipped: {str(e)}")
+            return {"ok": True, "problems": [], "measures": {}}
+        measures = measure(image)
+        problems = check_measures(measures)
+
+    metrics.increment("quality_checks_total", outcome="reject" if problems else "pass")
+    for problem in problems:
+        metrics.increment("quality_rejections_total", reason=problem)
+    if problems:
+        logger.info(f"Photo rejected by the quality gate: {', '.join(problems)} {measures}")
+    return {
+        "ok": not problems,
+        "problems": [{"code": problem, "message": message_for(problem)} for problem in problems],
+        "measures": measures,
+    }
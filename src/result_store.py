@@ -0,0 +1,139 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from config import RESULTS_FOLDER
+from src import aggregates
+
+
+def image_hash(image_bytes):
+    """
+    Hash the raw image bytes
+
+    Args:
+        image_bytes: Image file content
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _atomic_write(path, data):
+    """Write bytes to path via a temp file and rename, so readers never see a partial file"""
+    # Unique per writer: several processes and threads may save the same image hash at once
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _result_path(submission_id, results_dir):
+    # Submission IDs are generated by the app, but never trust them as path components
+    safe_id = "".join(c for c in submission_id if c.isalnum() or c == "_")
+    return os.path.join(results_dir, f"{safe_id}.json.gz")
+
+
+def _submission_key(submission_id):
+    return f"submission:{submission_id}"
+
+
+def _hash_key(image_sha, prompt_version):
+    return f"result:{prompt_version}:{image_sha}"
+
+
+def save_result(submission_id, image_sha, result, model, prompt_version, results_dir=RESULTS_FOLDER, cache=None,
+                reused=False):
+    """
+    Persist an analysis result next to the submission
+
+    The record is stored as gzipped compact JSON, and an index entry maps the
+    image hash to the submission so an identical image can reuse the result.
+    The scores of a fresh analysis are also folded into this process's
+    population statistics; a reused result was counted when it was made.
+
+    Args:
+        submission_id: Submission the result belongs to
+        image_sha: image_hash() of the analyzed image
+        result: Parsed analysis result
+        model: Model that produced the result
+        prompt_version: Version of the prompt used
+        results_dir: Directory holding the stored results
+        cache: Optional SharedCache; the record is published there so other processes see it at once
+        reused: True when the result was copied from an earlier submission instead of analyzed
+
+    Returns:
+        dict: The stored record
+    """
+    os.makedirs(os.path.join(results_dir, "by_hash"), exist_ok=True)
+    record = {
+        "submission_id": submission_id,
+        "image_hash": image_sha,
+        "model": model,
+        "prompt_version": prompt_version,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "reused": reused,
+        "result": result
+    }
+    data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    _atomic_write(_result_path(submission_id, results_dir), gzip.compress(data))
+    _atomic_write(os.path.join(results_dir, "by_hash", image_sha), submission_id.encode("utf-8"))
+    if cache is not None:
+        cache.set(_submission_key(submission_id), record)
+        cache.set(_hash_key(image_sha, prompt_version), record)
+    if not reused:
+        aggregates.record(result)
+    return record
+
+
+def load_result(submission_id, results_dir=RESULTS_FOLDER, cache=None):
+    """
+    Load a stored result record
+
+    Args:
+        submission_id: Submission to look up
+        results_dir: Directory holding the stored results
+        cache: Optional SharedCache read before the disk
+
+    Returns:
+        dict: The stored record (with "result", "model", "prompt_version", ...), or None
+    """
+    if cache is not None:
+        return cache.get_or_set(_submission_key(submission_id), lambda: load_result(submission_id, results_dir))
+    path = _result_path(submission_id, results_dir)
+    try:
+        with gzip.open(path, "rb") as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def find_by_image_hash(image_sha, prompt_version=None, results_dir=RESULTS_FOLDER, cache=None):
+    """
+    Find a stored result for an identical image
+
+    Args:
+        image_sha: image_hash() of the image
+        prompt_version: If given, only return results produced with this prompt version
+        results_dir: Directory holding the stored results
+        cache: Optional SharedCache read before the disk (used when prompt_version is given)
+
+    Returns:
+        dict: The stored record, or None
+    """
+    if cache is not None and prompt_version:
+        return cache.get_or_set(_hash_key(image_sha, prompt_version),
+                                lambda: find_by_image_hash(image_sha, prompt_version, results_dir))
+    try:
+        with open(os.path.join(results_dir, "by_hash", image_sha), "r") as f:
+            submission_id = f.read().strip()
+    except OSError:
+        return None
+
+    record = load_result(submission_id, results_dir)
+    if record is None or (prompt_version and record.get("prompt_version") != prompt_version):
+        return None
+    return record
@@ -0,0 +1,319 @@
+import os
+import gzip
+import json
+import time
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from config import (
+    TEMP_FOLDER,
+    SUBMISSIONS_FILE,
+    SUBMISSIONS_ARCHIVE_FILE,
+    WINNERS_FILE,
+    RESULTS_FOLDER,
+    THUMBNAILS_FOLDER,
+    OBJECTS_FOLDER,
+    TEMP_BUDGET_MB,
+    RETENTION_DAYS,
+    RETENTION_BATCH,
+    RETENTION_GRACE_SECONDS,
+    JOB_QUEUE_FILE,
+    JOB_RETENTION_HOURS
+)
+from src import metrics
+from src.storage import LOCAL_PREFIX
+from src.result_store import _result_path
+from src.job_queue import JobQueue
+from src.submissions import submissions_lock, iter_archived_submissions
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".bin")
+# Leftover temp files older than this belong to writers that died
+STALE_TEMP_SECONDS = 3600
+
+
+def _last_used(stat):
+    """Last access time, falling back to mtime on noatime mounts"""
+    return max(stat.st_atime, stat.st_mtime)
+
+
+def _read_submissions(submissions_file):
+    """
+    Load the submission log
+
+    Returns:
+        list: The records ([] if there is no log yet), or None if the log cannot be parsed
+    """
+    try:
+        with open(submissions_file, "r") as f:
+            return json.load(f)
+    except OSError:
+        return []
+    except ValueError:
+        logger.warning(f"Could not parse {submissions_file}; leaving it and its images alone")
+        return None
+
+
+def _winning_ids(winners_file):
+    try:
+        with open(winners_file, "r") as f:
+            winners = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    return {entry.get("submission_id") for entry in winners.values()}
+
+
+class RetentionManager:
+    """
+    Keeps temp/ within a byte budget and age policy
+
+    Each pass compacts the submission log, then deletes evictable files:
+    first everything not used for longer than max_age, then the least
+    recently used until temp/ fits the budget. Evictable files are
+    thumbnails, stored results and their image-hash index entries, orphaned
+    images (referenced by no submission) and stale temp files. Index
+    entries whose result is gone go first. Images a submission still points
+    to locally are the only copy (never uploaded), so they are never
+    deleted, and neither are the results of contest winners. Files younger
+    than the grace period are left alone, so an image stored moments before
+    its submission record is written is not mistaken for an orphan.
+    Finished jobs older than job_retention_hours are purged from the job
+    queue.
+
+    Args:
+        temp_dir: Directory to manage
+        budget_bytes: Target total size of temp_dir
+        max_age_days: Evict files not used for this many days
+        batch: Maximum files deleted per pass
+        grace_seconds: Never evict files modified more recently than this
+        job_retention_hours: Delete finished jobs from the job queue after this long
+    """
+    def __init__(self, temp_dir=TEMP_FOLDER, budget_bytes=TEMP_BUDGET_MB * 1024 * 1024,
+                 max_age_days=RETENTION_DAYS, batch=RETENTION_BATCH, grace_seconds=RETENTION_GRACE_SECONDS,
+                 submissions_file=SUBMISSIONS_FILE, archive_file=SUBMISSIONS_ARCHIVE_FILE,
+                 winners_file=WINNERS_FILE, results_dir=RESULTS_FOLDER,
+                 thumbnails_dir=THUMBNAILS_FOLDER, objects_dir=OBJECTS_FOLDER,
+                 job_queue_file=JOB_QUEUE_FILE, job_retention_hours=JOB_RETENTION_HOURS):
+        self.temp_dir = temp_dir
+        self.budget_bytes = budget_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self.batch = batch
+        self.grace_seconds = grace_seconds
+        self.submissions_file = submissions_file
+        self.archive_file = archive_file
+        self.winners_file = winners_file
+        self.results_dir = results_dir
+        self.thumbnails_dir = thumbnails_dir
+        self.objects_dir = objects_dir
+        self.job_queue_file = job_queue_file
+        self.job_retention_seconds = job_retention_hours * 3600
+        self._thread = None
+        self._stop = threading.Event()
+
+    def compact_submissions(self, dry_run=False):
+        """
+        Move submissions older than max_age to the gzip archive and drop duplicate records
+
+        The whole pass holds the submissions lock, so the app cannot append
+        meanwhile and two passes (the background thread of another process,
+        or cleanup_temp.py) never archive the same records twice.
+
+        Returns:
+            dict: {"archived": n, "duplicates": n}
+        """
+        cutoff = (datetime.now() - timedelta(seconds=self.max_age_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+        with submissions_lock(self.submissions_file):
+            submissions = _read_submissions(self.submissions_file) or []
+            seen = set()
+            keep, archive, duplicates = [], [], 0
+            for record in submissions:
+                submission_id = record.get("submission_id")
+                if submission_id in seen:
+                    duplicates += 1
+                    continue
+                seen.add(submission_id)
+                (archive if record.get("timestamp", "") < cutoff else keep).append(record)
+
+            report = {"archived": len(archive), "duplicates": duplicates}
+            if dry_run or not (archive or duplicates):
+                return report
+
+            if archive:
+                # Each compaction appends one gzip member; readers see them as one stream
+                with gzip.open(self.archive_file, "at") as f:
+                    for record in archive:
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+            temp_path = f"{self.submissions_file}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(keep, f, indent=2)
+            os.replace(temp_path, self.submissions_file)
+        return report
+
+    def _protected(self):
+        """
+        Paths of local images still referenced by a submission, and the winners' IDs
+
+        The referenced paths are None when the submission log cannot be
+        read: then no image counts as orphaned.
+        """
+        submissions = _read_submissions(self.submissions_file)
+        if submissions is None:
+            return None, _winning_ids(self.winners_file)
+        referenced = set()
+        for record in itertools.chain(submissions, iter_archived_submissions(self.archive_file)):
+            image_url = record.get("image_url") or ""
+            if image_url.startswith(LOCAL_PREFIX):
+                referenced.add(os.path.abspath(image_url[len(LOCAL_PREFIX):]))
+        return referenced, _winning_ids(self.winners_file)
+
+    @staticmethod
+    def _indexed_submission(path):
+        """Submission ID an image-hash index entry points to, or None if unreadable"""
+        try:
+            with open(path, "r") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _scan(self):
+        """
+        Walk temp_dir and classify every file
+
+        Returns:
+            tuple: (total_bytes, candidates, protected) - candidates are
+                (last_used, size, path, category) tuples
+        """
+        referenced, winners = self._protected()
+        results_dir = os.path.abspath(self.results_dir)
+        by_hash_dir = os.path.join(results_dir, "by_hash")
+        thumbnails_dir = os.path.abspath(self.thumbnails_dir)
+        objects_dir = os.path.abspath(self.objects_dir)
+        now = time.time()
+        total, candidates, protected = 0, [], {"unsynced": 0, "winner": 0, "recent": 0}
+
+        for directory, _, files in os.walk(self.temp_dir):
+            directory = os.path.abspath(directory)
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Deleted while we walked
+                total += stat.st_size
+                last_used = _last_used(stat)
+
+                if now - stat.st_mtime < self.grace_seconds and not name.endswith(".tmp"):
+                    protected["recent"] += 1
+                elif name.endswith(".tmp"):
+                    if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                        candidates.append((last_used, stat.st_size, path, "temp"))
+                elif directory.startswith(thumbnails_dir):
+                    candidates.append((last_used, stat.st_size, path, "thumbnail"))
+                elif directory == results_dir and name.endswith(".json.gz"):
+                    if name[:-len(".json.gz")] in winners:
+                        protected["winner"] += 1
+                    else:
+                        candidates.append((last_used, stat.st_size, path, "result"))
+                elif directory == by_hash_dir:
+                    submission_id = self._indexed_submission(path)
+                    if submission_id in winners:
+                        protected["winner"] += 1
+                    elif submission_id is None or not os.path.exists(_result_path(submission_id, self.results_dir)):
+                        # Points at a result that is gone: useless, evict it first
+                        candidates.append((0, stat.st_size, path, "result_index"))
+                    else:
+                        candidates.append((last_used, stat.st_size, path, "result_index"))
+                elif name.lower().endswith(IMAGE_EXTENSIONS) and (
+                        directory.startswith(objects_dir) or directory == os.path.abspath(self.temp_dir)):
+                    if referenced is None or path in referenced:
+                        protected["unsynced"] += 1
+                    else:
+                        candidates.append((last_used, stat.st_size, path, "orphan_image"))
+        return total, candidates, protected
+
+    def run(self, dry_run=False):
+        """
+        Run one incremental retention pass
+
+        Args:
+            dry_run: Only report what would be deleted
+
+        Returns:
+            dict: Report with sizes before/after, evictions by category and protected counts
+        """
+        compaction = self.compact_submissions(dry_run)
+        jobs_purged = 0
+        if not dry_run and os.path.exists(self.job_queue_file):
+            jobs_purged = JobQueue(self.job_queue_file).purge(self.job_retention_seconds)
+        total, candidates, protected = self._scan()
+        now = time.time()
+
+        # Oldest first: expired files go regardless of the budget, the rest only while over it
+        candidates.sort()
+        remaining = total
+        evictions = []
+        for last_used, size, path, category in candidates:
+            if len(evictions) >= self.batch:
+                break
+            expired = now - last_used > self.max_age_seconds
+            if not expired and remaining <= self.budget_bytes:
+                break
+            evictions.append({"path": path, "size": size, "category": category,
+                              "reason": "age" if expired else "budget"})
+            remaining -= size
+
+        freed = 0
+        if not dry_run:
+            for eviction in evictions:
+                try:
+                    os.remove(eviction["path"])
+                except OSError:
+                    continue
+                freed += eviction["size"]
+                metrics.increment("retention_evictions_total", category=eviction["category"])
+            if freed:
+                metrics.increment("retention_bytes_freed_total", freed)
+
+        by_category = {}
+        for eviction in evictions:
+            by_category[eviction["category"]] = by_category.get(eviction["category"], 0) + 1
+        report = {
+            "dry_run": dry_run,
+            "total_bytes": total,
+            "budget_bytes": self.budget_bytes,
+            "bytes_after": remaining,
+            "evicted": by_category,
+            "evictions": evictions,
+            "protected": protected,
+            "compaction": compaction,
+            "jobs_purged": jobs_purged,
+            "over_budget": remaining > self.budget_bytes
+        }
+        if remaining > self.budget_bytes and len(evictions) < self.batch:
+            logger.warning("temp/ is over its budget and nothing else can be evicted", extra={
+                "bytes": remaining, "budget": self.budget_bytes, "protected": protected
+            })
+        return report
+
+    def start_background(self, interval):
+        """Run a pass every `interval` seconds in a daemon thread (once per manager)"""
+        if self._thread is not None:
+            return
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    report = self.run()
+                    if report["evicted"] or report["compaction"]["archived"] or report["jobs_purged"]:
+                        logger.info("Retention pass", extra={"evicted": report["evicted"],
+                                                             "bytes_after": report["bytes_after"]})
+                except Exception:
+                    logger.exception("Retention pass failed")
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop_background(self):
+        self._stop.set()
@@ -0,0 +1,179 @@
+import numpy as np
+
+from config import ROI_PADDING, ROI_MIN_SAVING
+from src.scoring import ink_mask
+
+# Text regions are detected on a copy reduced to about this many pixels on its longer side
+DETECT_SIZE = 400
+# Adaptive threshold: a pixel is ink when darker than its neighbourhood mean by this much (0..1)
+THRESHOLD_OFFSET = 0.08
+# Share of the ink allowed outside the box on each side, so stray specks do not stretch it
+OUTLIER_SHARE = 0.005
+
+
+def _box_sum(values, radius):
+    """
+    Sum over the (2*radius+1)-square window around every pixel, via an integral image
+
+    Edges are extended by repeating the border, so sums are always over full windows.
+    """
+    size = 2 * radius + 1
+    padded = np.pad(values, radius, mode="edge").astype(np.float32)
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.float32)
+    np.cumsum(np.cumsum(padded, axis=0), axis=1, out=integral[1:, 1:])
+    return integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+
+
+def adaptive_threshold(gray, radius, offset=THRESHOLD_OFFSET):
+    """
+    Ink mask: pixels darker than their local mean by more than `offset`
+
+    Unlike a global threshold this copes with shadows and uneven light,
+    and flat regions (the table, a blank page) never count as ink.
+
+    Args:
+        gray: Grayscale array in 0..1
+        radius: Half-width of the neighbourhood in pixels
+
+    Returns:
+        np.ndarray: Boolean array, True where there is ink
+    """
+    local_mean = _box_sum(gray, radius) / (2 * radius + 1) ** 2
+    return gray < local_mean - offset
+
+
+def dilate(mask, radius):
+    return _box_sum(mask, radius) > 0
+
+
+def erode(mask, radius):
+    return _box_sum(mask, radius) >= (2 * radius + 1) ** 2 - 0.5
+
+
+def close(mask, radius):
+    """Morphological closing (dilate, then erode) with a square, merging strokes into text blocks"""
+    return erode(dilate(mask, radius), radius)
+
+
+def paper_mask(gray, radius):
+    """
+    Interior of the bright paper: above the mean brightness, ink holes closed, edges eroded away
+
+    The edge of the page against a darker table looks like ink to the
+    adaptive threshold; keeping only ink inside the paper ignores it.
+    """
+    paper = close(gray > gray.mean(), radius)
+    return erode(paper, radius)
+
+
+def _extent(counts, outlier_share):
+    """First and last index (exclusive) holding all but `outlier_share` of the counts at each end"""
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    start = int(np.searchsorted(cumulative, total * outlier_share, side="right"))
+    end = int(np.searchsorted(cumulative, total * (1 - outlier_share), side="left")) + 1
+    return start, min(end, len(counts))
+
+
+def find_text_box(gray):
+    """
+    Bounding box of the handwriting in a small grayscale image
+
+    Args:
+        gray: Grayscale array in 0..1, about DETECT_SIZE on its longer side
+
+    Returns:
+        tuple: (left, top, right, bottom) in pixels, right/bottom exclusive, or None if no ink was found
+    """
+    height, width = gray.shape
+    scale = max(height, width)
+    ink = adaptive_threshold(gray, radius=max(2, scale // 32))
+    ink &= paper_mask(gray, radius=max(2, scale // 64))
+    blocks = close(ink, radius=max(1, scale // 128))
+
+    # Outlines of the page or the table at the very edge are not writing
+    border = max(1, scale // 50)
+    blocks[:border] = blocks[-border:] = False
+    blocks[:, :border] = blocks[:, -border:] = False
+    if blocks.sum() < 0.001 * blocks.size:
+        return None
+
+    top, bottom = _extent(blocks.sum(axis=1), OUTLIER_SHARE)
+    left, right = _extent(blocks.sum(axis=0), OUTLIER_SHARE)
+    return left, top, right, bottom
+
+
+def find_paper_box(gray):
+    """
+    Bounding box of the sheet of paper in a small grayscale image
+
+    The paper is the light side of Otsu's threshold with the writing on it
+    closed up, which separates a page from a darker table; when the page
+    fills the photo the box is (about) the whole photo.
+
+    Args:
+        gray: Grayscale array in 0..1, about DETECT_SIZE on its longer side
+
+    Returns:
+        tuple: (left, top, right, bottom) in pixels, right/bottom exclusive
+    """
+    height, width = gray.shape
+    paper = close(~ink_mask(gray), radius=max(2, max(height, width) // 64))
+    if not paper.any():
+        return 0, 0, width, height
+    top, bottom = _extent(paper.sum(axis=1), OUTLIER_SHARE)
+    left, right = _extent(paper.sum(axis=0), OUTLIER_SHARE)
+    return left, top, right, bottom
+
+
+def crop_to_text(image, padding=ROI_PADDING, min_saving=ROI_MIN_SAVING):
+    """
+    Crop a photo to its handwriting
+
+    The text region is found on a block-averaged grayscale copy (PIL's
+    reduce(), a few milliseconds even for a 12 MP photo), then the photo is
+    cropped to it with some padding. The padded crop cuts away the edges
+    of the page, so the margins the writing left on the page (measured
+    against the detected paper, not the photo's edges) are returned, and
+    the Margins feature can still be judged from the cropped image.
+
+    Args:
+        image: PIL image of the photo
+        padding: Padding around the writing, as a share of the photo's width and height
+        min_saving: Keep the full photo unless cropping removes at least this share of its area
+
+    Returns:
+        tuple: (PIL image, crop info dict with "cropped", "box", "size" and "margins"
+            (left/right/top/bottom as shares of the page's width and height), or None if no
+            writing was found)
+    """
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")  # reduce() does not handle palette images
+    width, height = image.size
+    factor = max(1, max(width, height) // DETECT_SIZE)
+    gray = np.asarray(image.reduce(factor).convert("L"), dtype=np.float32) / 255.0
+    box = find_text_box(gray)
+    if box is None:
+        return image, None
+
+    # Scale the box to the full image
+    scale_x, scale_y = width / gray.shape[1], height / gray.shape[0]
+    left, top, right, bottom = box[0] * scale_x, box[1] * scale_y, box[2] * scale_x, box[3] * scale_y
+    paper_left, paper_top, paper_right, paper_bottom = find_paper_box(gray)
+    paper_width = max(1, paper_right - paper_left)
+    paper_height = max(1, paper_bottom - paper_top)
+    margins = {
+        "left": round(max(0.0, (box[0] - paper_left) / paper_width), 3),
+        "right": round(max(0.0, (paper_right - box[2]) / paper_width), 3),
+        "top": round(max(0.0, (box[1] - paper_top) / paper_height), 3),
+        "bottom": round(max(0.0, (paper_bottom - box[3]) / paper_height), 3),
+    }
+    crop_box = (
+        max(0, int(left - padding * width)),
+        max(0, int(top - padding * height)),
+        min(width, int(np.ceil(right + padding * width))),
+        min(height, int(np.ceil(bottom + padding * height)))
+    )
+    cropped = (crop_box[2] - crop_box[0]) * (crop_box[3] - crop_box[1]) <= (1 - min_saving) * width * height
+    info = {"cropped": cropped, "box": list(crop_box), "size": [width, height], "margins": margins}
+    return (image.crop(crop_box) if cropped else image), info
@@ -0,0 +1,261 @@
+import os
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from src.storage import read_image
+
+logger = logging.getLogger(__name__)
+
+# Images are scored at this width; enough for line and letter geometry, cheap to process
+SCORING_WIDTH = 1000
+
+# Relative weight of each metric in the overall score
+METRIC_WEIGHTS = {
+    "baseline_straightness": 0.25,
+    "size_consistency": 0.2,
+    "spacing_regularity": 0.2,
+    "stroke_smoothness": 0.15,
+    "margin_uniformity": 0.2,
+}
+
+
+def load_grayscale(image_bytes, width=SCORING_WIDTH):
+    """
+    Decode an image to a grayscale float array scaled to about `width` pixels wide
+
+    JPEGs are decoded at reduced resolution (draft mode), which is much
+    faster than decoding the full photo and resizing.
+
+    Args:
+        image_bytes: Image file content
+        width: Target width in pixels
+
+    Returns:
+        np.ndarray: 2-D float32 array in 0..1 (0 = black)
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (width, width * image.height // max(image.width, 1)))
+    image = image.convert("L")
+    if image.width > width:
+        image = image.resize((width, max(1, image.height * width // image.width)), Image.BILINEAR)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+
+def ink_mask(gray):
+    """
+    Separate ink from paper with Otsu's threshold
+
+    Args:
+        gray: Grayscale array in 0..1
+
+    Returns:
+        np.ndarray: Boolean array, True where there is ink
+    """
+    histogram = np.bincount((gray * 255).astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+    between_variance = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    threshold = np.argmax(between_variance) / 255.0
+    return gray <= threshold
+
+
+def _runs(mask_1d):
+    """Start and end (exclusive) indices of the True runs in a 1-D boolean array"""
+    padded = np.concatenate(([False], mask_1d, [False])).astype(np.int8)
+    changes = np.flatnonzero(np.diff(padded))
+    return changes[0::2], changes[1::2]
+
+
+def find_text_lines(ink, min_fraction=0.15):
+    """
+    Find horizontal bands that contain a line of text
+
+    Args:
+        ink: Boolean ink mask
+        min_fraction: Rows with less ink than this fraction of the busiest row count as gaps
+
+    Returns:
+        list: (top, bottom) row ranges, bottom exclusive
+    """
+    profile = ink.sum(axis=1)
+    if profile.max() == 0:
+        return []
+    starts, ends = _runs(profile > profile.max() * min_fraction)
+    min_height = max(3, ink.shape[0] // 100)
+    return [(top, bottom) for top, bottom in zip(starts, ends) if bottom - top >= min_height]
+
+
+def _score_from_variation(values, scale=1.0):
+    """Map a coefficient of variation to a 0..1 score (1 = perfectly regular)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 2 or values.mean() == 0:
+        return 0.0
+    cv = values.std() / values.mean()
+    return float(1.0 / (1.0 + scale * cv))
+
+
+def compute_metrics(gray):
+    """
+    Compute legibility and neatness metrics for one page
+
+    Args:
+        gray: Grayscale array in 0..1
+
+    Returns:
+        dict: Metric name -> score in 0..1 (higher is neater), plus "line_count"
+    """
+    ink = ink_mask(gray)
+    height, width = ink.shape
+    lines = find_text_lines(ink)
+    metrics = {name: 0.0 for name in METRIC_WEIGHTS}
+    metrics["line_count"] = len(lines)
+    if not lines:
+        return metrics
+
+    columns = np.arange(width)
+    baseline_residuals = []
+    letter_heights = []
+    gaps = []
+    left_margins = []
+    right_margins = []
+
+    for top, bottom in lines:
+        band = ink[top:bottom]
+        band_height = bottom - top
+        has_ink = band.any(axis=0)
+        if has_ink.sum() < 10:
+            continue
+        ink_columns = columns[has_ink]
+
+        # Baseline: lowest ink pixel in each column, fitted with a straight line
+        lowest = band_height - 1 - np.argmax(band[::-1], axis=0)
+        highest = np.argmax(band, axis=0)
+        slope, intercept = np.polyfit(ink_columns, lowest[has_ink], 1)
+        residual = lowest[has_ink] - (slope * ink_columns + intercept)
+        baseline_residuals.append(residual.std() / band_height)
+
+        # Letter size: vertical ink extent per column
+        letter_heights.append((lowest - highest + 1)[has_ink])
+
+        # Spacing: blank column runs between the first and last ink column
+        starts, ends = _runs(~has_ink[ink_columns[0]:ink_columns[-1] + 1])
+        gaps.append(ends - starts)
+
+        left_margins.append(ink_columns[0] / width)
+        right_margins.append((width - 1 - ink_columns[-1]) / width)
+
+    if not baseline_residuals:
+        return metrics
+
+    # Straight baselines have small residuals relative to the line height
+    metrics["baseline_straightness"] = float(np.exp(-8.0 * np.mean(baseline_residuals)))
+
+    heights = np.concatenate(letter_heights)
+    metrics["size_consistency"] = _score_from_variation(heights)
+
+    # Word gaps only: ignore the tiny gaps inside letters
+    all_gaps = np.concatenate(gaps) if gaps else np.array([])
+    word_gaps = all_gaps[all_gaps >= max(2, width // 200)]
+    metrics["spacing_regularity"] = _score_from_variation(word_gaps)
+
+    # Smooth, controlled strokes have steady stroke widths (horizontal ink run lengths)
+    rows = ink[lines[0][0]:lines[-1][1]]
+    padded = np.pad(rows, ((0, 0), (1, 1))).astype(np.int8)
+    changes = np.diff(padded, axis=1)
+    run_lengths = np.flatnonzero(changes.ravel() == -1) - np.flatnonzero(changes.ravel() == 1)
+    metrics["stroke_smoothness"] = _score_from_variation(run_lengths[run_lengths > 0], scale=0.5)
+
+    # Uniform margins: left edges line up and left/right are balanced
+    left = np.asarray(left_margins)
+    right = np.asarray(right_margins)
+    alignment = np.exp(-20.0 * left.std())
+    balance = np.exp(-5.0 * abs(left.mean() - right.mean()))
+    metrics["margin_uniformity"] = float(0.7 * alignment + 0.3 * balance)
+
+    return metrics
+
+
+def overall_score(metrics):
+    """Weighted mean of the metrics on a 0..10 scale"""
+    return round(10.0 * sum(metrics[name] * weight for name, weight in METRIC_WEIGHTS.items()), 2)
+
+
+def score_image(image_bytes):
+    """
+    Score one handwriting photo
+
+    Args:
+        image_bytes: Image file content
+
+    Returns:
+        dict: The metrics plus "score" (0..10)
+    """
+    metrics = compute_metrics(load_grayscale(image_bytes))
+    metrics["score"] = overall_score(metrics)
+    return metrics
+
+
+def load_submission_image(submission):
+    """
+    Fetch the image of a submission record
+
+    Args:
+        submission: Record from submissions.json
+
+    Returns:
+        bytes: Image content
+    """
+    return read_image(submission.get("image_url") or "")
+
+
+def _score_submission(submission):
+    """Worker entry point: score one submission, never raising"""
+    try:
+        result = score_image(load_submission_image(submission))
+        result["submission_id"] = submission["submission_id"]
+        result["user_name"] = submission.get("user_name")
+        return result
+    except Exception as e:
+        return {"submission_id": submission.get("submission_id"), "user_name": submission.get("user_name"),
+                "score": None, "error": str(e)}
+
+
+def rank_submissions(submissions, hour_group=None, processes=None):
+    """
+    Score and rank all submissions of an hour in one batched pass
+
+    Scoring runs in a process pool across all cores; no API calls are made.
+
+    Args:
+        submissions: Submission records (as in submissions.json)
+        hour_group: Only rank entries of this hour_group (e.g. "2025-03-25-16"); None ranks all
+        processes: Worker processes (defaults to the number of CPUs)
+
+    Returns:
+        list: Result dicts sorted best first; entries that failed to score are last with "error" set
+    """
+    entries = [s for s in submissions if hour_group is None or s.get("hour_group") == hour_group]
+    if not entries:
+        return []
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(entries) == 1:
+        results = [_score_submission(entry) for entry in entries]
+    else:
+        chunksize = max(1, len(entries) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_score_submission, entries, chunksize=chunksize))
+
+    failed = [r for r in results if r.get("score") is None]
+    for result in failed:
+        logger.warning(f"Could not score submission {result['submission_id']}: {result['error']}")
+    scored = sorted((r for r in results if r.get("score") is not None), key=lambda r: r["score"], reverse=True)
+    return scored + failed
@@ -0,0 +1,213 @@
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from config import SHARED_CACHE_BACKEND, SHARED_CACHE_FILE, SHARED_CACHE_MB, SHARED_CACHE_TTL
+from src import metrics
+
+# Reads refresh an entry's LRU position at most this often, to keep reads from becoming writes
+_TOUCH_INTERVAL = 60
+
+
+class SharedCache:
+    """
+    Interface for the cache shared by the app processes
+
+    Values are any picklable object. A ttl of None uses the cache's default;
+    get() returns `default` for missing and expired keys.
+    """
+    name = "base"
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Return the cached value, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+
+class MemoryCache(SharedCache):
+    """
+    In-process LRU cache with TTL; only shared by the threads of one process
+
+    Args:
+        max_bytes: Size cap (pickled sizes)
+        default_ttl: Seconds an entry lives
+    """
+    name = "memory"
+
+    def __init__(self, max_bytes=SHARED_CACHE_MB * 1024 * 1024, default_ttl=SHARED_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[1] < time.time():
+                self._bytes -= self._entries.pop(key)[2]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._bytes -= self._entries.popitem(last=False)[1][2]
+                metrics.increment("shared_cache_evictions_total")
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+
+class SQLiteCache(SharedCache):
+    """
+    Cache in a SQLite file, shared by every process on the host
+
+    The database runs in WAL mode, so readers never block the writer and
+    each get/set is a single atomic statement. A trigger keeps the total
+    size in a one-row table; when a set pushes it past max_bytes, expired
+    entries go first and then the least recently used, down to 90% of the
+    cap. Connections are per thread and re-opened after a fork.
+
+    Args:
+        path: Database file
+        max_bytes: Size cap (sum of pickled value sizes)
+        default_ttl: Seconds an entry lives
+    """
+    name = "sqlite"
+
+    def __init__(self, path=SHARED_CACHE_FILE, max_bytes=SHARED_CACHE_MB * 1024 * 1024, default_ttl=SHARED_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+                CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER NOT NULL);
+                INSERT OR IGNORE INTO stats VALUES (0, 0);
+                CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+                    UPDATE stats SET total_bytes = total_bytes + NEW.size WHERE id = 0;
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+                    UPDATE stats SET total_bytes = total_bytes - OLD.size WHERE id = 0;
+                END;
+            """)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            # isolation_level=None: statements autocommit; `with connection` still wraps a transaction
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        now = time.time()
+        if row[1] < now:
+            connection.execute("DELETE FROM entries WHERE key = ? AND expires_at < ?", (key, now))
+            return default
+        if row[2] < now - _TOUCH_INTERVAL:
+            connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # DELETE + INSERT rather than REPLACE, so the size triggers see both halves
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            connection.execute(
+                "INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), expires_at, now)
+            )
+            total = connection.execute("SELECT total_bytes FROM stats WHERE id = 0").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        """Delete expired entries, then the least recently used, down to 90% of the cap"""
+        evicted = connection.execute("DELETE FROM entries WHERE expires_at < ?", (now,)).rowcount
+        target = int(self.max_bytes * 0.9)
+        freed_target = connection.execute("SELECT total_bytes FROM stats WHERE id = 0").fetchone()[0] - target
+        if freed_target > 0:
+            freed = 0
+            victims = []
+            for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if freed >= freed_target:
+                    break
+                victims.append((key,))
+                freed += size
+            connection.executemany("DELETE FROM entries WHERE key = ?", victims)
+            evicted += len(victims)
+        if evicted:
+            metrics.increment("shared_cache_evictions_total", evicted)
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+
+def create_cache(name=SHARED_CACHE_BACKEND):
+    """
+    Create the shared cache selected by config
+
+    Args:
+        name: "sqlite" or "memory"
+
+    Returns:
+        SharedCache: The cache instance
+    """
+    if name == "sqlite":
+        return SQLiteCache()
+    if name == "memory":
+        return MemoryCache()
+    raise ValueError(f"Unknown shared cache backend: {name}. Use sqlite or memory")
@@ -0,0 +1,215 @@
+import io
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from PIL import Image
+
+from config import (
+    STORAGE_BACKEND,
+    CLOUDINARY_CLOUD_NAME,
+    CLOUDINARY_API_KEY,
+    CLOUDINARY_API_SECRET,
+    OBJECTS_FOLDER
+)
+
+LOCAL_PREFIX = "Local file: "
+
+
+class ImageStorage:
+    """
+    Interface for where submission images are kept
+
+    upload() returns the URL saved with the submission; read() takes such a
+    URL and returns the image bytes, so the backends are interchangeable.
+    """
+    name = "base"
+
+    def upload(self, image_bytes, filename, timeout=None):
+        raise NotImplementedError
+
+    def read(self, url):
+        raise NotImplementedError
+
+    def warm_up(self, timeout=None):
+        """Prepare the backend ahead of the first upload"""
+
+
+class CloudinaryStorage(ImageStorage):
+    """Uploads images to the handwriting_analyzer folder on Cloudinary"""
+    name = "cloudinary"
+
+    def __init__(self, cloud_name=CLOUDINARY_CLOUD_NAME, api_key=CLOUDINARY_API_KEY, api_secret=CLOUDINARY_API_SECRET):
+        import cloudinary
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret)
+
+    def warm_up(self, timeout=None):
+        # Imports the uploader and opens the TLS connection to the API host
+        import cloudinary.api
+        import cloudinary.uploader
+        cloudinary.api.ping(timeout=timeout or 10)
+
+    def upload(self, image_bytes, filename, timeout=None):
+        import cloudinary.uploader
+        upload_result = cloudinary.uploader.upload(
+            image_bytes,
+            folder="handwriting_analyzer",
+            public_id=filename.split('.')[0],  # public_id from filename (without extension)
+            resource_type="image",
+            tags=["handwriting_analyzer"],  # Tag for filtering
+            timeout=timeout
+        )
+        return upload_result.get("secure_url")
+
+    def read(self, url):
+        import requests
+        response = requests.get(url, timeout=20)
+        response.raise_for_status()
+        return response.content
+
+
+def _fsync_dir(path):
+    """Persist a rename by syncing its directory (not supported on every platform)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class LocalObjectStore(ImageStorage):
+    """
+    Content-addressed image store on the local disk
+
+    Blobs are named by their SHA-256 and sharded into two levels of
+    subdirectories (objects/ab/cd/abcd....jpg), so no directory grows large.
+    Writes go to a temp file that is fsynced and renamed into place, so a
+    crash never leaves a partial image. Identical images are stored once.
+    Every upload appends a line to index.jsonl with the hash, original
+    filename, size and time.
+
+    Args:
+        root: Directory of the store
+    """
+    name = "local"
+
+    def __init__(self, root=OBJECTS_FOLDER):
+        self.root = root
+        self.index_file = os.path.join(root, "index.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, sha, extension):
+        return os.path.join(self.root, sha[:2], sha[2:4], f"{sha}.{extension}")
+
+    @staticmethod
+    def _extension(image_bytes, filename):
+        try:
+            image_format = Image.open(io.BytesIO(image_bytes)).format
+        except Exception:
+            image_format = None
+        if image_format:
+            return "jpg" if image_format == "JPEG" else image_format.lower()
+        return os.path.splitext(filename)[1].lstrip(".").lower() or "bin"
+
+    def put(self, image_bytes, filename=""):
+        """
+        Store a blob unless an identical one is already stored
+
+        Args:
+            image_bytes: Image file content
+            filename: Original filename, kept in the index
+
+        Returns:
+            tuple: (path, created) - created is False for a deduplicated blob
+        """
+        sha = hashlib.sha256(image_bytes).hexdigest()
+        path = self.path_for(sha, self._extension(image_bytes, filename))
+        created = not os.path.exists(path)
+        if created:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(image_bytes)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            _fsync_dir(directory)
+
+        entry = {
+            "sha256": sha,
+            "path": path,
+            "filename": filename,
+            "size": len(image_bytes),
+            "created": created,
+            "stored_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with self._lock, open(self.index_file, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return path, created
+
+    def upload(self, image_bytes, filename, timeout=None):
+        path, _ = self.put(image_bytes, filename)
+        return f"{LOCAL_PREFIX}{path}"
+
+    def read(self, url):
+        path = url[len(LOCAL_PREFIX):] if url.startswith(LOCAL_PREFIX) else url
+        with open(path, "rb") as f:
+            return f.read()
+
+    def iter_index(self):
+        """Yield the index entries in the order they were written"""
+        try:
+            with open(self.index_file, "r") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line
+        except OSError:
+            return
+
+
+def create_storage(name=STORAGE_BACKEND):
+    """
+    Create the image storage selected by config
+
+    Args:
+        name: "cloudinary", "local", or "auto" (Cloudinary when credentials are configured)
+
+    Returns:
+        ImageStorage: The storage instance
+    """
+    if name == "auto":
+        name = "cloudinary" if all([CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET]) else "local"
+    if name == "cloudinary":
+        return CloudinaryStorage()
+    if name == "local":
+        return LocalObjectStore()
+    raise ValueError(f"Unknown storage backend: {name}. Use auto, cloudinary or local")
+
+
+def read_image(url):
+    """
+    Read a submission image back from the URL saved with it
+
+    The backend is picked from the URL rather than from config, so records
+    saved while another STORAGE_BACKEND was active still resolve.
+
+    Args:
+        url: image_url of a submission record
+
+    Returns:
+        bytes: Image content
+    """
+    if url.startswith(("http://", "https://")):
+        return CloudinaryStorage().read(url)
+    return LocalObjectStore().read(url)
@@ -0,0 +1,163 @@
+import os
+import gzip
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+from config import SUBMISSIONS_FILE, SUBMISSIONS_ARCHIVE_FILE
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def submissions_lock(submissions_file=SUBMISSIONS_FILE):
+    """Serialize read-modify-write of the submissions file across threads and processes"""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(submissions_file) or ".", exist_ok=True)
+        with open(f"{submissions_file}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_submission_data(submission_id, user_name, image_url, submissions_file=SUBMISSIONS_FILE, extra=None):
+    """
+    Save submission data to a JSON file that can be accessed by teammates
+    
+    Args:
+        submission_id: Unique ID of the submission
+        user_name: Name entered by the user
+        image_url: URL (or local path) of the uploaded image
+        submissions_file: Path of the JSON file holding all submissions
+        extra: Optional additional fields for the record (e.g. "duplicate_of")
+        
+    Returns:
+        dict: The saved submission record
+    """
+    submission_data = {
+        "submission_id": submission_id,
+        "user_name": user_name,
+        "image_url": image_url,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "hour_group": datetime.now().strftime("%Y-%m-%d-%H")  # Group by hour for contest
+    }
+    if extra:
+        submission_data.update(extra)
+    
+    with submissions_lock(submissions_file):
+        # Read existing data
+        existing_data = []
+        if os.path.exists(submissions_file):
+            try:
+                with open(submissions_file, "r") as f:
+                    existing_data = json.load(f)
+            except:
+                existing_data = []
+        
+        # Append new submission
+        existing_data.append(submission_data)
+        
+        # Write back to file via a temp file, so readers never see a partial list
+        temp_path = f"{submissions_file}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(existing_data, f, indent=2)
+        os.replace(temp_path, submissions_file)
+    
+    return submission_data
+
+
+def find_submission(submission_id, submissions_file=SUBMISSIONS_FILE):
+    """
+    Look up a saved submission record
+    
+    Args:
+        submission_id: Unique ID of the submission
+        submissions_file: Path of the JSON file holding all submissions
+        
+    Returns:
+        dict: The submission record, or None
+    """
+    try:
+        with open(submissions_file, "r") as f:
+            submissions = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for submission in submissions:
+        if submission.get("submission_id") == submission_id:
+            return submission
+    return None
+
+
+def iter_submissions(submissions_file=SUBMISSIONS_FILE, chunk_size=64 * 1024):
+    """
+    Stream the records of the submissions file without loading the whole list
+    
+    Args:
+        submissions_file: Path of the JSON file holding all submissions
+        chunk_size: Bytes read at a time
+        
+    Yields:
+        dict: Submission records in file order
+    """
+    decoder = json.JSONDecoder()
+    try:
+        f = open(submissions_file, "r")
+    except OSError:
+        return
+    with f:
+        buffer = ""
+        position = 0
+        started = False
+        while True:
+            # Skip whitespace, the opening bracket and separators between records
+            while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                started = started or buffer[position] == "["
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                if not started:
+                    raise ValueError("no list yet")
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # Incomplete record: read more, keeping only the unparsed tail in memory
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield record
+            position = end
+
+
+def iter_archived_submissions(archive_file=SUBMISSIONS_ARCHIVE_FILE):
+    """
+    Stream the submissions moved to the archive by the retention manager
+    
+    Args:
+        archive_file: Gzip JSON-lines archive (one member appended per compaction)
+        
+    Yields:
+        dict: Archived submission records, oldest first
+    """
+    try:
+        with gzip.open(archive_file, "rt") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except (OSError, EOFError):
+        return
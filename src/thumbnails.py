@@ -0,0 +1,84 @@
+import io
+import os
+import hashlib
+import threading
+
+from PIL import Image, ImageOps
+
+from config import THUMBNAILS_FOLDER, THUMBNAIL_WIDTHS, THUMBNAIL_QUALITY
+
+
+def _thumbnail_path(image_sha, width, thumbnails_dir):
+    return os.path.join(thumbnails_dir, f"{image_sha}_{width}.jpg")
+
+
+def _snap_width(width):
+    """Smallest configured width that is at least `width` (or the largest one)"""
+    for candidate in sorted(THUMBNAIL_WIDTHS):
+        if candidate >= width:
+            return candidate
+    return max(THUMBNAIL_WIDTHS)
+
+
+def generate_thumbnails(image_bytes, widths=THUMBNAIL_WIDTHS, quality=THUMBNAIL_QUALITY):
+    """
+    Render JPEG thumbnails of an image at several widths from a single decode
+    
+    JPEGs are decoded at reduced resolution (draft mode) just above the
+    largest width, so a 12 MP phone photo never gets decoded in full.
+    
+    Args:
+        image_bytes: Image file content
+        widths: Thumbnail widths in pixels
+        quality: JPEG quality of the thumbnails
+        
+    Returns:
+        dict: width -> JPEG bytes
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    largest = max(widths)
+    image.draft("RGB", (largest, largest * image.height // max(image.width, 1)))
+    # Phone photos are often stored sideways with an EXIF orientation tag
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    
+    thumbnails = {}
+    for width in sorted(widths, reverse=True):
+        if image.width > width:
+            image = image.resize((width, max(1, image.height * width // image.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        thumbnails[width] = buffer.getvalue()
+    return thumbnails
+
+
+def get_thumbnail(image_bytes, width, thumbnails_dir=THUMBNAILS_FOLDER):
+    """
+    Get a cached thumbnail of an image, generating all sizes on first use
+    
+    Args:
+        image_bytes: Image file content
+        width: Requested width; snapped to the nearest configured width at or above it
+        thumbnails_dir: Directory holding the cached thumbnails
+        
+    Returns:
+        bytes: JPEG thumbnail
+    """
+    width = _snap_width(width)
+    image_sha = hashlib.sha256(image_bytes).hexdigest()
+    path = _thumbnail_path(image_sha, width, thumbnails_dir)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    
+    thumbnails = generate_thumbnails(image_bytes)
+    os.makedirs(thumbnails_dir, exist_ok=True)
+    for size, data in thumbnails.items():
+        target = _thumbnail_path(image_sha, size, thumbnails_dir)
+        # Sessions render on threads of one process, so the pid alone is not unique
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, target)
+    return thumbnails[width]
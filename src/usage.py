@@ -0,0 +1,211 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import (
+    USAGE_FILE,
+    MODEL_PRICES,
+    HOURLY_BUDGET_USD,
+    DAILY_BUDGET_USD,
+    BUDGET_CHEAP_MODEL_AT,
+    BUDGET_SMALL_IMAGE_AT,
+    BUDGET_LOCAL_AT
+)
+from src import metrics
+
+# Degradation levels, cheapest last
+LEVEL_NORMAL = "normal"
+LEVEL_CHEAP_MODEL = "cheap_model"
+LEVEL_SMALL_IMAGE = "small_image"
+LEVEL_LOCAL = "local"
+
+
+class UsageLedger:
+    """
+    Token, cost and latency of every model call, in a SQLite file
+
+    One row per backend call, hedged and losing calls included since they
+    are billed too, attributed to the submission, model and prompt version.
+    Rows carry their clock hour and day, so per-hour and per-day totals are
+    one GROUP BY, and all processes on the host write to the same file.
+
+    Args:
+        path: Database file
+        prices: Model name -> [USD per million prompt tokens, USD per million output tokens]
+    """
+    def __init__(self, path=USAGE_FILE, prices=None):
+        self.path = path
+        self.prices = prices if prices is not None else MODEL_PRICES
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                hour TEXT NOT NULL,
+                day TEXT NOT NULL,
+                submission_id TEXT,
+                model TEXT,
+                prompt_version TEXT,
+                prompt_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                latency REAL NOT NULL,
+                outcome TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS calls_created ON calls (created_at);
+            CREATE INDEX IF NOT EXISTS calls_submission ON calls (submission_id);
+        """)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def cost(self, model, prompt_tokens, output_tokens):
+        """USD cost of a call (0 for models without a price, such as the fake backend)"""
+        prompt_price, output_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + output_tokens * output_price) / 1_000_000
+
+    def record(self, submission_id, model, prompt_version, prompt_tokens, output_tokens, latency, outcome="ok"):
+        """
+        Add one model call to the ledger
+
+        Args:
+            submission_id: Submission the call was made for (None if unknown)
+            model: Model name
+            prompt_version: Version of the prompt sent
+            prompt_tokens: Input tokens billed
+            output_tokens: Output tokens billed
+            latency: Seconds the call took
+            outcome: "ok" or "error"
+
+        Returns:
+            float: Cost of the call in USD
+        """
+        cost = self.cost(model, prompt_tokens, output_tokens)
+        now = datetime.now()
+        self._connection().execute(
+            "INSERT INTO calls (created_at, hour, day, submission_id, model, prompt_version, prompt_tokens, output_tokens, cost, latency, outcome)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (now.timestamp(), now.strftime("%Y-%m-%d-%H"), now.strftime("%Y-%m-%d"), submission_id, model,
+             prompt_version, prompt_tokens, output_tokens, cost, latency, outcome)
+        )
+        metrics.increment("model_cost_usd_total", cost, model=model or "unknown")
+        return cost
+
+    def spend(self, since):
+        """USD spent on calls made at or after the `since` timestamp"""
+        row = self._connection().execute("SELECT COALESCE(SUM(cost), 0) FROM calls WHERE created_at >= ?", (since,)).fetchone()
+        return row[0]
+
+    def totals(self, period="hour", since=None):
+        """
+        Calls, tokens, cost and mean latency per hour or day and model
+
+        Args:
+            period: "hour" or "day"
+            since: Only count calls made at or after this timestamp
+
+        Returns:
+            list: Dicts with period, model, calls, prompt_tokens, output_tokens, cost, latency; oldest first
+        """
+        if period not in ("hour", "day"):
+            raise ValueError(f"Unknown period: {period}")
+        rows = self._connection().execute(
+            f"SELECT {period}, model, COUNT(*), SUM(prompt_tokens), SUM(output_tokens), SUM(cost), AVG(latency)"
+            f" FROM calls WHERE created_at >= ? GROUP BY {period}, model ORDER BY {period}, model",
+            (since or 0,)
+        ).fetchall()
+        return [
+            {"period": row[0], "model": row[1], "calls": row[2], "prompt_tokens": row[3],
+             "output_tokens": row[4], "cost": row[5], "latency": row[6]}
+            for row in rows
+        ]
+
+    def for_submission(self, submission_id):
+        """All calls made for one submission, oldest first"""
+        rows = self._connection().execute(
+            "SELECT created_at, model, prompt_version, prompt_tokens, output_tokens, cost, latency, outcome"
+            " FROM calls WHERE submission_id = ? ORDER BY id", (submission_id,)
+        ).fetchall()
+        keys = ("created_at", "model", "prompt_version", "prompt_tokens", "output_tokens", "cost", "latency", "outcome")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def purge(self, older_than):
+        """Delete calls older than `older_than` seconds; returns how many"""
+        cursor = self._connection().execute("DELETE FROM calls WHERE created_at < ?", (time.time() - older_than,))
+        return cursor.rowcount
+
+
+class BudgetGuard:
+    """
+    Picks how far to degrade analyses from the spend against the budgets
+
+    The share used is the larger of this clock hour's spend over the hourly
+    budget and today's spend over the daily budget. It is re-read from the
+    ledger at most every `refresh` seconds, so the check adds nothing
+    measurable per request while reacting within seconds across processes.
+
+    Args:
+        ledger: UsageLedger to read spend from
+        hourly: Hourly budget in USD (0 = no limit)
+        daily: Daily budget in USD (0 = no limit)
+        thresholds: Shares used at which to switch to the cheap model, small images and the local path
+        refresh: Seconds between ledger reads
+    """
+    def __init__(self, ledger, hourly=HOURLY_BUDGET_USD, daily=DAILY_BUDGET_USD,
+                 thresholds=(BUDGET_CHEAP_MODEL_AT, BUDGET_SMALL_IMAGE_AT, BUDGET_LOCAL_AT), refresh=5.0):
+        self.ledger = ledger
+        self.hourly = hourly
+        self.daily = daily
+        self.thresholds = thresholds
+        self.refresh = refresh
+        self._used = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def used(self):
+        """Share of the tighter budget spent so far (0 without budgets)"""
+        if not self.hourly and not self.daily:
+            return 0.0
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.refresh:
+                return self._used
+            now = datetime.now()
+            shares = []
+            if self.hourly:
+                hour_start = now.replace(minute=0, second=0, microsecond=0).timestamp()
+                shares.append(self.ledger.spend(hour_start) / self.hourly)
+                metrics.set_gauge("budget_used_ratio", shares[-1], period="hour")
+            if self.daily:
+                day_start = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+                shares.append(self.ledger.spend(day_start) / self.daily)
+                metrics.set_gauge("budget_used_ratio", shares[-1], period="day")
+            self._used = max(shares)
+            self._checked_at = time.monotonic()
+            return self._used
+
+    def level(self):
+        """
+        Degradation level for the next analysis
+
+        Returns:
+            str: LEVEL_NORMAL, LEVEL_CHEAP_MODEL, LEVEL_SMALL_IMAGE or LEVEL_LOCAL
+        """
+        used = self.used()
+        cheap_model_at, small_image_at, local_at = self.thresholds
+        if used >= local_at:
+            return LEVEL_LOCAL
+        if used >= small_image_at:
+            return LEVEL_SMALL_IMAGE
+        if used >= cheap_model_at:
+            return LEVEL_CHEAP_MODEL
+        return LEVEL_NORMAL
@@ -67,4 +67,35 @@ def validate_image(file, supported_formats, max_size):
         
         return True, ""
     except Exception as e:
-        return False, f"Invalid image file: {str(e)}"
\ No newline at end of file
+        return False, f"Invalid image file: {str(e)}"
+
+def summarize_latencies(samples, elapsed=None):
+    """
+    Summarize a list of latencies into percentiles and throughput
+    
+    Args:
+        samples: List of latencies in seconds
+        elapsed: Wall-clock seconds the samples took in total (defaults to their sum)
+        
+    Returns:
+        dict: count, mean, p50, p95, p99 (seconds) and throughput (per second)
+    """
+    if not samples:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "throughput": 0.0}
+    
+    ordered = sorted(samples)
+    
+    def percentile(q):
+        # Nearest-rank percentile
+        index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+        return ordered[index]
+    
+    total = elapsed if elapsed is not None else sum(ordered)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "throughput": len(ordered) / total if total > 0 else 0.0
+    }
@@ -0,0 +1,96 @@
+import time
+import logging
+import threading
+
+from config import APP_URL, WARMUP_ENABLED, WARMUP_TIMEOUT
+from src import metrics
+from src.qr_generator import generate_qr_code, get_cached_qr_code
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_started_lock = threading.Lock()
+
+
+def render_sample_chart():
+    """
+    Build and serialize a radar chart like the result page's
+
+    The first Plotly figure of a process loads and validates plotly's
+    schema, which takes about a second; later figures are cheap.
+    """
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Scatterpolar(r=[5, 5, 5, 5, 5, 5], theta=list("ABCDEA"), fill="toself"))
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 10])), showlegend=False)
+    return fig.to_json()
+
+
+def warm_up(analyzer=None, storage=None, cache=None, qr_url=APP_URL, render=False, timeout=WARMUP_TIMEOUT):
+    """
+    Pay the first-request costs now instead of on the first visitor
+
+    Each step is timed and a failing step is logged and skipped, so a
+    slow or unreachable dependency delays readiness by at most `timeout`
+    instead of keeping the process out of rotation. The process is marked
+    ready when all steps have run.
+
+    Args:
+        analyzer: HandwritingAnalyzer whose model connections to open
+        storage: ImageStorage whose client to prepare
+        cache: SharedCache to render the contest QR code into
+        qr_url: URL of the contest QR code
+        render: Also render a sample chart (for processes that serve pages)
+        timeout: Seconds each network step may take
+
+    Returns:
+        dict: Step name -> seconds taken
+    """
+    steps = []
+    if analyzer is not None:
+        steps.append(("model", lambda: analyzer.warm_up(timeout)))
+    if storage is not None:
+        steps.append(("storage", lambda: storage.warm_up(timeout)))
+    if qr_url:
+        steps.append(("qr_code", lambda: get_cached_qr_code(qr_url, cache) if cache is not None else generate_qr_code(qr_url)))
+    if render:
+        steps.append(("chart", render_sample_chart))
+
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            metrics.increment("warmup_failures_total", step=name)
+            logger.warning(f"Warm-up step {name} failed: {str(e)}")
+        timings[name] = time.perf_counter() - start
+        metrics.observe("warmup_seconds", timings[name], step=name)
+
+    metrics.set_ready()
+    logger.info("Warm-up complete", extra={"timings": {name: round(seconds, 4) for name, seconds in timings.items()}})
+    return timings
+
+
+def start_warmup(**components):
+    """
+    Run warm_up() in a background thread, once per process
+
+    With WARMUP_ENABLED off the process is marked ready at once.
+
+    Args:
+        **components: Arguments for warm_up()
+
+    Returns:
+        threading.Thread: The warm-up thread, or None if it already ran or warm-up is disabled
+    """
+    global _started
+    with _started_lock:
+        if _started:
+            return None
+        _started = True
+    if not WARMUP_ENABLED:
+        metrics.set_ready()
+        return None
+    thread = threading.Thread(target=warm_up, kwargs=components, name="warmup", daemon=True)
+    thread.start()
+    return thread
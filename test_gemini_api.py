@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from config import GEMINI_MODEL
+
 # Load environment variables
 load_dotenv()
 
@@ -12,13 +14,14 @@ if not api_key:
     exit(1)
 
 print(f"Using API key: {api_key[:4]}...{api_key[-4:]} (truncated for security)")
+print(f"Using model: {GEMINI_MODEL}")
 
 try:
     # Configure the API
     genai.configure(api_key=api_key)
     
     # Initialize model
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    model = genai.GenerativeModel(GEMINI_MODEL)
     
     # Make a simple request
     response = model.generate_content("Hello, this is a test of the Google Gemini API connection. Please respond with a short confirmation.")
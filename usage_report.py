@@ -0,0 +1,59 @@
+"""
+Report model token usage, cost and latency per hour or day.
+
+Reads the usage ledger every analyzer process writes to (one row per model
+call, hedged calls included) and prints totals per period and model, the
+spend against the configured budgets, or the calls of one submission.
+
+Usage:
+    python usage_report.py                        # per hour, last 24 hours
+    python usage_report.py --period day --days 30
+    python usage_report.py --submission 20250325161502_ab12cd34
+    python usage_report.py --purge-days 90
+"""
+import time
+import argparse
+from datetime import datetime
+
+from config import USAGE_FILE, HOURLY_BUDGET_USD, DAILY_BUDGET_USD
+from src.usage import UsageLedger, BudgetGuard
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report model token usage and cost")
+    parser.add_argument("--period", choices=["hour", "day"], default="hour")
+    parser.add_argument("--days", type=float, default=1.0, help="How far back to report")
+    parser.add_argument("--submission", help="List the model calls of one submission")
+    parser.add_argument("--purge-days", type=float, help="Delete calls older than this many days")
+    parser.add_argument("--ledger", default=USAGE_FILE, help="Path of the usage ledger")
+    args = parser.parse_args()
+
+    ledger = UsageLedger(args.ledger)
+
+    if args.purge_days is not None:
+        print(f"Deleted {ledger.purge(args.purge_days * 86400)} calls older than {args.purge_days:g} days")
+        return
+
+    if args.submission:
+        calls = ledger.for_submission(args.submission)
+        if not calls:
+            print(f"No model calls recorded for {args.submission}")
+        for call in calls:
+            print(f"{datetime.fromtimestamp(call['created_at']):%Y-%m-%d %H:%M:%S}  {call['model']:<24}{call['outcome']:<7}"
+                  f"{call['prompt_tokens']:>8} in {call['output_tokens']:>6} out  ${call['cost']:.5f}  {call['latency']:.2f}s")
+        return
+
+    rows = ledger.totals(args.period, since=time.time() - args.days * 86400)
+    print(f"{args.period:<14}{'model':<24}{'calls':>7}{'in tokens':>12}{'out tokens':>12}{'cost $':>10}{'latency':>9}")
+    for row in rows:
+        print(f"{row['period']:<14}{row['model'] or '-':<24}{row['calls']:>7}{row['prompt_tokens']:>12}{row['output_tokens']:>12}"
+              f"{row['cost']:>10.4f}{row['latency']:>8.2f}s")
+    print(f"\nTotal: {sum(row['calls'] for row in rows)} calls, ${sum(row['cost'] for row in rows):.4f}")
+
+    guard = BudgetGuard(ledger, refresh=0)
+    if HOURLY_BUDGET_USD or DAILY_BUDGET_USD:
+        print(f"Budget used: {guard.used():.0%} (hourly ${HOURLY_BUDGET_USD:g}, daily ${DAILY_BUDGET_USD:g}), level: {guard.level()}")
+
+
+if __name__ == "__main__":
+    main()